@@ -1,33 +1,78 @@
 # -----------------------------------------------------------------------------
 # Versão em Português:
-# Este módulo configura e cria uma aplicação Flask que interage com um banco 
-# de dados SQLite e organiza suas rotas em Blueprints, modularizando o gerenciamento 
-# de recursos do universo Star Wars, como personagens, filmes, planetas, 
-# espaçonaves, espécies, veículos e favoritos.
+# Este módulo configura e cria uma aplicação Flask que interage com um banco
+# de dados SQLite e organiza suas rotas em Blueprints, modularizando o gerenciamento
+# de recursos do universo Star Wars, como personagens, filmes, planetas,
+# espaçonaves, espécies, veículos e favoritos. create_app() é a única fábrica
+# da aplicação: carrega o perfil de configuração (config.py e variáveis de
+# ambiente) sem tocar no banco. A criação do esquema e o aquecimento ficam em
+# ganchos explícitos de inicialização (init_db() e startup()).
 #
 # English Version:
-# This module configures and creates a Flask application that interacts with 
-# a SQLite database and organizes its routes into Blueprints, modularizing 
-# the management of Star Wars universe resources, such as characters, movies, 
-# planets, starships, species, vehicles, and favorites.
+# This module configures and creates a Flask application that interacts with
+# a SQLite database and organizes its routes into Blueprints, modularizing
+# the management of Star Wars universe resources, such as characters, movies,
+# planets, starships, species, vehicles, and favorites. create_app() is the
+# single application factory: it loads the configuration profile (config.py
+# and environment variables) without touching the database. Schema creation
+# and warm-up live in explicit startup hooks (init_db() and startup()).
 #
 # Copyright © 2024 Jeremias Nunes. All rights reserved.
 # Copyright © 2024 Rafael Mesquita. All rights reserved.
 # -----------------------------------------------------------------------------
 
-from flask import Flask
+import os
+import sys
+
+import click
+from flask import Flask, Response, jsonify, render_template
 from models import db  # Importa o objeto db para interagir com o banco de dados
+from config import PROFILES, basedir
+from ingestion import ingest, sync
+from warmup import warmup
+from cache import response_cache
+from versioning import version_cache
+from snapshots import snapshots
+from stats import stats_memo
+from columnar import columnar
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from swapi_client import client as swapi_client
+from migrations import migrate
+from queryplan import check as check_query_plans
+import bundle
+import storage
+
+# Função que cria e configura a aplicação Flask.
+# profile: dev, test, prod ou bench (padrão: variável APP_PROFILE ou dev);
+# overrides: chaves de configuração aplicadas por último.
+def create_app(profile=None, **overrides):
+    app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'))
+
+    # Configurações da aplicação: perfil, variáveis FLASK_* e sobrescritas explícitas
+    profile = profile or os.environ.get('APP_PROFILE', 'dev')
+    app.config.from_object(PROFILES[profile])
+    app.config.from_prefixed_env()
+    app.config.update(overrides)
+    app.config['PROFILE'] = profile
+
+    # Inicializa o banco de dados com o perfil de desempenho do SQLite
+    # (WAL, PRAGMAs, pool e conexão somente leitura para as rotas GET)
+    storage.init_app(app)
+
+    # Medição das requisições (latência, SQL, serialização e tamanho), exportada em /metrics
+    metrics.init_app(app)
+
+    # Versões das tabelas em memória (ETags e chaves de cache sem consultar o banco)
+    version_cache.init_app(app)
 
-# Função que cria e configura a aplicação Flask
-def create_app():
-    app = Flask(__name__)
+    # Cache de leitura das respostas (configurável por CACHE_TYPE, CACHE_TTL, ...)
+    response_cache.init_app(app)
 
-    # Configurações da aplicação, incluindo o banco de dados SQLite
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'  # Modifique o caminho conforme necessário
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Armazenamento colunar em memória das tabelas (opcional, COLUMNAR_STORE)
+    columnar.init_app(app)
 
-    # Inicializa o banco de dados com a aplicação
-    db.init_app(app)
+    # Aquecimento do banco em segundo plano (carga da SWAPI fora das requisições)
+    warmup.init_app(app)
 
     # Registro dos Blueprints das rotas da aplicação
 
@@ -52,7 +97,125 @@ def create_app():
     from .favorite_routes import favorite_bp  # Importa o blueprint de favoritos
     app.register_blueprint(favorite_bp)
 
+    from .search_routes import search_bp  # Importa o blueprint da busca textual
+    app.register_blueprint(search_bp)
+
+    from .stats_routes import stats_bp  # Importa o blueprint das estatísticas
+    app.register_blueprint(stats_bp)
+
+    register_routes(app)
+    register_commands(app)
     return app
 
-# O padrão de execução do aplicativo (como o app.run()) deve ser implementado 
-# em outro arquivo, como app.py, para separar a lógica de inicialização do código.
+# Rotas gerais da aplicação (página inicial, endpoints e estado interno)
+def register_routes(app):
+    # Rota principal que renderiza o template HTML
+    @app.route('/', methods=['GET'])
+    def home():
+        return render_template('index.html')
+
+    # Rota para listar os endpoints em formato JSON
+    @app.route('/endpoints', methods=['GET'])
+    def list_endpoints():
+        endpoints = {}
+
+        # Itera sobre todas as rotas registradas no Flask
+        for rule in app.url_map.iter_rules():
+            endpoints[rule.endpoint] = {
+                "methods": list(rule.methods),
+                "url": str(rule)
+            }
+
+        # Retorna a lista de endpoints em formato JSON
+        return jsonify(endpoints)
+
+    # Rota para acompanhar o progresso do aquecimento do banco de dados
+    @app.route('/warmup', methods=['GET'])
+    def warmup_status():
+        return jsonify(warmup.status)
+
+    # Rota com os contadores do cache de respostas, dos snapshots das listagens,
+    # dos resultados memorizados das estatísticas, do armazenamento colunar e
+    # do cache em disco da SWAPI
+    @app.route('/cache', methods=['GET'])
+    def cache_stats():
+        return jsonify(dict(response_cache.stats(), snapshots=snapshots.stats(), stats=stats_memo.stats(),
+                            columnar=columnar.stats(), swapi=swapi_client.stats()))
+
+    # Rota com as medições das requisições no formato texto do Prometheus
+    @app.route('/metrics', methods=['GET'])
+    def metrics_export():
+        return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+# Comandos de linha de comando (flask --app app <comando>)
+def register_commands(app):
+    # Cria o esquema e aplica as migrações: flask --app app init-db
+    @app.cli.command('init-db')
+    def init_db_command():
+        init_db(app)
+
+    # Comando para carregar todos os recursos da SWAPI no banco: flask --app app hydrate
+    @app.cli.command('hydrate')
+    def hydrate():
+        for resource, saved in ingest().items():
+            print(f"{resource}: {saved} registros salvos")
+
+    # Sincronização incremental com a SWAPI (só o que mudou): flask --app app sync [--full]
+    @app.cli.command('sync')
+    @click.option('--full', is_flag=True, help="Atualiza todos os registros, ignorando as marcas d'água")
+    def sync_command(full):
+        for resource, counts in sync(full=full).items():
+            print(f"{resource}: {counts['inserted']} inseridos, {counts['updated']} atualizados, "
+                  f"{counts['unchanged']} sem alteração, {counts['failed']} com falha")
+
+    # Gera o pacote offline com o conteúdo do banco: flask --app app dump-bundle [arquivo] [--fetch]
+    @app.cli.command('dump-bundle')
+    @click.argument('path', default=bundle.DEFAULT_BUNDLE)
+    @click.option('--fetch', is_flag=True, help="Carrega a SWAPI antes de gerar o pacote")
+    def dump_bundle(path, fetch):
+        if fetch:
+            ingest()
+        for table, count in bundle.dump(path).items():
+            print(f"{table}: {count} linhas")
+        print(f"Pacote gravado em {path}")
+
+    # Carrega o pacote offline no banco: flask --app app load-bundle [arquivo] [--replace]
+    @app.cli.command('load-bundle')
+    @click.argument('path', default=bundle.DEFAULT_BUNDLE)
+    @click.option('--replace', is_flag=True, help="Apaga os registros atuais antes da carga")
+    def load_bundle(path, replace):
+        init_db(app)  # Nós novos: cria o esquema antes da carga
+        try:
+            counts = bundle.load(path, replace=replace)
+        except (OSError, ValueError) as e:
+            print(f"Falha ao carregar o pacote: {str(e)}")
+            sys.exit(1)
+        for table, count in counts.items():
+            print(f"{table}: {count} linhas")
+
+    # Verifica se as consultas frequentes usam índices: flask --app app check-indexes
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        results = check_query_plans()
+        for name, (indexed, plan) in results.items():
+            print(f"{'ok   ' if indexed else 'SCAN '} {name}: {' / '.join(plan)}")
+        if not all(indexed for indexed, _ in results.values()):
+            sys.exit(1)
+
+
+# Gancho de inicialização: cria as tabelas e aplica as migrações pendentes.
+# Deve rodar uma única vez, no processo principal, antes de atender requisições.
+def init_db(app):
+    with app.app_context():
+        db.create_all(bind_key=None)  # Apenas o banco principal (o bind replica é somente leitura)
+        migrate()  # Aplica as migrações pendentes do esquema
+
+# Gancho de inicialização completo: banco de dados, pacote offline (SWAPI_BUNDLE,
+# se o banco estiver vazio) e, conforme o perfil, a carga da SWAPI em segundo
+# plano (e periódica, se SWAPI_WARMUP_INTERVAL estiver definido)
+def startup(app):
+    if app.config['INIT_DB_ON_STARTUP']:
+        init_db(app)
+    bundle.hydrate(app)
+    if app.config['SWAPI_WARMUP_ON_STARTUP']:
+        warmup.schedule()
@@ -16,91 +16,61 @@
 # -----------------------------------------------------------------------------
 
 from flask import Blueprint, jsonify, request, abort, render_template  # Adicionei render_template aqui
-import requests  
-from models import db, Character
-import json
+from models import db, Character, delete_links, pop_links, save_links
+from cache import response_cache
+from normalize import normalize_record
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, serialize_one, stream, wants_json, wants_stream
 
 # Criação do Blueprint
 character_bp = Blueprint('characters', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+# e relações (?films=4: personagens do filme 4)
+FILTERS = ('gender', 'eye_color', 'hair_color', 'skin_color', 'birth_year', 'homeworld', 'height', 'mass',
+           'films', 'species', 'vehicles', 'starships')
+
 # Função auxiliar para salvar um novo registro
-def save_record(model, data):
+def save_record(model, data, links=None):
+    normalize_record(model, data)  # Campos numéricos da SWAPI ("1,000", "unknown", ...)
     new_record = model(**data)
     db.session.add(new_record)
+    if links:
+        db.session.flush()  # Gera o id antes de gravar as associações
+        save_links(model, {new_record.id: links})
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
-# Função auxiliar para deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados da SWAPI
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()  # Verifica erros na resposta
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching from SWAPI: {e}")
-        return None
-
 # Função para buscar personagens da SWAPI e salvar no banco de dados
 def fetch_and_save_characters():
-    swapi_data = fetch_from_swapi('people')
-    if swapi_data:
-        for item in swapi_data['results']:
-            character_data = {
-                "name": item["name"],
-                "height": item["height"],
-                "mass": item["mass"],
-                "hair_color": item.get("hair_color"),
-                "skin_color": item.get("skin_color"),
-                "eye_color": item.get("eye_color"),
-                "birth_year": item.get("birth_year"),
-                "gender": item.get("gender"),
-                "homeworld": item.get("homeworld"),
-                "films": json.dumps(item.get("films", [])),  # Armazenar como JSON
-                "species": json.dumps(item.get("species", [])),  # Armazenar como JSON
-                "vehicles": json.dumps(item.get("vehicles", [])),  # Armazenar como JSON
-                "starships": json.dumps(item.get("starships", [])),  # Armazenar como JSON
-            }
-            try:
-                # Evitar duplicatas: verifica se o personagem já está salvo
-                if not Character.query.filter_by(name=character_data['name']).first():
-                    save_record(Character, character_data)
-            except Exception as e:
-                print(f"Falha ao salvar personagem {item['name']}: {str(e)}")
-
-# Rota para listar todos os personagens (e buscar da SWAPI se o banco de dados estiver vazio)
+    return ingest('people')
+
+# Rota para listar todos os personagens (o banco é carregado da SWAPI em segundo plano)
 @character_bp.route('/personagens', methods=['GET'])
+@conditional('characters')
+@snapshots.serve(Character, when=wants_json)
+@response_cache.cached('characters')
 def get_personagens():
-    # Verifica se há personagens no banco de dados local, caso contrário busca da SWAPI
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Character.query.first():
-        fetch_and_save_characters()
+        pending = warmup.unavailable('people')
+        if pending:
+            return pending
     
-    # Agora busca todos os personagens do banco de dados
-    personagens_list = Character.query.all()
-    result = [{
-        "id": p.id,
-        "name": p.name,
-        "height": p.height,
-        "mass": p.mass,
-        "hair_color": p.hair_color,
-        "skin_color": p.skin_color,
-        "eye_color": p.eye_color,
-        "birth_year": p.birth_year,
-        "gender": p.gender,
-        "homeworld": p.homeworld,
-        "films": load_json(p.films),
-        "species": load_json(p.species),
-        "vehicles": load_json(p.vehicles),
-        "starships": load_json(p.starships),
-        "created": p.created.isoformat(),
-        "edited": p.edited.isoformat(),
-    } for p in personagens_list]
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Character, filters=FILTERS)
+
+    # Busca os personagens do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Character, filters=FILTERS)
+    if wants_json():
+        return add_pagination_headers(jsonify(result), next_cursor)
 
     # Certifique-se de que 'personagens.html' está no diretório correto
     return render_template('personagens.html', personagens=result)  # Corrigi para usar 'result' aqui
@@ -112,29 +82,14 @@ def Id_personagem_form():
 
 # Rota para retornar um personagem específico pelo ID
 @character_bp.route('/personagens/<int:id>', methods=['GET'])
+@conditional('characters')
+@response_cache.cached('characters')
 def get_personagem(id):
     p = Character.query.get(id)
     if not p:
         abort(404, description="Personagem não encontrado")
     
-    return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "height": p.height,
-        "mass": p.mass,
-        "hair_color": p.hair_color,
-        "skin_color": p.skin_color,
-        "eye_color": p.eye_color,
-        "birth_year": p.birth_year,
-        "gender": p.gender,
-        "homeworld": p.homeworld,
-        "films": load_json(p.films),
-        "species": load_json(p.species),
-        "vehicles": load_json(p.vehicles),
-        "starships": load_json(p.starships),
-        "created": p.created.isoformat(),
-        "edited": p.edited.isoformat(),
-    })
+    return jsonify(serialize_one(Character, p))
 
 @character_bp.route('/personagem/salvar', methods=['GET'])
 def adicionar_personagem_form():
@@ -145,20 +100,27 @@ def adicionar_personagem_form():
 def save_personagem():
     data = request.json
     try:
-        # Converte os campos que precisam ser armazenados como JSON
-        data['films'] = json.dumps(data.get('films', []))
-        data['species'] = json.dumps(data.get('species', []))
-        data['vehicles'] = json.dumps(data.get('vehicles', []))
-        data['starships'] = json.dumps(data.get('starships', []))
-        
-        new_personagem = save_record(Character, data)
+        # Separa as relações (URLs ou ids), gravadas nas tabelas de associação
+        links = pop_links(Character, data)
+
+        new_personagem = save_record(Character, data, links)
         return jsonify({"message": "Personagem salvo com sucesso!", "id": new_personagem.id}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
     
 @character_bp.route('/personagem/delete', methods=['GET'])
 def deletar_personagem_form():
-    return render_template('deletar_personagem.html')
+    return render_template('deletar_Personagem.html')
+
+# Rota para salvar personagens em lote (array JSON ou NDJSON), com o resultado de cada item
+@character_bp.route('/personagens/bulk', methods=['POST'])
+def save_personagens_bulk():
+    return bulk_create(Character)
+
+# Rota para deletar personagens em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@character_bp.route('/personagens/bulk', methods=['DELETE'])
+def delete_personagens_bulk():
+    return bulk_delete(Character)
 
 # Rota para deletar um personagem pelo ID
 @character_bp.route('/personagens/<int:id>', methods=['DELETE'])
@@ -167,6 +129,9 @@ def delete_personagem(id):
     if not p:
         abort(404, description="Personagem não encontrado")
     
+    delete_links(Character, p.id)  # Remove também as associações do registro
     db.session.delete(p)
+    touch(Character)
     db.session.commit()
+    response_cache.invalidate_model(Character)
     return jsonify({"message": "Personagem deletado com sucesso!"})
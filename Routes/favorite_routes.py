@@ -17,15 +17,28 @@
 
 from flask import Blueprint, jsonify, request
 from models import db, Favorite
+from cache import response_cache
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from listing import add_pagination_headers, paginate, stream, wants_stream
 
 # Criação do Blueprint para a rota de favoritos
 favorite_bp = Blueprint('favorite', __name__)
 
+# Colunas que aceitam filtros na listagem (?character_id=1, ?course=..., ...)
+FILTERS = (
+    'character_id', 'movie_id', 'starship_id', 'vehicle_id', 'species_id',
+    'planet_id', 'course', 'university', 'period'
+)
+
 # Função auxiliar para salvar um novo registro no banco de dados
 def save_record(model, data):
     new_record = model(**data)
     db.session.add(new_record)
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
 # Rota para salvar um favorito no banco de dados
@@ -55,33 +68,22 @@ def save_favorite():
 
 # Rota para listar todos os favoritos salvos
 @favorite_bp.route('/favorito', methods=['GET'])
+@conditional('favorites')
+@snapshots.serve(Favorite)
+@response_cache.cached('favorites')
 def list_favorites():
-    favorites = Favorite.query.all()
-    result = []
-
-    # Cria uma lista de favoritos para retornar
-    for f in favorites:
-        result.append({
-            "id": f.id,
-            "character_id": f.character_id,
-            "movie_id": f.movie_id,
-            "starship_id": f.starship_id,
-            "vehicle_id": f.vehicle_id,
-            "species_id": f.species_id,
-            "planet_id": f.planet_id,
-            "student_name1": f.student_name1,
-            "registration1": f.registration1,
-            "student_name2": f.student_name2,
-            "registration2": f.registration2,
-            "course": f.course,
-            "university": f.university,
-            "period": f.period
-        })
-
-    return jsonify(result)
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Favorite, filters=FILTERS)
+
+    # Busca os favoritos com paginação, projeção e filtros
+    result, next_cursor = paginate(Favorite, filters=FILTERS)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para buscar um favorito específico pelo ID
 @favorite_bp.route('/favorito/<int:id>', methods=['GET'])
+@conditional('favorites')
+@response_cache.cached('favorites')
 def get_favorite(id):
     f = Favorite.query.get(id)
 
@@ -90,22 +92,17 @@ def get_favorite(id):
         return jsonify({"error": "Favorito não encontrado"}), 404
 
     # Retorna os dados do favorito
-    result = {
-        "character_id": f.character_id,
-        "movie_id": f.movie_id,
-        "starship_id": f.starship_id,
-        "vehicle_id": f.vehicle_id,
-        "species_id": f.species_id,
-        "planet_id": f.planet_id,
-        "student_name1": f.student_name1,
-        "registration1": f.registration1,
-        "student_name2": f.student_name2,
-        "registration2": f.registration2,
-        "course": f.course,
-        "university": f.university,
-        "period": f.period
-    }
-    return jsonify(result)
+    return jsonify(f.to_dict())
+
+# Rota para salvar favoritos em lote (array JSON ou NDJSON), com o resultado de cada item
+@favorite_bp.route('/favorito/bulk', methods=['POST'])
+def save_favoritos_bulk():
+    return bulk_create(Favorite)
+
+# Rota para deletar favoritos em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@favorite_bp.route('/favorito/bulk', methods=['DELETE'])
+def delete_favoritos_bulk():
+    return bulk_delete(Favorite)
 
 # Rota para deletar um favorito pelo ID
 @favorite_bp.route('/favorito/delete/<int:id>', methods=['DELETE'])
@@ -115,7 +112,9 @@ def delete_favorite(id):
     # Verifica se o favorito foi encontrado
     if f:
         db.session.delete(f)
+        touch(Favorite)
         db.session.commit()
+        response_cache.invalidate_model(Favorite)
         return jsonify({"message": "Favorito deletado com sucesso!"})
     
     return jsonify({"error": "Favorito não encontrado"}), 404
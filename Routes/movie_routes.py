@@ -16,136 +16,97 @@
 # -----------------------------------------------------------------------------
 
 from flask import Blueprint, abort, jsonify, request
-from models import db, Movie
-import requests
-import json
+from models import db, Movie, delete_links, pop_links, save_links
+from cache import response_cache
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, serialize_one, stream, wants_stream
 from datetime import datetime
 
 # Criação do Blueprint
 movie_bp = Blueprint('movies', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+# e relações (?characters=1: filmes do personagem 1)
+FILTERS = ('episode_id', 'director', 'producer', 'release_date',
+           'characters', 'planets', 'starships', 'vehicles', 'species')
+
 # Função auxiliar para salvar um novo registro
-def save_record(model, data):
+def save_record(model, data, links=None):
     new_record = model(**data)
     db.session.add(new_record)
+    if links:
+        db.session.flush()  # Gera o id antes de gravar as associações
+        save_links(model, {new_record.id: links})
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
-# Função auxiliar para carregar/deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados de uma API externa (SWAPI)
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()  # Verifica se houve erro na resposta
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching from SWAPI: {e}")
-        return None
-
 # Função para buscar filmes da SWAPI e salvar no banco de dados
 def fetch_and_save_films():
-    swapi_data = fetch_from_swapi('films')
-    if swapi_data:
-        for item in swapi_data['results']:
-            print(f"Processing movie: {item['title']}")
-            try:
-                # Convert the release_date from string to a Python date object
-                release_date = datetime.strptime(item["release_date"], "%Y-%m-%d").date()
-
-                movie_data = {
-                    "title": item["title"],
-                    "episode_id": item["episode_id"],
-                    "opening_crawl": item["opening_crawl"],
-                    "director": item["director"],
-                    "producer": item["producer"],
-                    "release_date": release_date,
-                    "characters": json.dumps([]),
-                    "planets": json.dumps([]),
-                    "starships": json.dumps([]),
-                    "vehicles": json.dumps([]),
-                    "species": json.dumps([])
-                }
-                
-                # Evitar duplicatas
-                if not Movie.query.filter_by(title=movie_data['title']).first():
-                    save_record(Movie, movie_data)
-                    print(f"Saved movie: {movie_data['title']}")
-            except Exception as e:
-                print(f"Falha ao salvar filme {item['title']}: {str(e)}")
-    else:
-        print("No data fetched from SWAPI.")
+    return ingest('films')
 
 # Rota para listar todos os filmes e salvar dados da API SWAPI
 @movie_bp.route('/filmes', methods=['GET'])
+@conditional('movies')
+@snapshots.serve(Movie)
+@response_cache.cached('movies')
 def get_filmes():
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Movie.query.first():
-        fetch_and_save_films()
+        pending = warmup.unavailable('films')
+        if pending:
+            return pending
     
-    filmes_list = Movie.query.all()
-    result = [{
-        "id": f.id,
-        "title": f.title,
-        "episode_id": f.episode_id,
-        "opening_crawl": f.opening_crawl,
-        "director": f.director,
-        "producer": f.producer,
-        "release_date": f.release_date,
-        "characters": load_json(f.characters),
-        "planets": load_json(f.planets),
-        "starships": load_json(f.starships),
-        "vehicles": load_json(f.vehicles),
-        "species": load_json(f.species)
-    } for f in filmes_list]
-    return jsonify(result)
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Movie, filters=FILTERS)
+
+    # Busca os filmes do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Movie, filters=FILTERS)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para buscar um filme específico pelo ID
 @movie_bp.route('/filmes/<int:id>', methods=['GET'])
+@conditional('movies')
+@response_cache.cached('movies')
 def get_filme(id):
     f = Movie.query.get(id)
     if not f:
         abort(404, description="filme não encontrado")
 
-    return jsonify({
-        "id": f.id,
-        "title": f.title,
-        "episode_id": f.episode_id,
-        "opening_crawl": f.opening_crawl,
-        "director": f.director,
-        "producer": f.producer,
-        "release_date": f.release_date,
-        "characters": load_json(f.characters),
-        "planets": load_json(f.planets),
-        "starships": load_json(f.starships),
-        "vehicles": load_json(f.vehicles),
-        "species": load_json(f.species)
-    })
+    return jsonify(serialize_one(Movie, f))
 
 # Rota para adicionar um novo filme manualmente ao banco de dados
 @movie_bp.route('/filmes', methods=['POST'])
 def save_filme():
     data = request.json
     try:
-        # Convertendo campos para JSON quando necessário
-        data['characters'] = json.dumps(data.get('characters', []))
-        data['planets'] = json.dumps(data.get('planets', []))
-        data['starships'] = json.dumps(data.get('starships', []))
-        data['vehicles'] = json.dumps(data.get('vehicles', []))
-        data['species'] = json.dumps(data.get('species', []))
+        # Separa as relações (URLs ou ids), gravadas nas tabelas de associação
+        links = pop_links(Movie, data)
 
         # Converte a data de lançamento para objeto datetime
         data['release_date'] = datetime.strptime(data['release_date'], "%Y-%m-%d").date()
 
-        new_filme = save_record(Movie, data)
+        new_filme = save_record(Movie, data, links)
         return jsonify({"message": "Filme salvo com sucesso!", "id": new_filme.id}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Rota para salvar filmes em lote (array JSON ou NDJSON), com o resultado de cada item
+@movie_bp.route('/filmes/bulk', methods=['POST'])
+def save_filmes_bulk():
+    return bulk_create(Movie)
+
+# Rota para deletar filmes em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@movie_bp.route('/filmes/bulk', methods=['DELETE'])
+def delete_filmes_bulk():
+    return bulk_delete(Movie)
+
 # Rota para deletar um filme pelo ID
 @movie_bp.route('/filmes/<int:id>', methods=['DELETE'])
 def delete_filme(id):
@@ -153,6 +114,9 @@ def delete_filme(id):
     if not f:
         return jsonify({"error": "Filme não encontrado"}), 404
 
+    delete_links(Movie, f.id)  # Remove também as associações do registro
     db.session.delete(f)
+    touch(Movie)
     db.session.commit()
+    response_cache.invalidate_model(Movie)
     return jsonify({"message": "Filme deletado com sucesso!"})
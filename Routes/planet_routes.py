@@ -16,110 +16,73 @@
 # -----------------------------------------------------------------------------
 
 from flask import Blueprint, jsonify, request, abort
-from models import db, Planet
-import json
-import requests  # Para futuras requisições à SWAPI (seguindo o mesmo padrão do código de personagens)
+from models import db, Planet, delete_links
+from cache import response_cache
+from normalize import normalize_record
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, stream, wants_stream
 
 # Criação do Blueprint
 planet_bp = Blueprint('planets', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+FILTERS = ('climate', 'terrain', 'gravity', 'rotation_period', 'orbital_period', 'diameter', 'surface_water', 'population')
+
 # Função auxiliar para salvar um novo registro
 def save_record(model, data):
     try:
+        normalize_record(model, data)  # Campos numéricos da SWAPI ("1,000", "unknown", ...)
         new_record = model(**data)
         db.session.add(new_record)
+        touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
         db.session.commit()
+        response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
         return new_record
     except Exception as e:
         db.session.rollback()
         raise Exception(f"Erro ao salvar o registro: {str(e)}")
 
-# Função auxiliar para deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados externos (exemplo da SWAPI)
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()  # Verifica erros na resposta
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Erro ao buscar da SWAPI: {e}")
-        return None
-
 # Função para buscar planetas da SWAPI e salvar no banco de dados
 def fetch_and_save_planets():
-    swapi_data = fetch_from_swapi('planets')
-    if swapi_data:
-        for item in swapi_data['results']:
-            planet_data = {
-                "name": item["name"],
-                "rotation_period": item["rotation_period"],
-                "orbital_period": item["orbital_period"],
-                "diameter": item["diameter"],
-                "climate": item.get("climate"),
-                "gravity": item.get("gravity"),
-                "terrain": item.get("terrain"),
-                "surface_water": item.get("surface_water"),
-                "population": item.get("population")
-            }
-            try:
-                # Evitar duplicatas: verifica se o planeta já está salvo
-                if not Planet.query.filter_by(name=planet_data['name']).first():
-                    save_record(Planet, planet_data)
-            except Exception as e:
-                print(f"Falha ao salvar planeta {item['name']}: {str(e)}")
+    return ingest('planets')
 
-# Rota para listar todos os planetas (e buscar da SWAPI se o banco de dados estiver vazio)
+# Rota para listar todos os planetas (o banco é carregado da SWAPI em segundo plano)
 @planet_bp.route('/planetas', methods=['GET'])
+@conditional('planets')
+@snapshots.serve(Planet)
+@response_cache.cached('planets')
 def get_planetas():
-    # Verifica se há planetas no banco de dados local, caso contrário busca da SWAPI
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Planet.query.first():
-        fetch_and_save_planets()
+        pending = warmup.unavailable('planets')
+        if pending:
+            return pending
     
-    # Agora busca todos os planetas do banco de dados
-    planetas_list = Planet.query.all()
-    if not planetas_list:
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Planet, filters=FILTERS)
+
+    # Busca os planetas do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Planet, filters=FILTERS)
+    if not result and not request.args:
         abort(404, description="Nenhum planeta encontrado")
 
-    result = [{
-        "id": p.id,
-        "name": p.name,
-        "rotation_period": p.rotation_period,
-        "orbital_period": p.orbital_period,
-        "diameter": p.diameter,
-        "climate": p.climate,
-        "gravity": p.gravity,
-        "terrain": p.terrain,
-        "surface_water": p.surface_water,
-        "population": p.population
-    } for p in planetas_list]
-    
-    return jsonify(result)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para retornar um planeta específico pelo ID
 @planet_bp.route('/planetas/<int:id>', methods=['GET'])
+@conditional('planets')
+@response_cache.cached('planets')
 def get_planeta(id):
     p = Planet.query.get(id)
     if not p:
         abort(404, description="Planeta não encontrado")
     
-    return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "rotation_period": p.rotation_period,
-        "orbital_period": p.orbital_period,
-        "diameter": p.diameter,
-        "climate": p.climate,
-        "gravity": p.gravity,
-        "terrain": p.terrain,
-        "surface_water": p.surface_water,
-        "population": p.population
-    })
+    return jsonify(p.to_dict())
 
 # Rota para salvar um planeta no banco de dados
 @planet_bp.route('/planetas', methods=['POST'])
@@ -131,6 +94,16 @@ def save_planeta():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Rota para salvar planetas em lote (array JSON ou NDJSON), com o resultado de cada item
+@planet_bp.route('/planetas/bulk', methods=['POST'])
+def save_planetas_bulk():
+    return bulk_create(Planet)
+
+# Rota para deletar planetas em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@planet_bp.route('/planetas/bulk', methods=['DELETE'])
+def delete_planetas_bulk():
+    return bulk_delete(Planet)
+
 # Rota para deletar um planeta pelo ID
 @planet_bp.route('/planetas/<int:id>', methods=['DELETE'])
 def delete_planeta(id):
@@ -139,8 +112,11 @@ def delete_planeta(id):
         abort(404, description="Planeta não encontrado")
     
     try:
+        delete_links(Planet, p.id)  # Remove também as associações do registro
         db.session.delete(p)
+        touch(Planet)
         db.session.commit()
+        response_cache.invalidate_model(Planet)
         return jsonify({"message": "Planeta deletado com sucesso!"})
     except Exception as e:
         db.session.rollback()
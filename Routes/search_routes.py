@@ -0,0 +1,37 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este código implementa a rota de busca textual em todos os recursos do
+# universo Star Wars (personagens, filmes, planetas, espécies, naves e
+# veículos). A busca usa o índice FTS5 do SQLite, com ordenação por relevância
+# (bm25), busca por prefixo e trechos destacados.
+#
+# English Version:
+# This code implements the full-text search route across all Star Wars
+# resources (characters, films, planets, species, starships and vehicles).
+# Search uses SQLite's FTS5 index, with relevance ranking (bm25), prefix
+# matching and highlighted snippets.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+from flask import Blueprint, abort, jsonify, request
+from listing import int_arg
+from search import DEFAULT_LIMIT, MAX_LIMIT, RESOURCE_CODES, search
+
+# Criação do Blueprint
+search_bp = Blueprint('search', __name__)
+
+# Rota de busca: /busca?q=sky&resource=people&limit=10
+@search_bp.route('/busca', methods=['GET'])
+def busca():
+    q = request.args.get('q', '').strip()
+    if not q:
+        abort(400, description="Informe o texto da busca em ?q=")
+
+    resource = request.args.get('resource')
+    if resource and resource not in RESOURCE_CODES:
+        abort(400, description=f"Recurso inválido: {resource} (use {', '.join(RESOURCE_CODES)})")
+
+    limit = min(max(int_arg('limit') or DEFAULT_LIMIT, 1), MAX_LIMIT)
+    return jsonify(search(q, resource, limit))
@@ -16,123 +16,67 @@
 # -----------------------------------------------------------------------------
 
 from flask import Blueprint, jsonify, request, abort
-import requests
 import json
-from models import db, Species
+from models import db, Species, delete_links
+from cache import response_cache
+from normalize import normalize_record
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, serialize_one, stream, wants_stream
 
 # Criação do Blueprint
 species_bp = Blueprint('species', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+FILTERS = ('classification', 'designation', 'language', 'homeworld', 'average_height', 'average_lifespan')
+
 # Função auxiliar para salvar um novo registro
 def save_record(model, data):
+    normalize_record(model, data)  # Campos numéricos da SWAPI ("1,000", "unknown", ...)
     new_record = model(**data)
     db.session.add(new_record)
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
-# Função auxiliar para deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados da SWAPI
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching from SWAPI: {e}")
-        return None
-
-# Função auxiliar para converter valores não numéricos para None
-def convert_to_float(value):
-    try:
-        if value.lower() == 'n/a':
-            return None
-        return float(value)
-    except (ValueError, AttributeError):
-        return None
-
-# Função para buscar todas as páginas de espécies da SWAPI e salvar no banco de dados
+# Função para buscar espécies da SWAPI e salvar no banco de dados
 def fetch_and_save_species():
-    url = 'https://swapi.dev/api/species/'
-    while url:
-        response = requests.get(url)
-        if response.status_code == 200:
-            swapi_data = response.json()
-            if swapi_data and 'results' in swapi_data:
-                for item in swapi_data['results']:
-                    species_data = {
-                        "name": item["name"],
-                        "classification": item.get("classification"),
-                        "designation": item.get("designation"),
-                        "average_height": convert_to_float(item.get("average_height")),
-                        "skin_colors": json.dumps(item.get("skin_colors", [])),
-                        "hair_colors": json.dumps(item.get("hair_colors", [])),
-                        "eye_colors": json.dumps(item.get("eye_colors", [])),
-                        "average_lifespan": convert_to_float(item.get("average_lifespan")),
-                        "language": item.get("language"),
-                        "homeworld": item.get("homeworld")  # Caso o campo esteja no banco
-                    }
-                    try:
-                        # Evitar duplicatas: verifica se a espécie já está salva
-                        if not Species.query.filter_by(name=species_data['name']).first():
-                            save_record(Species, species_data)
-                    except Exception as e:
-                        print(f"Falha ao salvar espécie {item['name']}: {str(e)}")
-            
-            # Atualiza a URL para a próxima página
-            url = swapi_data.get('next')
-        else:
-            print(f"Erro ao acessar a SWAPI: {response.status_code}")
-            break
-
-# Rota para listar todas as espécies (e buscar da SWAPI se o banco de dados estiver vazio)
+    return ingest('species')
+
+# Rota para listar todas as espécies (o banco é carregado da SWAPI em segundo plano)
 @species_bp.route('/especies', methods=['GET'])
+@conditional('species')
+@snapshots.serve(Species)
+@response_cache.cached('species')
 def get_species():
-    # Verifica se há espécies no banco de dados local, caso contrário busca da SWAPI
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Species.query.first():
-        fetch_and_save_species()
-
-    # Agora busca todas as espécies do banco de dados
-    species_list = Species.query.all()
-    result = [{
-        "id": s.id,
-        "name": s.name,
-        "classification": s.classification,
-        "designation": s.designation,
-        "average_height": s.average_height,
-        "skin_colors": load_json(s.skin_colors),
-        "hair_colors": load_json(s.hair_colors),
-        "eye_colors": load_json(s.eye_colors),
-        "average_lifespan": s.average_lifespan,
-        "language": s.language
-    } for s in species_list]
-
-    return jsonify(result)
+        pending = warmup.unavailable('species')
+        if pending:
+            return pending
+
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Species, filters=FILTERS)
+
+    # Busca as espécies do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Species, filters=FILTERS)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para retornar uma espécie específica pelo ID
 @species_bp.route('/especies/<int:id>', methods=['GET'])
+@conditional('species')
+@response_cache.cached('species')
 def get_species_by_id(id):
     s = Species.query.get(id)
     if not s:
         abort(404, description="Espécie não encontrada")
 
-    return jsonify({
-        "id": s.id,
-        "name": s.name,
-        "classification": s.classification,
-        "designation": s.designation,
-        "average_height": s.average_height,
-        "skin_colors": load_json(s.skin_colors),
-        "hair_colors": load_json(s.hair_colors),
-        "eye_colors": load_json(s.eye_colors),
-        "average_lifespan": s.average_lifespan,
-        "language": s.language
-    })
+    return jsonify(serialize_one(Species, s))
 
 # Rota para salvar uma nova espécie no banco de dados
 @species_bp.route('/especies', methods=['POST'])
@@ -149,6 +93,16 @@ def save_species():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Rota para salvar espécies em lote (array JSON ou NDJSON), com o resultado de cada item
+@species_bp.route('/especies/bulk', methods=['POST'])
+def save_species_bulk():
+    return bulk_create(Species)
+
+# Rota para deletar espécies em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@species_bp.route('/especies/bulk', methods=['DELETE'])
+def delete_species_bulk():
+    return bulk_delete(Species)
+
 # Rota para deletar uma espécie pelo ID
 @species_bp.route('/especies/<int:id>', methods=['DELETE'])
 def delete_species(id):
@@ -156,6 +110,9 @@ def delete_species(id):
     if not s:
         abort(404, description="Espécie não encontrada")
 
+    delete_links(Species, s.id)  # Remove também as associações do registro
     db.session.delete(s)
+    touch(Species)
     db.session.commit()
+    response_cache.invalidate_model(Species)
     return jsonify({"message": "Espécie deletada com sucesso!"})
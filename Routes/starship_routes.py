@@ -16,135 +16,66 @@
 # -----------------------------------------------------------------------------
 
 from flask import Blueprint, jsonify, request, abort
-from models import db, Starship
-import requests
-import json
+from models import db, Starship, delete_links
+from cache import response_cache
+from normalize import normalize_record
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, stream, wants_stream
 
 # Criação do Blueprint
 starship_bp = Blueprint('starships', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+FILTERS = ('starship_class', 'manufacturer', 'model', 'cost_in_credits', 'length', 'max_atmosphering_speed', 'crew', 'passengers', 'cargo_capacity', 'hyperdrive_rating', 'MGLT')
+
 # Função auxiliar para salvar um novo registro
 def save_record(model, data):
+    normalize_record(model, data)  # Campos numéricos da SWAPI ("1,000", "unknown", ...)
     new_record = model(**data)
     db.session.add(new_record)
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
-# Função auxiliar para deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados da SWAPI
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()  # Verifica erros na resposta
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching from SWAPI: {e}")
-        return None
-
-# Função auxiliar para converter valores
-def convert_value(value):
-    if isinstance(value, str):
-        value = value.replace(',', '')  # Remove vírgulas
-        if value.isdigit():
-            return int(value)  # Converte para inteiro
-        try:
-            return float(value)  # Converte para float
-        except ValueError:
-            return value  # Retorna o valor original se não puder converter
-    return value
-
 # Função para buscar naves da SWAPI e salvar no banco de dados
 def fetch_and_save_starships():
-    next_url = 'starships'
-    while next_url:
-        swapi_data = fetch_from_swapi(next_url)
-        if swapi_data:
-            for item in swapi_data['results']:
-                starship_data = {
-                    "name": item["name"],
-                    "model": item["model"],
-                    "manufacturer": item["manufacturer"],
-                    "cost_in_credits": convert_value(item.get("cost_in_credits")),
-                    "length": convert_value(item.get("length")),
-                    "max_atmosphering_speed": convert_value(item.get("max_atmosphering_speed")),
-                    "crew": convert_value(item.get("crew")),
-                    "passengers": convert_value(item.get("passengers")),
-                    "cargo_capacity": convert_value(item.get("cargo_capacity")),
-                    "consumables": item.get("consumables"),
-                    "hyperdrive_rating": convert_value(item.get("hyperdrive_rating")),
-                    "MGLT": convert_value(item.get("MGLT")),
-                    "starship_class": item.get("starship_class"),
-                }
-                try:
-                    # Evitar duplicatas: verifica se a nave já está salva
-                    if not Starship.query.filter_by(name=starship_data['name']).first():
-                        save_record(Starship, starship_data)
-                        print(f"Nave {starship_data['name']} salva com sucesso.")
-                    else:
-                        print(f"Nave {starship_data['name']} já existe no banco de dados.")
-                except Exception as e:
-                    print(f"Falha ao salvar nave {item['name']}: {str(e)}")
-            next_url = swapi_data.get('next')  # Verifica se há uma próxima página
-        else:
-            break
+    return ingest('starships')
 
-# Rota para listar todas as naves (e buscar da SWAPI se o banco de dados estiver vazio)
+# Rota para listar todas as naves (o banco é carregado da SWAPI em segundo plano)
 @starship_bp.route('/naves', methods=['GET'])
+@conditional('starships')
+@snapshots.serve(Starship)
+@response_cache.cached('starships')
 def get_naves():
-    # Verifica se há naves no banco de dados local, caso contrário busca da SWAPI
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Starship.query.first():
-        fetch_and_save_starships()
-    
-    # Agora busca todas as naves do banco de dados
-    naves_list = Starship.query.all()
-    result = [{
-        "id": n.id,
-        "name": n.name,
-        "model": n.model,
-        "manufacturer": n.manufacturer,
-        "cost_in_credits": n.cost_in_credits,
-        "length": n.length,
-        "max_atmosphering_speed": n.max_atmosphering_speed,
-        "crew": n.crew,
-        "passengers": n.passengers,
-        "cargo_capacity": n.cargo_capacity,
-        "consumables": n.consumables,
-        "hyperdrive_rating": n.hyperdrive_rating,
-        "MGLT": n.MGLT,
-        "starship_class": n.starship_class
-    } for n in naves_list]
+        pending = warmup.unavailable('starships')
+        if pending:
+            return pending
     
-    return jsonify(result)
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Starship, filters=FILTERS)
+
+    # Busca as naves do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Starship, filters=FILTERS)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para retornar uma nave específica pelo ID
 @starship_bp.route('/naves/<int:id>', methods=['GET'])
+@conditional('starships')
+@response_cache.cached('starships')
 def get_nave(id):
     n = Starship.query.get(id)
     if not n:
         abort(404, description="Nave não encontrada")
     
-    return jsonify({
-        "id": n.id,
-        "name": n.name,
-        "model": n.model,
-        "manufacturer": n.manufacturer,
-        "cost_in_credits": n.cost_in_credits,
-        "length": n.length,
-        "max_atmosphering_speed": n.max_atmosphering_speed,
-        "crew": n.crew,
-        "passengers": n.passengers,
-        "cargo_capacity": n.cargo_capacity,
-        "consumables": n.consumables,
-        "hyperdrive_rating": n.hyperdrive_rating,
-        "MGLT": n.MGLT,
-        "starship_class": n.starship_class
-    })
+    return jsonify(n.to_dict())
 
 # Rota para salvar uma nave no banco de dados
 @starship_bp.route('/naves', methods=['POST'])
@@ -156,6 +87,16 @@ def save_nave():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Rota para salvar naves em lote (array JSON ou NDJSON), com o resultado de cada item
+@starship_bp.route('/naves/bulk', methods=['POST'])
+def save_naves_bulk():
+    return bulk_create(Starship)
+
+# Rota para deletar naves em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@starship_bp.route('/naves/bulk', methods=['DELETE'])
+def delete_naves_bulk():
+    return bulk_delete(Starship)
+
 # Rota para deletar uma nave pelo ID
 @starship_bp.route('/naves/<int:id>', methods=['DELETE'])
 def delete_nave(id):
@@ -163,6 +104,9 @@ def delete_nave(id):
     if not n:
         abort(404, description="Nave não encontrada")
     
+    delete_links(Starship, n.id)  # Remove também as associações do registro
     db.session.delete(n)
+    touch(Starship)
     db.session.commit()
+    response_cache.invalidate_model(Starship)
     return jsonify({"message": "Nave deletada com sucesso!"})
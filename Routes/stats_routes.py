@@ -0,0 +1,83 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este código implementa a rota de estatísticas agregadas dos recursos do
+# universo Star Wars (/stats/<recurso>), com agrupamento, contagem, soma,
+# média, mínimo, máximo e percentis sobre as colunas numéricas. O cálculo é
+# feito no banco de dados e memorizado pela versão da tabela, substituindo o
+# download das listagens completas para agregação no cliente.
+#
+# English Version:
+# This code implements the aggregate statistics route of the Star Wars
+# resources (/stats/<resource>), with grouping, count, sum, average, minimum,
+# maximum and percentiles over the numeric columns. The computation runs in
+# the database and is memoized by table version, replacing the download of
+# full listings for client-side aggregation.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+from flask import Blueprint, abort, jsonify, request
+from models import RELATIONS
+from normalize import numeric_columns
+from versioning import conditional
+from listing import RESERVED_ARGS, filter_specs, int_arg
+from stats import AGGREGATES, ALIASES, DEFAULT_PERCENTILES, MAX_GROUPS, STATS_RESOURCES, compute, group_columns, stats_memo
+
+# Criação do Blueprint
+stats_bp = Blueprint('stats', __name__)
+
+# Parâmetros da rota (os demais são filtros, como nas listagens)
+STATS_ARGS = {'group_by', 'percentiles', 'p', 'limit', *AGGREGATES}
+
+# Função auxiliar para ler uma lista separada por vírgulas de request.args,
+# restrita aos valores permitidos
+def list_arg(name, allowed):
+    values = [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+    for value in values:
+        if value not in allowed:
+            abort(400, description=f"Coluna inválida em {name}: {value} (use {', '.join(allowed)})")
+    return tuple(dict.fromkeys(values))
+
+# Função auxiliar para ler os percentis de ?p= (números de 0 a 100)
+def points_arg():
+    if 'p' not in request.args:
+        return DEFAULT_PERCENTILES
+    try:
+        points = tuple(dict.fromkeys(float(value) for value in request.args['p'].split(',')))
+    except ValueError:
+        abort(400, description="Percentis inválidos em p (ex.: p=50,90,99)")
+    if not points or not all(0 <= point <= 100 for point in points):
+        abort(400, description="Os percentis devem estar entre 0 e 100")
+    return tuple(int(point) if point.is_integer() else point for point in points)
+
+# Rota de estatísticas: /stats/naves?group_by=starship_class&avg=cost_in_credits&percentiles=cargo_capacity&p=50,90
+# Filtros de igualdade e de faixa (?gender=male, ?population_gt=1000) são aplicados antes da agregação.
+@stats_bp.route('/stats/<resource>', methods=['GET'])
+def get_stats(resource):
+    resource = ALIASES.get(resource, resource)
+    model = STATS_RESOURCES.get(resource)
+    if model is None:
+        abort(404, description=f"Recurso sem estatísticas: {resource}")
+    # ETag/304 pela versão da tabela, como nas listagens
+    return conditional(model.__tablename__)(stats_response)(resource, model)
+
+def stats_response(resource, model):
+    numeric = list(numeric_columns(model))
+    group_by = list_arg('group_by', group_columns(model))
+    aggregates = {name: list_arg(name, numeric) for name in AGGREGATES if name in request.args}
+    percentiles = list_arg('percentiles', numeric)
+    points = points_arg()
+    limit = min(int_arg('limit') or MAX_GROUPS, MAX_GROUPS)
+    filters = group_columns(model) + list(RELATIONS.get(model, {}))
+    specs = filter_specs(model, filters, reserved=RESERVED_ARGS | STATS_ARGS)
+
+    # Chave da memorização: a consulta normalizada (a ordem dos parâmetros não importa)
+    key = tuple(sorted((arg, tuple(values)) for arg, values in request.args.lists()))
+    groups = stats_memo.get(model, key, lambda: compute(
+        model, group_by, aggregates, percentiles, points, specs, limit))
+    return jsonify({
+        "resource": resource,
+        "group_by": list(group_by),
+        "groups": groups,
+    })
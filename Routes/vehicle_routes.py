@@ -15,117 +15,70 @@
 # Copyright © 2024 Rafael Mesquita. All rights reserved.
 # -----------------------------------------------------------------------------
 from flask import Blueprint, jsonify, request, abort
-import requests
-import json
-from datetime import datetime
 
-from models import db, Vehicle
+from models import db, Vehicle, delete_links
+from cache import response_cache
+from normalize import normalize_record
+from snapshots import snapshots
+from versioning import conditional, touch
+from bulk import bulk_create, bulk_delete
+from ingestion import ingest
+from warmup import warmup
+from listing import add_pagination_headers, paginate, stream, wants_stream
 
 # Criação do Blueprint
 vehicle_bp = Blueprint('vehicles', __name__)
 
+# Colunas que aceitam filtros na listagem (igualdade e, nas numéricas, ?coluna_gt=/_gte=/_lt=/_lte=)
+FILTERS = ('vehicle_class', 'manufacturer', 'model', 'cost_in_credits', 'length', 'max_atmosphering_speed',
+           'crew', 'passengers', 'cargo_capacity')
+
 # Função auxiliar para salvar um novo registro
 def save_record(model, data):
     if not all(key in data for key in ('name', 'model')):  # Verificação de campos
         raise ValueError("Dados insuficientes para criar um registro.")
+    normalize_record(model, data)  # Campos numéricos da SWAPI ("1,000", "unknown", ...)
     new_record = model(**data)
     db.session.add(new_record)
+    touch(model)  # Incrementa a versão das tabelas afetadas (ETag)
     db.session.commit()
+    response_cache.invalidate_model(model)  # Descarta as respostas em cache afetadas
     return new_record
 
-# Função auxiliar para deserializar JSON
-def load_json(value):
-    try:
-        return json.loads(value) if value else []
-    except json.JSONDecodeError:
-        return []
-
-# Função auxiliar para buscar dados da SWAPI
-def fetch_from_swapi(endpoint):
-    try:
-        response = requests.get(f"https://swapi.dev/api/{endpoint}/")
-        response.raise_for_status()  # Verifica erros na resposta
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching from SWAPI: {e}")
-        return None
-
 # Função para buscar veículos da SWAPI e salvar no banco de dados
 def fetch_and_save_vehicles():
-    swapi_data = fetch_from_swapi('vehicles')
-    if swapi_data:
-        for item in swapi_data['results']:
-            vehicle_data = {
-                "name": item["name"],
-                "model": item["model"],
-                "manufacturer": item.get("manufacturer"),
-                "cost_in_credits": item.get("cost_in_credits"),
-                "length": item.get("length"),
-                "max_atmosphering_speed": item.get("max_atmosphering_speed"),
-                "crew": item.get("crew"),
-                "passengers": item.get("passengers"),
-                "cargo_capacity": item.get("cargo_capacity"),
-                "consumables": item.get("consumables"),
-                "vehicle_class": item.get("vehicle_class"),
-            }
-            try:
-                # Evitar duplicatas: verifica se o veículo já está salvo
-                if not Vehicle.query.filter_by(name=vehicle_data['name'], model=vehicle_data['model']).first():
-                    save_record(Vehicle, vehicle_data)
-            except Exception as e:
-                print(f"Falha ao salvar veículo {item['name']}: {str(e)}")
+    return ingest('vehicles')
 
-# Rota para listar todos os veículos (e buscar da SWAPI se o banco de dados estiver vazio)
+# Rota para listar todos os veículos (o banco é carregado da SWAPI em segundo plano)
 @vehicle_bp.route('/veiculos', methods=['GET'])
+@conditional('vehicles')
+@snapshots.serve(Vehicle)
+@response_cache.cached('vehicles')
 def get_vehicles():
-    # Verifica se há veículos no banco de dados local, caso contrário busca da SWAPI
+    # Banco vazio: dispara o aquecimento em segundo plano e responde 503 enquanto ele roda
     if not Vehicle.query.first():
-        fetch_and_save_vehicles()
+        pending = warmup.unavailable('vehicles')
+        if pending:
+            return pending
     
-    # Agora busca todos os veículos do banco de dados
-    vehicles_list = Vehicle.query.all()
-    result = [{
-        "id": v.id,
-        "name": v.name,
-        "model": v.model,
-        "manufacturer": v.manufacturer,
-        "cost_in_credits": v.cost_in_credits,
-        "length": v.length,
-        "max_atmosphering_speed": v.max_atmosphering_speed,
-        "crew": v.crew,
-        "passengers": v.passengers,
-        "cargo_capacity": v.cargo_capacity,
-        "consumables": v.consumables,
-        "vehicle_class": v.vehicle_class,
-        "created": v.created.isoformat(),
-        "edited": v.edited.isoformat(),
-    } for v in vehicles_list]
-    
-    return jsonify(result)
+    # Tabelas grandes: envia os registros em NDJSON, à medida que são lidos
+    if wants_stream():
+        return stream(Vehicle, filters=FILTERS)
+
+    # Busca os veículos do banco de dados, com paginação, projeção e filtros
+    result, next_cursor = paginate(Vehicle, filters=FILTERS)
+    return add_pagination_headers(jsonify(result), next_cursor)
 
 # Rota para retornar um veículo específico pelo ID
 @vehicle_bp.route('/veiculos/<int:id>', methods=['GET'])
+@conditional('vehicles')
+@response_cache.cached('vehicles')
 def get_vehicle_by_id(id):
     v = Vehicle.query.get(id)
     if not v:
         abort(404, description="Veículo não encontrado")
     
-    return jsonify({
-        "id": v.id,
-        "name": v.name,
-        "model": v.model,
-        "manufacturer": v.manufacturer,
-        "cost_in_credits": v.cost_in_credits,
-        "length": v.length,
-        "max_atmosphering_speed": v.max_atmosphering_speed,
-        "crew": v.crew,
-        "passengers": v.passengers,
-        "cargo_capacity": v.cargo_capacity,
-        "consumables": v.consumables,
-        "vehicle_class": v.vehicle_class,
-        "created": v.created.isoformat(),
-        "edited": v.edited.isoformat(),
-    })
+    return jsonify(v.to_dict())
 
 # Rota para salvar um novo veículo no banco de dados
 @vehicle_bp.route('/veiculos', methods=['POST'])
@@ -139,6 +92,16 @@ def save_vehicle():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Rota para salvar veículos em lote (array JSON ou NDJSON), com o resultado de cada item
+@vehicle_bp.route('/veiculos/bulk', methods=['POST'])
+def save_vehicles_bulk():
+    return bulk_create(Vehicle, required=('name', 'model'))
+
+# Rota para deletar veículos em lote pelos ids (array JSON, {"ids": [...]} ou ?ids=1,2,3)
+@vehicle_bp.route('/veiculos/bulk', methods=['DELETE'])
+def delete_vehicles_bulk():
+    return bulk_delete(Vehicle)
+
 # Rota para deletar um veículo pelo ID
 @vehicle_bp.route('/veiculos/<int:id>', methods=['DELETE'])
 def delete_vehicle(id):
@@ -146,6 +109,9 @@ def delete_vehicle(id):
     if not v:
         abort(404, description="Veículo não encontrado")
     
+    delete_links(Vehicle, v.id)  # Remove também as associações do registro
     db.session.delete(v)
+    touch(Vehicle)
     db.session.commit()
+    response_cache.invalidate_model(Vehicle)
     return jsonify({"message": "Veículo deletado com sucesso!"})
@@ -0,0 +1,549 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Medições de desempenho reproduzíveis de todas as rotas da aplicação. O banco
+# do perfil bench é preenchido com um catálogo sintético do tamanho pedido
+# (1k, 100k ou 1m registros por recurso, ou um número qualquer), gerado com
+# uma semente fixa e reaproveitado entre execuções. Cada rota dos Blueprints é
+# chamada pelo cliente de testes do Flask (sem rede) e por um servidor WSGI
+# real (werkzeug, com várias conexões simultâneas), durante um tempo fixo por
+# caso. São medidos a vazão, as latências p50/p99 e o pico de memória (RSS) de
+# cada caso, com o aumento sobre a memória residente no início dele.
+# O resultado é gravado em JSON, com o commit atual, para comparação entre
+# versões: --compare aponta as regressões acima da tolerância e termina com
+# código 1.
+#
+# Uso: python bench.py --size 100k --duration 2 --compare instance/bench/<base>.json
+#
+# English Version:
+# Reproducible performance measurements of every application route. The bench
+# profile database is filled with a synthetic catalog of the requested size
+# (1k, 100k or 1m records per resource, or any number), generated with a fixed
+# seed and reused between runs. Every Blueprint route is called through the
+# Flask test client (no network) and through a real WSGI server (werkzeug,
+# with several concurrent connections), for a fixed time per case. Throughput,
+# p50/p99 latencies and the peak memory (RSS) of each case, with its growth
+# over the resident memory at the start of the case, are measured. The result
+# is written as JSON, with the current commit, for comparison across versions:
+# --compare reports the regressions above the tolerance and exits with code 1.
+#
+# Usage: python bench.py --size 100k --duration 2 --compare instance/bench/<base>.json
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+from sqlalchemy import Date, DateTime, Float, Integer, String, Text, delete, func, insert, select, text
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from bulk import complete_rows
+from columnar import percentile
+from config import basedir
+from models import (db, Character, Favorite, Movie, Planet, Species, Starship, Vehicle,
+                    FAVORITE_REFERENCES, NATURAL_KEYS, REFERENCES, RELATIONS, delete_links, resource_url)
+from Routes import create_app, init_db
+from search import SEARCH_RESOURCES, SEARCH_TABLE, populate_statement, trigger_statements
+from stats import STATS_RESOURCES, group_columns
+from versioning import touch
+
+try:
+    import resource
+except ImportError:  # Windows: sem medição de RSS
+    resource = None
+
+# Tamanhos nomeados dos catálogos (registros por recurso)
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Semente do gerador dos dados e das requisições
+SEED = 42
+
+# Registros por executemany na carga do catálogo
+BATCH_SIZE = 10000
+
+# Vocabulário dos campos de texto (poucos valores: agrupamentos e filtros realistas)
+WORDS = ('arid', 'blue', 'corellia', 'droid', 'empire', 'frozen', 'galactic', 'hutt',
+         'ion', 'jedi', 'kessel', 'light', 'mandalore', 'naboo', 'outer', 'rebel')
+
+# Associações por registro do lado dono da relação (mínimo, máximo)
+LINKS_PER_ROW = {Character: (1, 3), Movie: (5, 20)}
+
+# Itens por requisição nas rotas em lote
+BULK_ITEMS = 100
+
+# Rotas de cada modelo: listagem, detalhe, criação e exclusão
+RESOURCE_ROUTES = {
+    Character: ('/personagens', '/personagens/<int:id>', '/personagem/salvar', '/personagens/<int:id>'),
+    Movie: ('/filmes', '/filmes/<int:id>', '/filmes', '/filmes/<int:id>'),
+    Planet: ('/planetas', '/planetas/<int:id>', '/planetas', '/planetas/<int:id>'),
+    Starship: ('/naves', '/naves/<int:id>', '/naves', '/naves/<int:id>'),
+    Species: ('/especies', '/especies/<int:id>', '/especies', '/especies/<int:id>'),
+    Vehicle: ('/veiculos', '/veiculos/<int:id>', '/veiculos', '/veiculos/<int:id>'),
+    Favorite: ('/favorito', '/favorito/<int:id>', '/favorito/save', '/favorito/delete/<int:id>'),
+}
+
+# Rotas do Blueprint de favoritos em lote (as demais seguem /<listagem>/bulk)
+BULK_ROUTES = {Favorite: '/favorito/bulk'}
+
+
+# -----------------------------------------------------------------------------
+# Catálogo sintético
+# -----------------------------------------------------------------------------
+
+# Quantidade de registros de cada modelo para um tamanho de catálogo
+def catalog_counts(size):
+    counts = {model: size for model in (Planet, Species, Starship, Vehicle, Character)}
+    counts[Movie] = max(6, size // 100)
+    counts[Favorite] = max(10, size // 100)
+    return counts
+
+# Valor sintético de uma coluna, conforme o tipo
+def synthetic_value(model, column, index, rng, counts):
+    if column.key == 'swapi_id':
+        return None  # Registros criados localmente
+    if column.key in NATURAL_KEYS.get(model, ())[:1]:
+        return f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {index}"  # Único
+    if column.key in REFERENCES.get(model, {}):
+        target = REFERENCES[model][column.key]
+        return resource_url(SEARCH_RESOURCES[target][1], rng.randint(1, counts[target]))
+    for target, key in FAVORITE_REFERENCES.items():
+        if key == column.key:
+            return rng.randint(1, counts[target])
+    if column.info.get('json'):
+        return json.dumps(rng.sample(WORDS, 2))
+    nullable = column.nullable and rng.random() < 0.05  # Alguns valores desconhecidos
+    if isinstance(column.type, DateTime):
+        return datetime(2014, 12, 9) + timedelta(seconds=index)
+    if isinstance(column.type, Date):
+        return date(1977, 5, 25) + timedelta(days=rng.randint(0, 20000))
+    if isinstance(column.type, Integer):
+        return None if nullable else rng.randint(0, 100000)
+    if isinstance(column.type, Float):
+        return None if nullable else round(rng.uniform(0, 1000), 2)
+    if isinstance(column.type, Text):
+        return ' '.join(rng.choices(WORDS, k=40))
+    if isinstance(column.type, String):
+        return rng.choice(WORDS)
+    return None
+
+# Registro sintético de um modelo (index: id e sufixo único do nome)
+def synthetic_row(model, index, rng, counts, with_id=True):
+    row = {column.key: synthetic_value(model, column, index, rng, counts)
+           for column in model.__table__.columns if not column.primary_key}
+    if with_id:
+        row['id'] = index
+        if 'swapi_id' in row:
+            row['swapi_id'] = index  # Catálogo semeado: como se viesse da SWAPI
+    return row
+
+# Tabelas de associação e o lado que as gera (a primeira relação que usa a tabela)
+def link_tables():
+    tables = {}
+    for owner, relations in RELATIONS.items():
+        for table, own, other, target, _ in relations.values():
+            tables.setdefault(table, (owner, own, other, target))
+    return tables
+
+# O catálogo já está no banco (mesmas quantidades)?
+def seeded(counts):
+    return all(db.session.execute(select(func.count()).select_from(model)).scalar() == count
+               for model, count in counts.items())
+
+# Preenche o banco com o catálogo. Os triggers da busca são removidos durante
+# a carga e o índice é montado uma única vez no final.
+def seed(counts, rng):
+    tables = [model.__table__ for model in counts] + list(link_tables())
+    with db.engine.begin() as connection:
+        for table in reversed(tables):
+            connection.execute(table.delete())
+        for model in SEARCH_RESOURCES:
+            for event in ('insert', 'update', 'delete'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {model.__tablename__}_search_{event}"))
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        for model, count in counts.items():
+            for start in range(1, count + 1, BATCH_SIZE):
+                rows = [synthetic_row(model, index, rng, counts) for index in range(start, min(start + BATCH_SIZE, count + 1))]
+                connection.execute(insert(model.__table__), complete_rows(model, rows))
+        for table, (owner, own, other, target) in link_tables().items():
+            low, high = LINKS_PER_ROW[owner]
+            rows = []
+            for id in range(1, counts[owner] + 1):
+                targets = {rng.randint(1, counts[target]) for _ in range(rng.randint(low, high))}
+                rows.extend({own: id, other: target_id} for target_id in targets)
+                if len(rows) >= BATCH_SIZE:
+                    connection.execute(table.insert(), rows)
+                    rows = []
+            if rows:
+                connection.execute(table.insert(), rows)
+        for model in SEARCH_RESOURCES:
+            connection.execute(text(populate_statement(model)))
+            for statement in trigger_statements(model):
+                connection.execute(text(statement))
+    for model in counts:
+        touch(model)  # Nova versão: snapshots e caches de uma carga anterior deixam de valer
+    db.session.commit()
+
+# Remove os registros criados pelos casos de gravação que não foram excluídos
+def cleanup(counts):
+    for model, count in counts.items():
+        ids = db.session.execute(select(model.id).where(model.id > count)).scalars().all()
+        if ids:
+            delete_links(model, *ids)
+            db.session.execute(delete(model).where(model.id.in_(ids)))
+            touch(model)
+    db.session.commit()
+
+
+# -----------------------------------------------------------------------------
+# Casos medidos
+# -----------------------------------------------------------------------------
+
+# Um caso: método, rota (regra do Flask) e gerador da requisição. request()
+# devolve (url, corpo JSON) ou None quando não há mais o que pedir (ex.: ids
+# para excluir). label distingue casos da mesma rota (ex.: ?stream=1).
+class Case:
+    def __init__(self, method, rule, request, label=None, accept='application/json', created=None):
+        self.method = method
+        self.rule = rule
+        self.request = request
+        self.label = label or rule
+        self.accept = accept
+        self.created = created  # Lista que recebe os ids criados (usada pelas exclusões)
+
+    @property
+    def name(self):
+        return f"{self.method} {self.label}"
+
+    # Guarda os ids devolvidos por uma criação (simples ou em lote)
+    def collect(self, status, data):
+        if self.created is None or status >= 400 or not isinstance(data, dict):
+            return
+        if 'id' in data:
+            self.created.append(data['id'])
+        else:
+            self.created.append([result['id'] for result in data.get('results', []) if 'id' in result])
+
+def pop(items):
+    try:
+        return items.pop()
+    except IndexError:
+        return None
+
+# Corpo de uma criação: registro sintético sem id e sem as datas de controle
+def request_row(model, index, rng, counts):
+    row = synthetic_row(model, index, rng, counts, with_id=False)
+    return {key: value.isoformat() if isinstance(value, date) else value
+            for key, value in row.items() if not isinstance(value, datetime)}
+
+# Coluna de texto usada no agrupamento das estatísticas de um modelo
+def group_column(model):
+    return next(name for name in group_columns(model)
+                if isinstance(model.__table__.c[name].type, String) and not isinstance(model.__table__.c[name].type, Text)
+                and name not in NATURAL_KEYS[model] and name not in REFERENCES.get(model, {}))
+
+# Casos de todas as rotas: primeiro as leituras, depois as gravações (que
+# invalidam caches e mudam as versões das tabelas)
+def build_cases(app, counts, rng):
+    suffixes = itertools.count(10 ** 8)  # Nomes criados sem colidir com o catálogo
+    reads, writes = [], []
+    for model, (listing, detail, create, remove) in RESOURCE_ROUTES.items():
+        bulk = BULK_ROUTES.get(model, f"{listing}/bulk")
+        created, created_bulk = [], []
+        new_row = lambda model=model: request_row(model, next(suffixes), rng, counts)
+        random_id = lambda detail=detail, count=counts[model]: detail.replace('<int:id>', str(rng.randint(1, count)))
+        reads += [
+            Case('GET', listing, lambda url=f"{listing}?limit=100": (url, None)),
+            Case('GET', listing, lambda url=f"{listing}?stream=1": (url, None), label=f"{listing}?stream=1",
+                 accept='application/x-ndjson'),
+            Case('GET', detail, lambda random_id=random_id: (random_id(), None)),
+        ]
+        writes += [
+            Case('POST', create, lambda create=create, new_row=new_row: (create, new_row()), created=created),
+            Case('DELETE', remove, lambda remove=remove, created=created: (
+                (remove.replace('<int:id>', str(id)), None) if (id := pop(created)) else None)),
+            Case('POST', bulk, lambda bulk=bulk, new_row=new_row: (bulk, [new_row() for _ in range(BULK_ITEMS)]),
+                 created=created_bulk),
+            Case('DELETE', bulk, lambda bulk=bulk, created=created_bulk: (
+                (bulk, {"ids": ids}) if (ids := pop(created)) else None)),
+        ]
+    reads.append(Case('GET', '/busca', lambda: (f"/busca?q={rng.choice(WORDS)[:3]}", None)))
+    for name, model in STATS_RESOURCES.items():
+        url = f"/stats/{name}?group_by={group_column(model)}"
+        reads.append(Case('GET', '/stats/<resource>', lambda url=url: (url, None), label=f"/stats/{name}"))
+    # Demais rotas GET sem parâmetros (página inicial, formulários, estado interno)
+    covered = {(case.method, case.rule) for case in reads + writes}
+    for rule in app.url_map.iter_rules():
+        if 'GET' in rule.methods and not rule.arguments and ('GET', rule.rule) not in covered:
+            reads.append(Case('GET', rule.rule, lambda url=rule.rule: (url, None), accept='text/html'))
+    return reads + writes
+
+# Rotas da aplicação que nenhum caso chama
+def uncovered(app, cases):
+    covered = {(case.method, case.rule) for case in cases}
+    return sorted(f"{method} {rule.rule}" for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+                  for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}) if (method, rule.rule) not in covered)
+
+
+# -----------------------------------------------------------------------------
+# Execução
+# -----------------------------------------------------------------------------
+
+# Memória do processo, em KB: (residente atual, pico). No Linux os dois vêm de
+# /proc/self/status (VmRSS e VmHWM); nos demais sistemas só o pico acumulado
+# de getrusage (None onde não há medição).
+def memory():
+    try:
+        with open('/proc/self/status', encoding='ascii') as file:
+            fields = dict(line.split(':', 1) for line in file if line.startswith(('VmRSS', 'VmHWM')))
+        return int(fields['VmRSS'].split()[0]), int(fields['VmHWM'].split()[0])
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is None:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, usage // 1024 if sys.platform == 'darwin' else usage  # macOS informa em bytes
+
+# Início da medição de memória de um caso. O pico do processo é cumulativo:
+# no Linux ele é zerado (/proc/self/clear_refs) e passa a ser o do caso; nos
+# demais sistemas, o caso só aparece quando supera o maior pico anterior.
+# Retorna a base da medição (residente atual, pico).
+def memory_baseline():
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as file:
+            file.write('5')  # Zera o VmHWM
+    except OSError:
+        pass
+    return memory()
+
+# Memória de um caso, a partir da base: pico durante o caso e o aumento do pico
+# sobre a memória residente no início (ou sobre o pico anterior, sem a base)
+def memory_usage(baseline):
+    before, previous = baseline
+    _, peak = memory()
+    start = before if before is not None else previous
+    return {
+        "rss_before_kb": before,
+        "peak_rss_kb": peak,
+        "peak_rss_delta_kb": peak - start if peak is not None and start is not None else None,
+    }
+
+def summary(driver, case, latencies, errors, elapsed, sample, baseline):
+    latencies.sort()
+    return {
+        "driver": driver,
+        "name": case.name,
+        "url": sample,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        **memory_usage(baseline),
+    }
+
+# Cliente de testes do Flask: uma requisição por vez, sem rede
+def run_client(app, case, duration, max_requests):
+    client = app.test_client()
+    latencies, errors, sample = [], 0, None
+    baseline = memory_baseline()
+    started = time.perf_counter()
+    deadline = started + duration
+    while len(latencies) < max_requests and time.perf_counter() < deadline:
+        request = case.request()
+        if request is None:
+            break
+        url, body = request
+        sample = sample or url
+        begin = time.perf_counter()
+        response = client.open(url, method=case.method, json=body, headers={'Accept': case.accept})
+        response.get_data()  # Consome o corpo (inclusive o streaming)
+        latencies.append(time.perf_counter() - begin)
+        errors += response.status_code >= 400
+        case.collect(response.status_code, response.get_json(silent=True))
+    return summary('client', case, latencies, errors, time.perf_counter() - started, sample, baseline)
+
+# Requisições sem registro no terminal
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+# Servidor WSGI real (werkzeug, uma thread por requisição) e concurrency
+# conexões keep-alive simultâneas
+def run_server(base_url, case, duration, max_requests, concurrency):
+    latencies, errors, sample = [], [0], []
+    baseline = memory_baseline()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def worker():
+        session = requests.Session()
+        while len(latencies) < max_requests and time.perf_counter() < deadline:
+            request = case.request()
+            if request is None:
+                return
+            url, body = request
+            if not sample:
+                sample.append(url)
+            begin = time.perf_counter()
+            response = session.request(case.method, base_url + url, json=body, headers={'Accept': case.accept})
+            latencies.append(time.perf_counter() - begin)
+            if response.status_code >= 400:
+                errors[0] += 1
+            try:
+                case.collect(response.status_code, response.json())
+            except ValueError:
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summary('server', case, latencies, errors[0], time.perf_counter() - started, sample[0] if sample else None,
+                   baseline)
+
+# Commit atual (e se há alterações não commitadas), para identificar o resultado
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=basedir, capture_output=True, text=True, check=True)
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=basedir,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.stdout.strip(), bool(status.stdout.strip())
+
+# Compara com um resultado anterior; retorna as regressões acima da tolerância
+def compare(results, baseline, tolerance):
+    previous = {(item['driver'], item['name']): item for item in baseline['results']}
+    regressions = []
+    for item in results:
+        old = previous.get((item['driver'], item['name']))
+        if not old or not old['p99_ms'] or not item['p99_ms']:
+            continue
+        p99 = item['p99_ms'] / old['p99_ms'] - 1
+        throughput = item['throughput_rps'] / old['throughput_rps'] - 1 if old['throughput_rps'] else 0
+        line = f"{item['driver']:6} {item['name']:45} p99 {p99:+7.1%}  vazão {throughput:+7.1%}"
+        if p99 > tolerance or throughput < -tolerance:
+            regressions.append(line)
+            line += "  REGRESSÃO"
+        print(line)
+    return regressions
+
+# Valores de --set CHAVE=VALOR (JSON quando possível: true, 60, "texto")
+def parse_settings(values):
+    settings = {}
+    for value in values:
+        key, _, raw = value.partition('=')
+        try:
+            settings[key] = json.loads(raw)
+        except ValueError:
+            settings[key] = raw
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medições de desempenho das rotas da aplicação")
+    parser.add_argument('--size', default='1k', help="registros por recurso: 1k, 100k, 1m ou um número")
+    parser.add_argument('--driver', choices=('client', 'server', 'both'), default='both')
+    parser.add_argument('--duration', type=float, default=2.0, help="segundos por caso")
+    parser.add_argument('--max-requests', type=int, default=5000, help="limite de requisições por caso")
+    parser.add_argument('--concurrency', type=int, default=8, help="conexões simultâneas no servidor WSGI")
+    parser.add_argument('--only', default='', help="mede só os casos cujo nome contém este texto")
+    parser.add_argument('--set', action='append', default=[], metavar='CHAVE=VALOR',
+                        help="sobrescreve uma configuração (ex.: --set COLUMNAR_STORE=true)")
+    parser.add_argument('--reseed', action='store_true', help="recria o catálogo mesmo se já existir")
+    parser.add_argument('--output', help="arquivo JSON do resultado (padrão: instance/bench/<commit>-<tamanho>.json)")
+    parser.add_argument('--compare', help="resultado anterior para comparação")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="piora aceita no p99 e na vazão (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    size = SIZES.get(args.size.lower()) or int(args.size)
+    counts = catalog_counts(size)
+    settings = parse_settings(args.set)
+    app = create_app('bench', SQLALCHEMY_DATABASE_URI=f'sqlite:///bench-{size}.db', **settings)
+    init_db(app)
+
+    with app.app_context():
+        baseline = memory_baseline()
+        started = time.perf_counter()
+        reused = not args.reseed and seeded(counts)
+        if not reused:
+            print(f"Gerando o catálogo sintético: {size} registros por recurso")
+            seed(counts, random.Random(SEED))
+        seed_seconds = time.perf_counter() - started
+        seed_memory = memory_usage(baseline)
+
+    # Gerador próprio das requisições: a mesma sequência com ou sem nova carga do catálogo
+    cases = [case for case in build_cases(app, counts, random.Random(SEED + 1)) if args.only in case.name]
+    missing = uncovered(app, cases) if not args.only else []
+    for name in missing:
+        print(f"Rota sem caso: {name}")
+
+    results = []
+    drivers = ('client', 'server') if args.driver == 'both' else (args.driver,)
+    for driver in drivers:
+        server = None
+        if driver == 'server':
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+        for case in cases:
+            if driver == 'client':
+                result = run_client(app, case, args.duration, args.max_requests)
+            else:
+                result = run_server(base_url, case, args.duration, args.max_requests, args.concurrency)
+            results.append(result)
+            print(f"{driver:6} {case.name:45} {result['requests']:6} req  {result['throughput_rps'] or 0:9.1f} req/s  "
+                  f"p50 {result['p50_ms'] or 0:8.2f} ms  p99 {result['p99_ms'] or 0:8.2f} ms  erros {result['errors']}")
+        if server:
+            server.shutdown()
+        with app.app_context():
+            cleanup(counts)
+        # Os ids que sobraram já foram removidos e podem ser reutilizados pelo SQLite
+        for case in cases:
+            if case.created is not None:
+                case.created.clear()
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "counts": {model.__tablename__: count for model, count in counts.items()},
+        "seed": {"reused": reused, "seconds": round(seed_seconds, 3), **seed_memory},
+        "settings": dict(args.__dict__, set=settings),
+        "uncovered": missing,
+        "results": results,
+    }
+    output = args.output or os.path.join(basedir, 'instance', 'bench', f"{(commit or 'local')[:12]}-{size}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Resultado gravado em {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressões acima de {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo gera e carrega o pacote offline dos dados da SWAPI, usado para
+# iniciar a aplicação sem acesso à rede. O pacote é um arquivo JSON lines
+# comprimido com gzip. A primeira linha é um cabeçalho com o formato, a versão
+# do esquema (PRAGMA user_version) e a quantidade de linhas de cada tabela.
+# Depois vêm, para cada tabela dos recursos e das associações, uma linha com as
+# colunas e uma linha por registro, com os valores na mesma ordem. A carga
+# insere as linhas em lote (executemany) em uma única transação e atualiza as
+# versões das tabelas; os gatilhos do índice de busca rodam normalmente.
+#
+# English Version:
+# This module dumps and loads the offline bundle of the SWAPI data, used to
+# start the application without network access. The bundle is a gzip
+# compressed JSON lines file. The first line is a header with the format, the
+# schema version (PRAGMA user_version) and the row count of every table. Then,
+# for each resource and association table, come one line with the columns and
+# one line per record, with the values in the same order. Loading inserts the
+# rows in batches (executemany) in a single transaction and bumps the table
+# versions; the search index triggers run as usual.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache import response_cache
+from config import basedir
+from ingestion import RESOURCES
+from models import db, RELATIONS, SyncState
+from versioning import touch
+
+# Identificação e versão do formato do pacote
+BUNDLE_FORMAT = 'swapi-bundle'
+BUNDLE_VERSION = 1
+
+# Caminho padrão do pacote (instance/, ao lado do banco)
+DEFAULT_BUNDLE = os.path.join(basedir, 'instance', 'swapi-bundle.jsonl.gz')
+
+# Linhas por executemany na carga
+BATCH_SIZE = 5000
+
+
+# Modelos dos recursos e tabelas incluídas no pacote (os recursos antes das
+# associações; por último, as marcas d'água da sincronização incremental)
+def bundle_models():
+    return [model for model, _, _ in RESOURCES.values()]
+
+def bundle_tables():
+    tables = [model.__table__ for model in bundle_models()]
+    for relations in RELATIONS.values():
+        for table, _, _, _, _ in relations.values():
+            if table not in tables:
+                tables.append(table)
+    tables.append(SyncState.__table__)
+    return tables
+
+def schema_version():
+    return db.session.execute(text("PRAGMA user_version")).scalar()
+
+# Converte os valores de data das colunas Date/DateTime (gravados em ISO 8601)
+def column_loaders(table, columns):
+    loaders = []
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, DateTime):
+            loaders.append(datetime.fromisoformat)
+        elif isinstance(column_type, Date):
+            loaders.append(date.fromisoformat)
+        else:
+            loaders.append(None)
+    return loaders
+
+def dump_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+# Grava o pacote com o conteúdo atual do banco. Retorna {tabela: linhas}.
+def dump(path=DEFAULT_BUNDLE):
+    tables = bundle_tables()
+    counts = {table.name: db.session.execute(select(func.count()).select_from(table)).scalar() for table in tables}
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "schema": schema_version(),
+        "created": datetime.utcnow().isoformat(),
+        "tables": counts,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(temporary, 'wt', encoding='utf-8') as file:
+        file.write(json.dumps(header) + '\n')
+        for table in tables:
+            columns = [column.name for column in table.columns]
+            file.write(json.dumps({"table": table.name, "columns": columns}) + '\n')
+            statement = select(*table.columns).order_by(*table.primary_key.columns)
+            for row in db.session.execute(statement):
+                file.write(json.dumps([dump_value(value) for value in row], separators=(',', ':')) + '\n')
+    os.replace(temporary, path)  # O pacote anterior só é trocado quando o novo está completo
+    return counts
+
+# Lê o cabeçalho do pacote; ValueError se o formato ou o esquema não forem compatíveis
+def read_header(file):
+    header = json.loads(file.readline() or 'null')
+    if not isinstance(header, dict) or header.get('format') != BUNDLE_FORMAT:
+        raise ValueError("Arquivo não é um pacote da SWAPI")
+    if header.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"Versão do pacote não suportada: {header.get('version')}")
+    if header.get('schema') != schema_version():
+        raise ValueError(f"Pacote gerado para o esquema {header.get('schema')}, o banco está no esquema {schema_version()}")
+    return header
+
+# Tabelas do pacote que já têm registros
+def loaded_tables():
+    return [table.name for table in bundle_tables() if db.session.execute(select(table).limit(1)).first()]
+
+# Carrega o pacote no banco. Tabelas que já têm registros impedem a carga,
+# a não ser com replace=True, que apaga os registros atuais antes.
+# Retorna {tabela: linhas inseridas}.
+def load(path=DEFAULT_BUNDLE, replace=False):
+    tables = {table.name: table for table in bundle_tables()}
+    existing = loaded_tables()
+    if existing and not replace:
+        raise ValueError(f"O banco já tem registros em: {', '.join(existing)}")
+    counts = {}
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            read_header(file)
+            if replace:
+                for table in reversed(list(tables.values())):
+                    db.session.execute(table.delete())
+            table, columns, loaders, batch = None, None, None, []
+            for line in file:
+                value = json.loads(line)
+                if isinstance(value, dict):
+                    flush(table, batch, counts)
+                    table = tables[value['table']]
+                    columns = value['columns']
+                    loaders = column_loaders(table, columns)
+                    counts[table.name] = 0
+                    continue
+                batch.append({name: loader(item) if loader and item is not None else item
+                              for name, loader, item in zip(columns, loaders, value)})
+                if len(batch) >= BATCH_SIZE:
+                    flush(table, batch, counts)
+            flush(table, batch, counts)
+        for model in bundle_models():
+            touch(model)  # Nova versão das tabelas: ETags, snapshots e memórias antigos deixam de valer
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for model in bundle_models():
+        response_cache.invalidate_model(model)
+    return counts
+
+def flush(table, batch, counts):
+    if batch:
+        db.session.execute(table.insert(), batch)
+        counts[table.name] += len(batch)
+        batch.clear()
+
+# Gancho de inicialização: com o banco vazio, carrega o pacote configurado em
+# SWAPI_BUNDLE (se o arquivo existir), sem acessar a SWAPI. Retorna True se carregou.
+# Um pacote ilegível, truncado ou incompatível com o banco não impede a
+# inicialização: a carga é desfeita e os dados vêm da SWAPI, pelo aquecimento.
+def hydrate(app):
+    path = app.config.get('SWAPI_BUNDLE')
+    if not path or not os.path.exists(path):
+        return False
+    with app.app_context():
+        if loaded_tables():
+            return False
+        started = time.perf_counter()
+        try:
+            counts = load(path)
+        except (OSError, EOFError, ValueError, KeyError, SQLAlchemyError) as e:
+            print(f"Falha ao carregar o pacote da SWAPI {path}: {str(e)}")
+            return False
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"Pacote da SWAPI carregado de {path}: {sum(counts.values())} linhas em {elapsed:.0f} ms")
+        return True
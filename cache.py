@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa o cache de leitura em memória das rotas. As respostas
+# GET já serializadas (bytes do JSON/HTML) são guardadas em um LRU com tempo de
+# expiração e limites de entradas e de bytes, por recurso e por consulta. As
+# rotas de gravação e exclusão invalidam as entradas do recurso alterado e dos
+# recursos que o referenciam. A chave inclui a versão da tabela, lida do cache
+# de versões em memória (versioning.version_cache, sem consulta ao banco nos
+# acertos), de modo que gravações feitas por outros processos (workers do
+# serve.py, flask sync) também deixam de ser servidas depois de
+# VERSION_CACHE_TTL segundos. Os contadores de acertos, falhas e remoções
+# ficam disponíveis em /cache.
+#
+# English Version:
+# This module implements the in-memory read cache of the routes. Already
+# serialized GET responses (JSON/HTML bytes) are kept in an LRU with expiration
+# time and entry and byte limits, per resource and per query. Save and delete
+# routes invalidate the entries of the changed resource and of the resources
+# that reference it. The key includes the table version, read from the
+# in-memory version cache (versioning.version_cache, no database query on
+# hits), so writes made by other processes (serve.py workers, flask sync) stop
+# being served too after VERSION_CACHE_TTL seconds. Hit, miss and eviction
+# counters are available at /cache.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from models import related_tables
+from versioning import current_version
+
+# Cabeçalhos da resposta que são guardados junto com o corpo
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor', 'Link')
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # chave -> (expira em, corpo, status, cabeçalhos)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1:]
+
+    def set(self, key, body, status, headers):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, body, status, headers)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.counters['evictions'] += 1
+
+    # Remove todas as entradas dos recursos (namespaces) informados
+    def invalidate(self, *namespaces):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] in namespaces]:
+                self._remove(key)
+                self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries), bytes=self.size,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes, ttl=self.ttl)
+
+    def _remove(self, key):
+        self.size -= len(self.entries.pop(key)[1])
+
+
+# Cache desativado: mesma interface, nada é guardado
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, body, status, headers):
+        pass
+
+    def invalidate(self, *namespaces):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "null"}
+
+
+# Backends disponíveis em CACHE_TYPE
+BACKENDS = {'lru': LRUCache, 'null': NullCache}
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = NullCache()
+
+    # Cria o backend conforme a configuração da aplicação
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('CACHE_TTL', 300)
+        if app.config['CACHE_TYPE'] == 'lru':
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_BYTES'], app.config['CACHE_TTL'])
+        else:
+            self.backend = BACKENDS[app.config['CACHE_TYPE']]()
+
+    # Decorador para rotas GET: responde do cache ou guarda a resposta gerada.
+    # A chave inclui a versão da tabela, o caminho completo (com a query string)
+    # e o cabeçalho Accept. A versão é lida antes das linhas, então o corpo
+    # guardado nunca é mais antigo que ela.
+    def cached(self, namespace):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (namespace, current_version(namespace), request.full_path, request.headers.get('Accept', ''))
+                hit = self.backend.get(key)
+                if hit is not None:
+                    body, status, headers = hit
+                    return Response(body, status=status, headers=headers)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                    self.backend.set(key, response.get_data(), response.status_code, headers)
+                return response
+            return wrapper
+        return decorator
+
+    # Invalida as entradas de um modelo e dos modelos ligados a ele por relações
+    # ou referências (que embutem ou listam os seus dados)
+    def invalidate_model(self, model):
+        self.backend.invalidate(*related_tables(model))
+
+    def stats(self):
+        return self.backend.stats()
+
+
+# Instância compartilhada pelas rotas
+response_cache = ResponseCache()
@@ -0,0 +1,478 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa um armazenamento colunar em memória, opcional
+# (COLUMNAR_STORE), das tabelas dos recursos. Cada coluna numérica é um
+# array.array tipado (int64 ou float64) com uma máscara de nulos, e as demais
+# colunas (texto, datas) são codificadas por dicionário: o array guarda
+# códigos inteiros e cada valor distinto é guardado uma única vez. Com isso a
+# tabela ocupa uma fração da memória de instâncias do ORM, e filtros,
+# ordenação, projeção e agregações percorrem arrays em vez de objetos; com o
+# NumPy instalado, os filtros são vetorizados sobre os mesmos buffers.
+#
+# A cópia é atualizada de forma incremental: a cada consulta, se a versão da
+# tabela (table_versions) mudou, inserções e exclusões são encontradas pela
+# comparação dos ids e as linhas alteradas (atualizações do ORM ou UPDATEs
+# por id, registrados por eventos da sessão) são relidas; só essas linhas
+# saem do banco. Se a versão andou mais do que os incrementos feitos por este
+# processo (outro worker, flask sync, load-bundle também gravou), ou mudou sem
+# nenhuma gravação registrada aqui, a tabela é recarregada por inteiro. As
+# rotas de listagem e de estatísticas usam o armazenamento quando ele está
+# ativado e os filtros pedidos são suportados.
+#
+# English Version:
+# This module implements an optional (COLUMNAR_STORE) in-memory columnar
+# store of the resource tables. Each numeric column is a typed array.array
+# (int64 or float64) with a null mask, and the other columns (text, dates)
+# are dictionary-encoded: the array holds integer codes and every distinct
+# value is stored only once. The table therefore takes a fraction of the
+# memory of ORM instances, and filters, sorting, projection and aggregations
+# walk arrays instead of objects; when NumPy is installed, filters are
+# vectorized over the same buffers.
+#
+# The copy is refreshed incrementally: on each query, if the table version
+# (table_versions) changed, inserts and deletes are found by comparing ids and
+# changed rows (ORM updates or UPDATEs by id, recorded by session events) are
+# read again; only those rows leave the database. If the version moved by more
+# than the bumps made by this process (another worker, flask sync or
+# load-bundle wrote too), or changed with no write recorded here, the table is
+# loaded again in full. The listing and statistics routes use the store when
+# it is enabled and the requested filters are supported.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import bisect
+import math
+import operator
+import sys
+import threading
+from array import array
+
+from sqlalchemy import event, select
+
+from models import db, Character, Movie, Planet, Species, Starship, Vehicle, RoutingSession, IN_BATCH_SIZE
+from versioning import current_version, version_cache
+
+try:
+    import numpy
+except ImportError:  # NumPy é opcional: sem ele, os filtros percorrem os arrays em Python
+    numpy = None
+
+# Modelos mantidos no armazenamento colunar
+COLUMNAR_MODELS = (Character, Movie, Planet, Starship, Species, Vehicle)
+
+# Tipo dos arrays das colunas numéricas
+TYPECODES = {int: 'q', float: 'd'}
+
+# Operadores dos filtros (mesmos nomes de listing.filter_specs)
+OPERATORS = {
+    'eq': operator.eq,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+
+# Quantidade de linhas percorridas por bloco em scan
+SCAN_BLOCK = 4096
+
+# Fração de linhas removidas a partir da qual os arrays são compactados
+COMPACT_RATIO = 0.25
+
+# Marca de que todas as linhas de uma tabela precisam ser relidas
+ALL = object()
+
+
+class ColumnarTable:
+    def __init__(self, model):
+        self.model = model
+        self.keys = tuple(column.key for column in model.__table__.columns)
+        self.typecodes = {}  # coluna numérica -> código do array
+        for column in model.__table__.columns:
+            typecode = TYPECODES.get(column.type.python_type)
+            if typecode and not column.info.get('json'):
+                self.typecodes[column.key] = typecode
+        self.clear()
+
+    def clear(self):
+        self.data = {key: array(self.typecodes.get(key, 'i')) for key in self.keys}
+        self.nulls = {key: bytearray() for key in self.typecodes}  # 1 = nulo
+        self.dictionaries = {key: [None] for key in self.keys if key not in self.typecodes}  # código 0 = nulo
+        self.lookups = {key: {} for key in self.dictionaries}
+        self.alive = bytearray()  # 0 = linha removida
+        self.positions = {}  # id -> posição
+        self.removed = 0
+        self.max_id = None
+        self.ordered = True  # posições em ordem crescente de id
+
+    def __len__(self):
+        return len(self.positions)
+
+    # Código de um valor na coluna codificada por dicionário (cria se não existir)
+    def encode(self, key, value):
+        if value is None:
+            return 0
+        code = self.lookups[key].get(value)
+        if code is None:
+            code = self.lookups[key][value] = len(self.dictionaries[key])
+            self.dictionaries[key].append(value)
+        return code
+
+    # Grava os valores de uma linha na posição informada (None = nova linha no fim)
+    def store(self, values, position=None):
+        append = position is None
+        for key, value in zip(self.keys, values):
+            if key in self.typecodes:
+                null = value is None
+                if not null and self.typecodes[key] == 'q' and not isinstance(value, int):
+                    value = int(value)
+                value = 0 if null else value
+                if append:
+                    self.data[key].append(value)
+                    self.nulls[key].append(null)
+                else:
+                    self.data[key][position] = value
+                    self.nulls[key][position] = null
+            elif append:
+                self.data[key].append(self.encode(key, value))
+            else:
+                self.data[key][position] = self.encode(key, value)
+
+    # Insere ou atualiza linhas (sequências de valores na ordem de self.keys).
+    # As linhas novas são acrescentadas coluna a coluna.
+    def upsert(self, rows):
+        id_index = self.keys.index('id')
+        new = []
+        for values in rows:
+            position = self.positions.get(values[id_index])
+            if position is None:
+                new.append(values)
+            else:
+                self.store(values, position)
+        if not new:
+            return
+        columns = list(zip(*new))
+        ids = columns[id_index]
+        if self.max_id is not None and min(ids) < self.max_id or list(ids) != sorted(ids):
+            self.ordered = False
+        self.max_id = max(ids) if self.max_id is None else max(max(ids), self.max_id)
+        start = len(self.alive)
+        self.positions.update(zip(ids, range(start, start + len(ids))))
+        self.alive.extend(b'\x01' * len(ids))
+        for key, values in zip(self.keys, columns):
+            if key in self.typecodes:
+                self.nulls[key].extend(value is None for value in values)
+                if self.typecodes[key] == 'q':
+                    self.data[key].extend(0 if value is None else int(value) for value in values)
+                else:
+                    self.data[key].extend(0.0 if value is None else value for value in values)
+            else:
+                self.data[key].extend(self.encode(key, value) for value in values)
+
+    def delete(self, ids):
+        for id in ids:
+            position = self.positions.pop(id, None)
+            if position is not None:
+                self.alive[position] = 0
+                self.removed += 1
+        if self.removed > COMPACT_RATIO * len(self.alive):
+            self.compact()
+
+    # Reescreve os arrays sem as linhas removidas (e em ordem de id)
+    def compact(self):
+        rows = [self.row(position, self.keys) for position in self.sort(self.scan())]
+        self.clear()
+        self.upsert(rows)
+
+    # Valores decodificados de uma linha, nas colunas informadas
+    def row(self, position, keys):
+        values = []
+        for key in keys:
+            if key in self.typecodes:
+                values.append(None if self.nulls[key][position] else self.data[key][position])
+            else:
+                values.append(self.dictionaries[key][self.data[key][position]])
+        return tuple(values)
+
+    # Posições das linhas que atendem a todos os filtros (e com id > after).
+    # As linhas são percorridas em blocos; com limit, a leitura para assim que
+    # o limite é atingido (as posições saem em ordem de id quando ordered).
+    def scan(self, filters=(), after=None, limit=None):
+        filters = list(filters)
+        start = 0
+        if after is not None:
+            if self.ordered:
+                start = bisect.bisect_right(self.data['id'], after)
+            else:
+                filters.append(('id', 'gt', after))
+        if numpy is not None and self.alive:
+            return self.scan_numpy(filters, start, limit)
+        tests = [self.test(name, OPERATORS[op], value) for name, op, value in filters]
+        alive = self.alive
+        positions = []
+        for begin in range(start, len(alive), SCAN_BLOCK):
+            block = [p for p in range(begin, min(begin + SCAN_BLOCK, len(alive))) if alive[p]]
+            for test in tests:
+                block = test(block)
+            positions.extend(block)
+            if limit is not None and len(positions) >= limit:
+                return positions[:limit]
+        return positions
+
+    # Função que filtra uma lista de posições por um filtro
+    def test(self, name, compare, value):
+        data = self.data[name]
+        if name in self.typecodes:
+            nulls = self.nulls[name]
+            return lambda block: [p for p in block if not nulls[p] and compare(data[p], value)]
+        codes = self.matching_codes(name, compare, value)
+        return lambda block: [p for p in block if data[p] in codes]
+
+    # Mesma filtragem de scan, vetorizada com o NumPy sobre os buffers dos arrays
+    def scan_numpy(self, filters, start=0, limit=None):
+        mask = numpy.frombuffer(self.alive, dtype=numpy.uint8).astype(bool)
+        mask[:start] = False
+        for name, op, value in filters:
+            compare = OPERATORS[op]
+            data = numpy.frombuffer(self.data[name], dtype=self.data[name].typecode)
+            if name in self.typecodes:
+                mask &= ~numpy.frombuffer(self.nulls[name], dtype=numpy.uint8).astype(bool)
+                mask &= compare(data, value)
+            else:
+                mask &= numpy.isin(data, list(self.matching_codes(name, compare, value)))
+        return numpy.flatnonzero(mask)[:limit].tolist()
+
+    # Códigos do dicionário cujos valores atendem ao filtro (nulos nunca atendem)
+    def matching_codes(self, name, compare, value):
+        matched = set()
+        for code, item in enumerate(self.dictionaries[name]):
+            try:
+                if item is not None and compare(item, value):
+                    matched.add(code)
+            except TypeError:
+                pass
+        return matched
+
+    # Chave de ordenação de uma coluna: nulos primeiro, como no SQLite
+    def sort_key(self, key):
+        data = self.data[key]
+        if key in self.typecodes:
+            nulls = self.nulls[key]
+            return lambda p: (not nulls[p], data[p])
+        dictionary = self.dictionaries[key]
+        ranks = {code: rank for rank, code in enumerate(sorted(range(1, len(dictionary)), key=dictionary.__getitem__), 1)}
+        ranks[0] = 0
+        return lambda p: ranks[data[p]]
+
+    # Ordena posições por [(coluna, decrescente)]; sem order_by, pelo id
+    def sort(self, positions, order_by=None):
+        if not order_by:
+            if self.ordered:
+                return positions
+            order_by = [('id', False)]
+        for key, descending in reversed(order_by):
+            positions.sort(key=self.sort_key(key), reverse=descending)
+        return positions
+
+    # Consulta: filtros, cursor (id > after), ordenação, limite e projeção.
+    # Retorna as linhas como tuplas com os valores das colunas informadas.
+    def select(self, keys=None, filters=(), order_by=None, after=None, limit=None):
+        keys = keys or self.keys
+        if order_by or not self.ordered:
+            positions = self.sort(self.scan(filters, after), order_by)[:limit]
+        else:
+            positions = self.scan(filters, after, limit)
+        return [self.row(position, keys) for position in positions]
+
+    # Agregações por grupo, com o mesmo resultado de stats.compute (ver stats.py)
+    def aggregate(self, group_by=(), aggregates=None, percentiles=(), points=(), filters=(), limit=None):
+        groups = {} if group_by else {(): []}  # Sem agrupamento: um único grupo, mesmo vazio
+        for position in self.scan(filters):
+            groups.setdefault(self.row(position, group_by), []).append(position)
+        keys = sorted(groups, key=lambda key: tuple((value is not None, value) for value in key))
+        results = []
+        for key in keys[:limit]:
+            positions = groups[key]
+            result = dict(zip(group_by, key), count=len(positions))
+            for name, fields in (aggregates or {}).items():
+                for field in fields:
+                    result[f'{name}_{field}'] = aggregate_values(name, self.values(field, positions))
+            for field in percentiles:
+                values = sorted(self.values(field, positions))
+                for point in points:
+                    result[f'p{point}_{field}'] = percentile(values, point)
+            results.append(result)
+        return results
+
+    # Valores não nulos de uma coluna numérica nas posições informadas
+    def values(self, key, positions):
+        data, nulls = self.data[key], self.nulls[key]
+        return [data[p] for p in positions if not nulls[p]]
+
+    # Memória aproximada ocupada pelos arrays e dicionários (bytes)
+    def nbytes(self):
+        size = sum(len(data) * data.itemsize for data in self.data.values())
+        size += sum(len(nulls) for nulls in self.nulls.values()) + len(self.alive)
+        for dictionary in self.dictionaries.values():
+            size += sys.getsizeof(dictionary) + sum(sys.getsizeof(value) for value in dictionary[1:])
+        return size
+
+
+# Função auxiliar que aplica uma agregação (sum, avg, min, max) como o SQL:
+# None quando não há valores
+def aggregate_values(name, values):
+    if not values:
+        return None
+    if name == 'sum':
+        return sum(values)
+    if name == 'avg':
+        return sum(values) / len(values)
+    return min(values) if name == 'min' else max(values)
+
+# Percentil com interpolação linear entre as duas posições vizinhas (mesma
+# definição de stats.percentile_values e de numpy.percentile)
+def percentile(values, point):
+    if not values:
+        return None
+    fraction, lower = math.modf((len(values) - 1) * (point / 100))
+    lower = int(lower)
+    if not fraction or lower + 1 >= len(values):
+        return values[lower]
+    return values[lower] + (values[lower + 1] - values[lower]) * fraction
+
+
+class ColumnarStore:
+    def __init__(self):
+        self.enabled = False
+        self.tables = {}
+        self.versions = {}  # modelo -> (versão da tabela, incrementos deste processo) na última atualização
+        self.changed = {}  # modelo -> ids alterados desde a última atualização (ou ALL)
+        self.lock = threading.RLock()
+        self.listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('COLUMNAR_STORE', False)
+        self.enabled = app.config['COLUMNAR_STORE']
+        self.tables.clear()
+        self.versions.clear()
+        if self.enabled and not self.listening:
+            event.listen(RoutingSession, 'do_orm_execute', self._on_execute)
+            event.listen(RoutingSession, 'after_flush', self._on_flush)
+            self.listening = True
+        app.extensions['columnar'] = self
+
+    def available(self, model, filters=()):
+        return self.enabled and model in COLUMNAR_MODELS and all(op in OPERATORS for _, op, _ in filters)
+
+    # Consulta as linhas do modelo (ver ColumnarTable.select); None quando o
+    # armazenamento está desativado ou não suporta os filtros
+    def select(self, model, keys=None, filters=(), order_by=None, after=None, limit=None):
+        if not self.available(model, filters):
+            return None
+        with self.lock:
+            return self.table(model).select(keys, filters, order_by, after, limit)
+
+    # Agregações do modelo (ver ColumnarTable.aggregate); None quando indisponível
+    def aggregate(self, model, group_by=(), aggregates=None, percentiles=(), points=(), filters=(), limit=None):
+        if not self.available(model, filters):
+            return None
+        with self.lock:
+            return self.table(model).aggregate(group_by, aggregates, percentiles, points, filters, limit)
+
+    # Tabela colunar do modelo, carregada ou atualizada conforme a versão da tabela
+    def table(self, model):
+        with self.lock:
+            name = model.__tablename__
+            version, bumps = current_version(name), version_cache.local_bumps(name)
+            if model not in self.tables:
+                self.build(model)
+            elif self.versions[model][0] != version:
+                self.refresh(model, version[0] - self.versions[model][0][0] != bumps - self.versions[model][1])
+            self.versions[model] = (version, bumps)
+            return self.tables[model]
+
+    # Carga completa de uma tabela, lida em lotes do cursor
+    def build(self, model):
+        table = self.tables[model] = ColumnarTable(model)
+        self.changed.pop(model, None)
+        statement = select(*model.__table__.columns).order_by(model.id)
+        result = db.session.execute(statement, execution_options={'yield_per': IN_BATCH_SIZE * 10})
+        for partition in result.partitions():
+            table.upsert(partition)
+
+    def build_all(self):
+        if self.enabled:
+            for model in COLUMNAR_MODELS:
+                self.table(model)
+
+    # Atualização incremental: ids novos e removidos pela comparação com o
+    # banco e releitura das linhas alteradas. external indica que a versão
+    # andou mais do que os incrementos deste processo: outro processo também
+    # gravou, e as alterações dele não são conhecidas. Nesse caso, ou sem
+    # gravações registradas neste processo, a tabela é recarregada.
+    def refresh(self, model, external=False):
+        table = self.tables[model]
+        changed = self.changed.pop(model, None)
+        if external or changed is None or changed is ALL:
+            return self.build(model)
+        ids = set(db.session.execute(select(model.id)).scalars())
+        known = set(table.positions)
+        table.delete(known - ids)
+        pending = sorted((ids - known) | (changed & ids))
+        for start in range(0, len(pending), IN_BATCH_SIZE):
+            statement = (select(*model.__table__.columns)
+                         .where(model.id.in_(pending[start:start + IN_BATCH_SIZE])).order_by(model.id))
+            table.upsert(db.session.execute(statement))
+
+    # Registra as gravações executadas pela sessão: INSERTs e DELETEs são
+    # encontrados pela comparação dos ids; UPDATEs registram os ids alterados
+    # (ex.: update(model) com uma lista de linhas com id, na ingestão)
+    def _on_execute(self, state):
+        if not (state.is_insert or state.is_update or state.is_delete):
+            return
+        table = getattr(getattr(state.statement, 'table', None), 'name', None)
+        model = next((model for model in COLUMNAR_MODELS if model.__tablename__ == table), None)
+        if model is None:
+            return
+        if not state.is_update:
+            self.mark(model, ())
+            return
+        parameters = state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters or {}]
+        if all('id' in row for row in rows):
+            self.mark(model, [row['id'] for row in rows])
+        else:
+            self.mark(model, ALL)
+
+    # Registra os ids das instâncias do ORM alteradas (as novas e as
+    # removidas só marcam a tabela como gravada por este processo)
+    def _on_flush(self, session, flush_context):
+        for obj in session.new | session.deleted:
+            if type(obj) in COLUMNAR_MODELS:
+                self.mark(type(obj), ())
+        for obj in session.dirty:
+            if type(obj) in COLUMNAR_MODELS and obj.id is not None:
+                self.mark(type(obj), [obj.id])
+
+    def mark(self, model, ids):
+        with self.lock:
+            current = self.changed.get(model, set())
+            if ids is ALL or current is ALL:
+                self.changed[model] = ALL
+            else:
+                current.update(ids)
+                self.changed[model] = current
+
+    def stats(self):
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "numpy": numpy is not None,
+                "tables": {model.__tablename__: {"rows": len(table), "bytes": table.nbytes()}
+                           for model, table in self.tables.items()},
+            }
+
+
+# Instância compartilhada pelas rotas
+columnar = ColumnarStore()
@@ -1,7 +1,67 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo define os perfis de configuração da aplicação: dev, test, prod e
+# bench. O perfil é escolhido pela variável de ambiente APP_PROFILE (dev por
+# padrão) e qualquer chave pode ser sobrescrita por uma variável FLASK_<CHAVE>
+# (ex.: FLASK_CACHE_TTL=60, FLASK_SQLALCHEMY_DATABASE_URI=sqlite:///outro.db).
+#
+# English Version:
+# This module defines the application configuration profiles: dev, test, prod
+# and bench. The profile is chosen by the APP_PROFILE environment variable (dev
+# by default) and any key can be overridden by a FLASK_<KEY> variable (e.g.
+# FLASK_CACHE_TTL=60, FLASK_SQLALCHEMY_DATABASE_URI=sqlite:///other.db).
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
 import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'Database.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    # Caminho relativo: o arquivo fica na pasta instance/ da aplicação
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///Database.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DEBUG = False
+    TESTING = False
+    # Cria o esquema e aplica as migrações ao chamar startup()
+    INIT_DB_ON_STARTUP = True
+    # Carga da SWAPI em segundo plano ao chamar startup() e quando uma listagem encontra o banco vazio
+    SWAPI_WARMUP_ON_STARTUP = True
+    SWAPI_WARMUP_ON_DEMAND = True
+    # Pacote offline da SWAPI (bundle.py) carregado na inicialização quando o banco está vazio
+    SWAPI_BUNDLE = os.path.join(basedir, 'instance', 'swapi-bundle.jsonl.gz')
+    # Cópia colunar em memória das tabelas, usada pelas listagens e estatísticas (columnar.py)
+    COLUMNAR_STORE = False
+
+# Desenvolvimento local (python app.py / flask run)
+class DevConfig(Config):
+    DEBUG = True
+
+# Testes: banco em memória, sem cache de respostas e sem acesso à SWAPI
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_TYPE = 'null'
+    SWAPI_WARMUP_ON_STARTUP = False
+    SWAPI_WARMUP_ON_DEMAND = False
+    SWAPI_BUNDLE = None
+
+# Produção: recarga periódica da SWAPI
+class ProdConfig(Config):
+    SWAPI_WARMUP_INTERVAL = 6 * 60 * 60
+
+# Medições de desempenho: banco próprio, dados sintéticos e sem acesso à SWAPI
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///bench.db'
+    SWAPI_WARMUP_ON_STARTUP = False
+    SWAPI_WARMUP_ON_DEMAND = False
+
+# Perfis disponíveis em APP_PROFILE
+PROFILES = {
+    'dev': DevConfig,
+    'test': TestConfig,
+    'prod': ProdConfig,
+    'bench': BenchConfig,
+}
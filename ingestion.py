@@ -0,0 +1,435 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa o motor de ingestão compartilhado por todos os
+# Blueprints. Ele descobre a quantidade de páginas de cada recurso da SWAPI a
+# partir da primeira resposta e busca as páginas restantes em paralelo, usando
+# um pool de threads limitado e o cliente HTTP de swapi_client (conexões
+# keep-alive, novas tentativas e cache em disco). Os registros são então
+# convertidos e gravados no banco de dados. A sincronização incremental (sync)
+# guarda por recurso a maior data edited já gravada e só grava os itens novos
+# ou alterados depois dela.
+#
+# English Version:
+# This module implements the ingestion engine shared by every Blueprint. It
+# discovers the page count of each SWAPI resource from the first response and
+# fetches the remaining pages in parallel, using a bounded thread pool and the
+# HTTP client from swapi_client (keep-alive connections, retries and an
+# on-disk cache). The records are then converted and written to the database.
+# The incremental sync (sync) keeps, per resource, the latest edited date
+# already written and only writes the items that are new or changed after it.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import json
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.sqlite import insert as upsert
+
+from cache import response_cache
+from swapi_client import MAX_WORKERS, client
+from normalize import normalize
+from versioning import touch
+from models import db, Character, Movie, Planet, Starship, Species, Vehicle, SyncState, IN_BATCH_SIZE, NATURAL_KEYS, RELATIONS, pop_links, resource_id, save_links
+
+# Id do recurso na SWAPI, extraído da URL do item (guardado em swapi_id; as
+# relações, que chegam como URLs da SWAPI, são resolvidas por ele para os ids
+# locais, ver save_pending_links)
+def swapi_id(item):
+    return resource_id(item["url"]) if item.get("url") else None
+
+# Converte uma data da SWAPI ("2014-12-20T21:17:56.891000Z") em datetime UTC sem fuso,
+# como as demais datas do banco
+def swapi_time(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Funções que convertem um item da SWAPI nos campos de cada modelo (os campos
+# numéricos são convertidos depois, por coluna, em normalize)
+def build_character(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "name": item["name"],
+        "height": item["height"],
+        "mass": item["mass"],
+        "hair_color": item.get("hair_color"),
+        "skin_color": item.get("skin_color"),
+        "eye_color": item.get("eye_color"),
+        "birth_year": item.get("birth_year"),
+        "gender": item.get("gender"),
+        "homeworld": item.get("homeworld"),
+        "films": item.get("films", []),  # Gravados nas tabelas de associação
+        "species": item.get("species", []),
+        "vehicles": item.get("vehicles", []),
+        "starships": item.get("starships", []),
+    }
+
+def build_movie(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "title": item["title"],
+        "episode_id": item["episode_id"],
+        "opening_crawl": item["opening_crawl"],
+        "director": item["director"],
+        "producer": item["producer"],
+        # Converte a data de lançamento de string para date
+        "release_date": datetime.strptime(item["release_date"], "%Y-%m-%d").date(),
+        "characters": item.get("characters", []),  # Gravados nas tabelas de associação
+        "planets": item.get("planets", []),
+        "starships": item.get("starships", []),
+        "vehicles": item.get("vehicles", []),
+        "species": item.get("species", [])
+    }
+
+def build_planet(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "name": item["name"],
+        "rotation_period": item["rotation_period"],
+        "orbital_period": item["orbital_period"],
+        "diameter": item["diameter"],
+        "climate": item.get("climate"),
+        "gravity": item.get("gravity"),
+        "terrain": item.get("terrain"),
+        "surface_water": item.get("surface_water"),
+        "population": item.get("population")
+    }
+
+def build_starship(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "name": item["name"],
+        "model": item["model"],
+        "manufacturer": item["manufacturer"],
+        "cost_in_credits": item.get("cost_in_credits"),
+        "length": item.get("length"),
+        "max_atmosphering_speed": item.get("max_atmosphering_speed"),
+        "crew": item.get("crew"),
+        "passengers": item.get("passengers"),
+        "cargo_capacity": item.get("cargo_capacity"),
+        "consumables": item.get("consumables"),
+        "hyperdrive_rating": item.get("hyperdrive_rating"),
+        "MGLT": item.get("MGLT"),
+        "starship_class": item.get("starship_class"),
+    }
+
+def build_species(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "name": item["name"],
+        "classification": item.get("classification"),
+        "designation": item.get("designation"),
+        "average_height": item.get("average_height"),
+        "skin_colors": json.dumps(item.get("skin_colors", [])),
+        "hair_colors": json.dumps(item.get("hair_colors", [])),
+        "eye_colors": json.dumps(item.get("eye_colors", [])),
+        "average_lifespan": item.get("average_lifespan"),
+        "language": item.get("language"),
+        "homeworld": item.get("homeworld")
+    }
+
+def build_vehicle(item):
+    return {
+        "swapi_id": swapi_id(item),
+        "created": swapi_time(item.get("created")),
+        "edited": swapi_time(item.get("edited")),
+        "name": item["name"],
+        "model": item["model"],
+        "manufacturer": item.get("manufacturer"),
+        "cost_in_credits": item.get("cost_in_credits"),
+        "length": item.get("length"),
+        "max_atmosphering_speed": item.get("max_atmosphering_speed"),
+        "crew": item.get("crew"),
+        "passengers": item.get("passengers"),
+        "cargo_capacity": item.get("cargo_capacity"),
+        "consumables": item.get("consumables"),
+        "vehicle_class": item.get("vehicle_class"),
+    }
+
+
+# Recursos da SWAPI: endpoint -> (modelo, conversor, campos que identificam um registro)
+RESOURCES = {
+    'people': (Character, build_character, NATURAL_KEYS[Character]),
+    'films': (Movie, build_movie, NATURAL_KEYS[Movie]),
+    'planets': (Planet, build_planet, NATURAL_KEYS[Planet]),
+    'starships': (Starship, build_starship, NATURAL_KEYS[Starship]),
+    'species': (Species, build_species, NATURAL_KEYS[Species]),
+    'vehicles': (Vehicle, build_vehicle, NATURAL_KEYS[Vehicle]),
+}
+
+
+# Função auxiliar para buscar uma página de um recurso da SWAPI
+# (sessão, tentativas e cache em disco ficam em swapi_client)
+def fetch_page(resource, page=1):
+    return client.get(resource, {'page': page} if page > 1 else None)
+
+# Calcula o número de páginas a partir da primeira resposta (campo 'count')
+def page_count(first_page):
+    per_page = len(first_page.get('results') or [])
+    if not per_page or not first_page.get('next'):
+        return 1
+    return math.ceil(first_page.get('count', per_page) / per_page)
+
+# Busca todas as páginas dos recursos informados em paralelo.
+# A primeira página de cada recurso é buscada ao mesmo tempo; assim que ela
+# chega, as páginas restantes são enviadas ao pool. Gera pares (recurso, itens)
+# na ordem em que as páginas ficam prontas. Os recursos com alguma página que
+# não foi recebida são adicionados ao conjunto opcional failed.
+def fetch_all_pages(*resources, max_workers=MAX_WORKERS, failed=None):
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(fetch_page, resource): (resource, 1) for resource in resources}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                resource, page = pending.pop(future)
+                data = future.result()
+                if not data:
+                    if failed is not None:
+                        failed.add(resource)
+                    continue
+                if page == 1:
+                    for next_page in range(2, page_count(data) + 1):
+                        pending[pool.submit(fetch_page, resource, next_page)] = (resource, next_page)
+                yield resource, data.get('results', [])
+
+# Carrega, com uma única consulta, o mapa dos registros já salvos: id da SWAPI
+# -> id e, para os registros ainda sem id da SWAPI (criados localmente ou
+# gravados antes da coluna swapi_id), chave natural -> id
+def load_keys(model, keys):
+    columns = [getattr(model, key) for key in keys]
+    rows = db.session.execute(select(model.id, model.swapi_id, *columns))
+    return {swapi_id if swapi_id is not None else tuple(natural): id for id, swapi_id, *natural in rows}
+
+# Chave de um item em known (o id da SWAPI ou, na falta dele, a chave natural)
+# e o id do registro já salvo, se houver. Um registro sem id da SWAPI com a
+# mesma chave natural é adotado pelo item.
+def find_record(data, keys, known):
+    natural = tuple(data[k] for k in keys)
+    key = data['swapi_id'] if data['swapi_id'] is not None else natural
+    return key, known.get(key, known.get(natural))
+
+# Escolhe o id dos registros novos: o próprio id da SWAPI quando ele está livre
+# (o caso comum, em um banco carregado da SWAPI) e, senão, um id gerado pelo
+# SQLite. Os registros já salvos, inclusive os criados localmente, nunca mudam
+# de id. rows: {chave: linha}; preenche o campo id das linhas e retorna as
+# chaves na ordem do INSERT (os ids gerados ficam acima dos escolhidos).
+def assign_ids(model, rows):
+    wanted = [row['swapi_id'] for row in rows.values() if row['swapi_id'] is not None]
+    taken = set()
+    for start in range(0, len(wanted), IN_BATCH_SIZE):
+        statement = select(model.id).where(model.id.in_(wanted[start:start + IN_BATCH_SIZE]))
+        taken.update(db.session.execute(statement).scalars())
+    for row in rows.values():
+        row['id'] = row['swapi_id'] if row['swapi_id'] is not None and row['swapi_id'] not in taken else None
+    return sorted(rows, key=lambda key: rows[key]['id'] is None)
+
+# Atualiza known depois do commit: registros gravados e registros adotados
+# (que deixam de ser encontrados pela chave natural)
+def update_known(known, saved, naturals):
+    for key, id in saved.items():
+        if naturals.get(key) != key:
+            known.pop(naturals.get(key), None)
+        known[key] = id
+
+# Grava uma página de itens de um recurso no banco de dados em uma única transação.
+# A deduplicação é feita em memória contra o mapa de chaves (known): itens novos
+# são inseridos com executemany e itens já existentes são atualizados pelo id
+# local. Com since (marca d'água da sincronização), itens já existentes cujo
+# edited não passa dela são ignorados. As relações N:N de cada item, com os ids
+# da SWAPI, vão para pending_links ((modelo, {id local: {campo: [ids da SWAPI]}},
+# reescrever)) e são gravadas no fim da sincronização; as dos itens alterados
+# são reescritas. Retorna {"inserted", "updated", "unchanged", "failed"}.
+def save_page(resource, items, known, since=None, pending_links=None):
+    model, build, keys = RESOURCES[resource]
+    rows = []
+    failed = 0
+    for item in items:
+        try:
+            data = build(item)
+            rows.append((data, pop_links(model, data)))
+        except Exception as e:
+            print(f"Falha ao converter {resource} {item.get('name', item.get('title'))}: {str(e)}")
+            failed += 1
+    # Campos numéricos da página inteira, coluna a coluna; valores inválidos viram None
+    for field, count in normalize(model, [data for data, _ in rows]).items():
+        print(f"{resource}: {count} valores inválidos em {field} gravados como nulos")
+    new_rows, changed_rows, links, naturals = {}, {}, {}, {}
+    unchanged = 0
+    for data, data_links in rows:
+        key, id = find_record(data, keys, known)
+        if id is not None:
+            if since and data['edited'] and data['edited'] <= since:
+                unchanged += 1
+                continue
+            changed_rows[key] = dict(data, id=id)
+        else:
+            new_rows[key] = data
+        links[key] = data_links
+        naturals[key] = tuple(data[k] for k in keys)
+    if not new_rows and not changed_rows:
+        return page_counts(0, 0, unchanged, failed)
+    try:
+        ids = {key: row['id'] for key, row in changed_rows.items()}
+        if new_rows:
+            order = assign_ids(model, new_rows)
+            # RETURNING devolve os ids novos para manter o mapa de chaves atualizado
+            statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+            new_ids = db.session.execute(statement, [new_rows[key] for key in order]).scalars().all()
+            ids.update(zip(order, new_ids))
+        if changed_rows:
+            db.session.execute(update(model), list(changed_rows.values()))
+        touch(model)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Falha ao salvar página de {resource} em lote, gravando item a item: {str(e)}")
+        return save_rows(model, keys, list(new_rows.values()) + list(changed_rows.values()),
+                         links, known, unchanged, failed, pending_links)
+    update_known(known, ids, naturals)
+    if pending_links is not None and RELATIONS.get(model):
+        pending_links.append((model, {ids[key]: links[key] for key in new_rows}, False))
+        pending_links.append((model, {ids[key]: links[key] for key in changed_rows}, True))
+    return page_counts(len(new_rows), len(changed_rows), unchanged, failed)
+
+def page_counts(inserted, updated, unchanged, failed=0):
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "failed": failed}
+
+# Caminho lento usado quando o lote falha: isola os itens inválidos, com uma
+# transação por item
+def save_rows(model, keys, rows, links, known, unchanged=0, failed=0, pending_links=None):
+    counts = page_counts(0, 0, unchanged, failed)
+    for data in rows:
+        key, id = find_record(data, keys, known)
+        try:
+            if id is not None:
+                db.session.execute(update(model), [dict(data, id=id)])
+                saved = id
+            else:
+                assign_ids(model, {key: data})
+                saved = db.session.execute(insert(model).returning(model.id), [data]).scalar_one()
+            touch(model)
+            db.session.commit()
+            update_known(known, {key: saved}, {key: tuple(data[k] for k in keys)})
+            counts["inserted" if id is None else "updated"] += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"Falha ao salvar {model.__tablename__} {tuple(data[k] for k in keys)[0]}: {str(e)}")
+            counts["failed"] += 1
+            continue
+        if pending_links is not None and RELATIONS.get(model):
+            pending_links.append((model, {saved: links[key]}, id is not None))
+    return counts
+
+# Grava as associações pendentes da sincronização (ver save_page), depois que
+# todas as páginas foram gravadas: os ids da SWAPI das URLs são convertidos nos
+# ids locais pelo swapi_id dos registros de destino, com uma consulta por modelo
+# de destino. Destinos que não estão no banco ficam de fora; eles entram quando
+# o recurso de destino é sincronizado, pelas relações do outro lado. Retorna o
+# conjunto dos modelos cujas associações não puderam ser gravadas.
+def save_pending_links(pending_links):
+    local_ids = {}
+    def resolve(target, ids):
+        if target not in local_ids:
+            statement = select(target.swapi_id, target.id).where(target.swapi_id.isnot(None))
+            local_ids[target] = dict(db.session.execute(statement).all())
+        return [local_ids[target][id] for id in ids if id in local_ids[target]]
+
+    models = {model for model, links, _ in pending_links if links}
+    if not models:
+        return set()
+    try:
+        for model, links, replace in pending_links:
+            relations = RELATIONS[model]
+            save_links(model, {source_id: {name: resolve(relations[name][3], ids) for name, ids in fields.items()}
+                               for source_id, fields in links.items()}, replace=replace)
+        for model in models:
+            touch(model)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Falha ao gravar as associações da sincronização: {str(e)}")
+        return models
+    for model in models:
+        response_cache.invalidate_model(model)
+    return set()
+
+# Busca os recursos informados (todos, por padrão) e salva no banco de dados
+# os itens novos e os alterados desde a última sincronização (usada por
+# hydrate, dump-bundle --fetch e pelas rotas de carga). Repetir a carga não
+# regrava registros nem muda as versões das tabelas; a atualização completa
+# fica para flask sync --full. Retorna {recurso: registros salvos}.
+def ingest(*resources, progress=None):
+    return {resource: counts["inserted"] + counts["updated"]
+            for resource, counts in sync(*resources, progress=progress).items()}
+
+# Sincronização incremental: busca os recursos informados (todos, por padrão)
+# e grava só os itens novos e os alterados na SWAPI depois da marca d'água do
+# recurso (maior edited já gravado, em sync_state). Tabelas sem alterações não
+# são tocadas, então as versões, os caches e os snapshots continuam válidos.
+# full=True ignora as marcas e atualiza todos os registros. A marca só avança
+# quando todas as páginas do recurso foram recebidas e todos os itens foram
+# gravados; um item que falhou é tentado de novo na próxima sincronização.
+# As requisições rodam no pool; as gravações acontecem na thread atual, que
+# precisa estar dentro do contexto da aplicação. O callback opcional progress
+# é chamado após cada página com (recurso, registros salvos na página).
+# Retorna {recurso: {"inserted", "updated", "unchanged", "failed"}}.
+def sync(*resources, progress=None, full=False):
+    resources = resources or tuple(RESOURCES)
+    totals = {resource: page_counts(0, 0, 0) for resource in resources}
+    known = {resource: load_keys(RESOURCES[resource][0], RESOURCES[resource][2]) for resource in resources}
+    marks = {} if full else load_marks(resources)
+    latest, failed, pending_links = dict(marks), set(), []
+    for resource, items in fetch_all_pages(*resources, failed=failed):
+        counts = save_page(resource, items, known[resource], marks.get(resource), pending_links)
+        for name, count in counts.items():
+            totals[resource][name] += count
+        if counts["failed"]:
+            failed.add(resource)
+        for item in items:
+            edited = swapi_time(item.get("edited"))
+            if edited and (latest.get(resource) is None or edited > latest[resource]):
+                latest[resource] = edited
+        saved = counts["inserted"] + counts["updated"]
+        if saved:
+            response_cache.invalidate_model(RESOURCES[resource][0])
+        if progress:
+            progress(resource, saved)
+    # Associações não gravadas: os recursos delas são tentados de novo na próxima sincronização
+    failed_models = save_pending_links(pending_links)
+    failed.update(resource for resource in resources if RESOURCES[resource][0] in failed_models)
+    save_marks({resource: latest.get(resource) for resource in resources if resource not in failed})
+    return totals
+
+# Marcas d'água gravadas: {recurso: edited}
+def load_marks(resources):
+    rows = db.session.execute(select(SyncState.resource, SyncState.edited).where(SyncState.resource.in_(resources)))
+    return {resource: edited for resource, edited in rows if edited}
+
+def save_marks(marks):
+    if not marks:
+        return
+    now = datetime.utcnow()
+    statement = upsert(SyncState).values([{"resource": resource, "edited": edited, "synced_at": now}
+                                          for resource, edited in marks.items()])
+    statement = statement.on_conflict_do_update(
+        index_elements=[SyncState.resource],
+        set_={"edited": statement.excluded.edited, "synced_at": statement.excluded.synced_at},
+    )
+    db.session.execute(statement)
+    db.session.commit()
@@ -0,0 +1,226 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo reúne as funções auxiliares usadas pelas rotas de listagem:
+# paginação por cursor na chave primária (?limit=&after=), projeção de campos
+# feita no próprio SQL (?fields=), filtros simples de igualdade e de faixa
+# (?gender=, ?population_gt=, ...) sobre colunas declaradas por cada rota e o
+# modo de streaming em NDJSON (?stream=1) para tabelas grandes.
+#
+# English Version:
+# This module gathers the helper functions used by the listing routes: cursor
+# pagination on the primary key (?limit=&after=), field projection done in SQL
+# itself (?fields=), simple equality and range filters (?gender=,
+# ?population_gt=, ...) on the columns declared by each route, and the
+# streaming NDJSON mode (?stream=1) for large tables.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import operator
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy import select
+
+from columnar import columnar
+from models import db, RELATIONS, SERIALIZERS, expand, expandable_fields
+
+# Tamanho máximo de página aceito em ?limit=
+MAX_LIMIT = 1000
+
+# Sufixos aceitos nos filtros de faixa e o operador correspondente (os mesmos
+# operadores servem para as colunas do SQL e para os valores do armazenamento colunar)
+RANGE_OPERATORS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+OPERATORS = dict(RANGE_OPERATORS, eq=operator.eq)
+
+# Parâmetros reservados que não são tratados como filtros
+RESERVED_ARGS = {'limit', 'after', 'fields', 'format', 'expand', 'stream'}
+
+# Tipo de conteúdo e tamanho do lote lido do cursor na listagem em streaming
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 1000
+
+
+# Verifica se o cliente pediu JSON (cabeçalho Accept ou ?format=json)
+def wants_json():
+    if request.args.get('format') == 'json':
+        return True
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+# Converte o valor de um filtro para o tipo da coluna
+def parse_value(column, value):
+    python_type = column.type.python_type
+    try:
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return python_type(value)
+    except ValueError:
+        abort(400, description=f"Valor inválido para o filtro {column.key}: {value}")
+
+# Lê um inteiro positivo de request.args
+def int_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        abort(400, description=f"Parâmetro {name} deve ser um inteiro positivo")
+    return int(value)
+
+# Campos pedidos em ?expand= (ex.: ?expand=homeworld,films)
+def expanded_fields(model):
+    names = [name.strip() for name in request.args.get('expand', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in expandable_fields(model)]
+    if unknown:
+        abort(400, description=f"Campos não expansíveis: {', '.join(unknown)}")
+    return names
+
+# Colunas e relações selecionadas em ?fields= (o id é sempre incluído, pois é o cursor).
+# Retorna (colunas, relações); relações None significa todas.
+def selected_fields(model):
+    columns = model.__table__.columns
+    relations = RELATIONS.get(model, {})
+    fields = request.args.get('fields')
+    if not fields:
+        return list(columns), None
+    # Campos expandidos entram na projeção mesmo que não estejam em ?fields=
+    names = [name.strip() for name in fields.split(',') if name.strip()] + expanded_fields(model)
+    unknown = [name for name in names if name not in columns and name not in relations]
+    if unknown:
+        abort(400, description=f"Campos desconhecidos: {', '.join(unknown)}")
+    selected = [columns.id] + [columns[name] for name in dict.fromkeys(names) if name in columns and name != 'id']
+    return selected, list(dict.fromkeys(name for name in names if name in relations))
+
+# Filtros pedidos em request.args, restritos às colunas permitidas, como
+# tuplas (campo, operador, valor convertido).
+# Igualdade: ?coluna=valor (eq). Faixa (apenas colunas numéricas/datas): ?coluna_gt=, _gte, _lt, _lte.
+# Relação: ?films=4 (operador link: registros associados ao filme 4, via tabela de associação).
+# reserved: parâmetros da rota que não são filtros.
+def filter_specs(model, filters, reserved=RESERVED_ARGS):
+    columns = model.__table__.columns
+    relations = RELATIONS.get(model, {})
+    specs = []
+    for arg, value in request.args.items():
+        if arg in reserved:
+            continue
+        name, _, suffix = arg.rpartition('_')
+        if arg in filters and arg in relations:
+            if not value.isdigit():
+                abort(400, description=f"Valor inválido para o filtro {arg}: {value}")
+            specs.append((arg, 'link', int(value)))
+        elif name in filters and suffix in RANGE_OPERATORS:
+            # Relações e colunas de texto só aceitam igualdade
+            if name in relations or name not in columns or columns[name].type.python_type is str:
+                abort(400, description=f"Filtro de faixa não suportado para {name}")
+            specs.append((name, suffix, parse_value(columns[name], value)))
+        elif arg in filters and arg in columns:
+            specs.append((arg, 'eq', parse_value(columns[arg], value)))
+        else:
+            abort(400, description=f"Filtro não suportado: {arg}")
+    return specs
+
+# Condição WHERE de um filtro (campo, operador, valor)
+def spec_condition(model, spec):
+    name, op, value = spec
+    if op == 'link':
+        table, own, other, _, _ = RELATIONS[model][name]
+        return model.id.in_(select(table.c[own]).where(table.c[other] == value))
+    return OPERATORS[op](model.__table__.c[name], value)
+
+# Condições WHERE a partir de request.args (ver filter_specs)
+def filter_conditions(model, filters, reserved=RESERVED_ARGS):
+    return [spec_condition(model, spec) for spec in filter_specs(model, filters, reserved)]
+
+# Limite (?limit=, até MAX_LIMIT) e cursor (?after=) da página pedida
+def page_args():
+    limit = int_arg('limit')
+    after = int_arg('after')
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_LIMIT)
+    return limit, after
+
+# Monta o SELECT da listagem conforme request.args (projeção, filtros e cursor).
+# Retorna (consulta, relações selecionadas, limite ou None).
+def list_statement(model, filters=()):
+    limit, after = page_args()
+    columns, relations = selected_fields(model)
+    statement = select(*columns).order_by(model.id)
+    conditions = filter_conditions(model, filters)
+    if after is not None:
+        conditions.append(model.id > after)
+    if conditions:
+        statement = statement.where(*conditions)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement, relations, limit
+
+# Executa a listagem de um modelo conforme request.args. As linhas do SELECT
+# (ou do armazenamento colunar, quando ativado) são serializadas diretamente,
+# sem criar instâncias do ORM, e os campos de ?expand= são resolvidos em lote.
+# Retorna (lista de dicionários, cursor da próxima página ou None).
+def paginate(model, filters=()):
+    result = columnar_page(model, filters)
+    if result is None:
+        statement, relations, _ = list_statement(model, filters)
+        result = SERIALIZERS[model].rows(db.session.execute(statement), relations)
+    expand(model, result, expanded_fields(model))
+    limit, _ = page_args()
+
+    next_cursor = result[-1]['id'] if limit is not None and len(result) == limit else None
+    return result, next_cursor
+
+# Mesma página de list_statement lida do armazenamento colunar; None quando
+# ele está desativado ou não suporta os filtros pedidos (ex.: ?films=)
+def columnar_page(model, filters=()):
+    limit, after = page_args()
+    columns, relations = selected_fields(model)
+    keys = tuple(column.key for column in columns)
+    rows = columnar.select(model, keys, filter_specs(model, filters), after=after, limit=limit)
+    if rows is None:
+        return None
+    serializer = SERIALIZERS[model]
+    to_dict = serializer.compile(keys)
+    return serializer.attach([to_dict(row) for row in rows], relations)
+
+# Verifica se o cliente pediu a listagem em streaming (Accept: application/x-ndjson ou ?stream=1)
+def wants_stream():
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+# Listagem em streaming: um registro JSON por linha (NDJSON), lido do cursor em
+# lotes de STREAM_BATCH_SIZE linhas (yield_per) e enviado à medida que é
+# serializado. A memória usada não depende do tamanho da tabela. Aceita os
+# mesmos filtros, ?fields=, ?expand= e ?limit=/&after= da listagem paginada.
+def stream(model, filters=()):
+    statement, relations, _ = list_statement(model, filters)
+    names = expanded_fields(model)
+
+    def generate():
+        result = db.session.execute(statement, execution_options={'yield_per': STREAM_BATCH_SIZE})
+        for records in SERIALIZERS[model].partitions(result, relations):
+            expand(model, records, names)
+            yield ''.join(f'{current_app.json.dumps(record)}\n' for record in records)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+# Adiciona os cabeçalhos de paginação (X-Next-Cursor e Link) à resposta
+def add_pagination_headers(response, next_cursor):
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
+# Serializa um único registro do ORM aplicando ?expand=
+def serialize_one(model, obj):
+    return expand(model, [obj.to_dict()], expanded_fields(model))[0]
@@ -0,0 +1,213 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo mede o desempenho das requisições. Para cada rota são medidos o
+# tempo total, a quantidade e o tempo das consultas SQL (eventos do engine do
+# SQLAlchemy), o tempo de serialização do JSON e o tamanho da resposta; as
+# chamadas à SWAPI têm a sua própria latência. Os valores ficam em histogramas
+# exportados em /metrics no formato texto do Prometheus e, opcionalmente
+# (METRICS_SERVER_TIMING), no cabeçalho Server-Timing de cada resposta. Uma
+# rota com muitas consultas por requisição indica um problema N+1. Com
+# serve.py, cada worker tem os seus próprios contadores.
+#
+# English Version:
+# This module measures request performance. For every route it records the
+# total time, the count and time of SQL queries (SQLAlchemy engine events),
+# the JSON serialization time and the response size; SWAPI calls have their
+# own latency. Values are kept in histograms exported at /metrics in the
+# Prometheus text format and, optionally (METRICS_SERVER_TIMING), in the
+# Server-Timing header of every response. A route with many queries per
+# request points to an N+1 problem. With serve.py, every worker keeps its own
+# counters.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+from models import db
+
+# Limites dos baldes dos histogramas (em segundos, consultas e bytes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Tipo de conteúdo do formato texto do Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Histograma com rótulos: para cada combinação de rótulos, a contagem por
+# balde, a soma e a quantidade de observações
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    # Linhas no formato do Prometheus (os baldes são cumulativos)
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self.series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {format_number(total)}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {count}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            series = sorted(self.series.items())
+        lines.extend(f'{self.name}{format_labels(self.labels, labels)} {format_number(value)}' for labels, value in series)
+        return lines
+
+
+# Provedor de JSON da aplicação que soma o tempo de serialização da requisição
+# (jsonify, snapshots e streaming passam todos por app.json.dumps)
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'metrics' in g:
+                g.metrics['serialize'] += time.perf_counter() - started
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self.requests = Counter('http_requests_total', 'Requisições atendidas', ('method', 'endpoint', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'Tempo total da requisição',
+                                 ('method', 'endpoint'), LATENCY_BUCKETS)
+        self.queries = Histogram('http_request_sql_queries', 'Consultas SQL por requisição',
+                                 ('method', 'endpoint'), QUERY_BUCKETS)
+        self.sql_time = Histogram('http_request_sql_seconds', 'Tempo das consultas SQL por requisição',
+                                  ('method', 'endpoint'), LATENCY_BUCKETS)
+        self.serialize = Histogram('http_request_serialization_seconds', 'Tempo de serialização JSON por requisição',
+                                   ('method', 'endpoint'), LATENCY_BUCKETS)
+        self.size = Histogram('http_response_size_bytes', 'Tamanho do corpo da resposta (sem streaming)',
+                              ('method', 'endpoint'), SIZE_BUCKETS)
+        self.swapi = Histogram('swapi_request_duration_seconds', 'Latência das requisições à SWAPI',
+                               ('status',), LATENCY_BUCKETS)
+        self.all = (self.requests, self.latency, self.queries, self.sql_time, self.serialize, self.size, self.swapi)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)  # Mede as requisições e exporta /metrics
+        app.config.setdefault('METRICS_SERVER_TIMING', False)  # Envia também o cabeçalho Server-Timing
+        self.enabled = app.config['METRICS_ENABLED']
+        self.server_timing = app.config['METRICS_SERVER_TIMING']
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+                event.listen(engine, 'handle_error', self._handle_error)
+
+    # Latência de uma requisição à SWAPI (status: código HTTP ou "error")
+    def observe_swapi(self, seconds, status):
+        if self.enabled:
+            self.swapi.observe(seconds, str(status))
+
+    # Conteúdo de /metrics
+    def render(self):
+        lines = []
+        for metric in self.all:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _before_request(self):
+        g.metrics = {'started': time.perf_counter(), 'queries': 0, 'sql': 0.0, 'serialize': 0.0}
+
+    def _after_request(self, response):
+        values = g.pop('metrics', None)
+        if values is None:
+            return response
+        elapsed = time.perf_counter() - values['started']
+        labels = (request.method, request.url_rule.rule if request.url_rule else 'unmatched')
+        self.requests.inc(*labels, response.status_code)
+        self.latency.observe(elapsed, *labels)
+        self.queries.observe(values['queries'], *labels)
+        self.sql_time.observe(values['sql'], *labels)
+        self.serialize.observe(values['serialize'], *labels)
+        if not response.is_streamed:
+            self.size.observe(response.calculate_content_length() or 0, *labels)
+        if self.server_timing:
+            response.headers.add('Server-Timing', ', '.join((
+                f'db;dur={values["sql"] * 1000:.2f};desc="{values["queries"]} queries"',
+                f'serialize;dur={values["serialize"] * 1000:.2f}',
+                f'app;dur={elapsed * 1000:.2f}',
+            )))
+        return response
+
+    # Consultas SQL: o início fica na conexão (pilha, para execuções aninhadas)
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = connection.info['metrics_started'].pop()
+        if has_request_context() and 'metrics' in g:
+            g.metrics['queries'] += 1
+            g.metrics['sql'] += time.perf_counter() - started
+
+    def _handle_error(self, context):
+        if context.connection is not None and context.connection.info.get('metrics_started'):
+            context.connection.info['metrics_started'].pop()
+
+
+# Instância compartilhada pela aplicação e pelo cliente da SWAPI
+metrics = Metrics()
@@ -0,0 +1,202 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo aplica as migrações do banco de dados SQLite. Cada migração é uma
+# função registrada em ordem; a versão do esquema fica em PRAGMA user_version,
+# de modo que cada migração roda uma única vez por banco. As migrações rodam
+# depois de db.create_all() e cuidam do que ele não faz: alterar tabelas que
+# já existem e mover dados entre formatos.
+#
+# English Version:
+# This module applies the SQLite database migrations. Each migration is a
+# function registered in order; the schema version is kept in PRAGMA
+# user_version, so every migration runs only once per database. Migrations run
+# after db.create_all() and take care of what it does not do: altering tables
+# that already exist and moving data between formats.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import json
+
+from sqlalchemy import bindparam, func, or_, select, text
+
+from models import db, Character, Movie, Planet, Species, Starship, Vehicle, Favorite, FAVORITE_REFERENCES, NATURAL_KEYS, RELATIONS, resource_id
+from normalize import normalize, numeric_columns
+from search import index_statements, trigger_statements
+
+# Lista ordenada de migrações; a posição (a partir de 1) é a versão do esquema
+MIGRATIONS = []
+
+def migration(function):
+    MIGRATIONS.append(function)
+    return function
+
+# Nomes das colunas existentes de uma tabela
+def table_columns(connection, table):
+    return {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+
+
+# Migração 1: listas de URLs guardadas como JSON em colunas Text de characters e
+# movies passam para as tabelas de associação, e as colunas antigas são removidas.
+# Observação: as associações migradas usam os ids das URLs da SWAPI; em bancos
+# antigos, cujos ids locais não seguem a SWAPI, a próxima ingestão completa
+# (flask sync --full) adota cada registro pela chave natural, preenche o seu
+# swapi_id e reescreve as associações com os ids locais.
+@migration
+def move_json_relations_to_link_tables(connection):
+    for model in (Character, Movie):
+        table = model.__tablename__
+        legacy = [name for name in RELATIONS[model] if name in table_columns(connection, table)]
+        if not legacy:
+            continue
+        rows = connection.execute(text(f"SELECT id, {', '.join(legacy)} FROM {table}"))
+        for row in rows.mappings().all():
+            for name in legacy:
+                link, own, other, _, _ = RELATIONS[model][name]
+                try:
+                    urls = json.loads(row[name]) if row[name] else []
+                except json.JSONDecodeError:
+                    urls = []
+                targets = {resource_id(url) for url in urls}
+                if targets:
+                    connection.execute(link.insert().prefix_with('OR IGNORE'),
+                                       [{own: row['id'], other: target} for target in targets])
+        for name in legacy:
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+
+
+# Migração 2: índices únicos nas chaves naturais e índices nas colunas de
+# Favorite. Antes de criá-los, registros repetidos (mesma chave natural) são
+# unificados no de menor id: associações e favoritos passam a apontar para ele
+# e as cópias são removidas.
+@migration
+def deduplicate_natural_keys(connection):
+    for model, keys in NATURAL_KEYS.items():
+        table = model.__table__
+        columns = [table.c[key] for key in keys]
+        statement = (select(func.min(table.c.id), func.group_concat(table.c.id))
+                     .where(*[column.isnot(None) for column in columns])
+                     .group_by(*columns).having(func.count() > 1))
+        removed = 0
+        for keep, ids in connection.execute(statement).all():
+            copies = [int(id) for id in ids.split(',') if int(id) != keep]
+            merge_records(connection, model, keep, copies)
+            removed += len(copies)
+        if removed:
+            print(f"{table.name}: {removed} registros repetidos unificados")
+    # Cria os índices declarados nos modelos que ainda não existem no banco
+    # (os de colunas criadas por migrações posteriores ficam para elas)
+    for table in db.metadata.sorted_tables:
+        existing = table_columns(connection, table.name)
+        for index in table.indexes:
+            if all(column.key in existing for column in index.columns):
+                index.create(connection, checkfirst=True)
+
+# Função auxiliar para unificar os registros copies no registro keep
+def merge_records(connection, model, keep, copies):
+    for owner, relations in RELATIONS.items():
+        for link, own, other, target, _ in relations.values():
+            for column in [own] * (owner is model) + [other] * (target is model):
+                # OR IGNORE: associações que o registro mantido já tem ficam para trás e são apagadas
+                connection.execute(link.update().prefix_with('OR IGNORE')
+                                   .where(link.c[column].in_(copies)).values({column: keep}))
+                connection.execute(link.delete().where(link.c[column].in_(copies)))
+    if model in FAVORITE_REFERENCES:
+        column = Favorite.__table__.c[FAVORITE_REFERENCES[model]]
+        connection.execute(Favorite.__table__.update().where(column.in_(copies)).values({column: keep}))
+    connection.execute(model.__table__.delete().where(model.__table__.c.id.in_(copies)))
+
+
+
+# Migração 3: índice de busca textual (FTS5) de todos os recursos, com os
+# triggers que o mantêm sincronizado e a carga dos registros existentes
+@migration
+def create_search_index(connection):
+    for statement in index_statements():
+        connection.execute(text(statement))
+
+
+# Migração 4: colunas numéricas de vehicles (antes String) e planets passam a
+# ter tipos numéricos. O SQLite não altera o tipo de uma coluna, então as duas
+# tabelas são recriadas, com os registros copiados e convertidos por normalize.
+# Nas demais tabelas, valores numéricos gravados como texto ("unknown",
+# "1,358", ...) são convertidos no lugar.
+@migration
+def convert_numeric_columns(connection):
+    for model in (Vehicle, Planet):
+        rebuild_table(connection, model)
+    for model in (Character, Starship, Species):
+        convert_text_numbers(connection, model)
+
+# Função auxiliar para recriar a tabela de um modelo com o esquema atual,
+# copiando os registros
+def rebuild_table(connection, model):
+    table = model.__table__
+    old = f"{table.name}_old"
+    # Os índices mantêm o nome ao renomear a tabela; são removidos e recriados com ela
+    for row in connection.execute(text(f"PRAGMA index_list({table.name})")).all():
+        if row[3] == 'c':
+            connection.execute(text(f'DROP INDEX "{row[1]}"'))
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    table.create(connection)
+    # A afinidade das colunas converte os números simples; o que continuar como
+    # texto ("unknown", "1,000", ...) é convertido em seguida por normalize
+    columns = ', '.join(column for column in table.columns.keys() if column in table_columns(connection, old))
+    connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}"))
+    # Os triggers da busca acompanham a tabela renomeada e são removidos com ela
+    connection.execute(text(f"DROP TABLE {old}"))
+    for statement in trigger_statements(model):
+        connection.execute(text(statement))
+    convert_text_numbers(connection, model)
+
+# Função auxiliar para converter, no lugar, os valores de texto das colunas numéricas
+def convert_text_numbers(connection, model):
+    table = model.__table__
+    columns = list(numeric_columns(model))
+    statement = (select(table.c.id, *[table.c[column] for column in columns])
+                 .where(or_(*[func.typeof(table.c[column]) == 'text' for column in columns])))
+    rows = [dict(row) for row in connection.execute(statement).mappings()]
+    if not rows:
+        return
+    invalid = normalize(model, rows)
+    connection.execute(table.update().where(table.c.id == bindparam('row_id'))
+                       .values({column: bindparam(f'new_{column}') for column in columns}),
+                       [dict({f'new_{column}': row[column] for column in columns}, row_id=row['id']) for row in rows])
+    for field, count in invalid.items():
+        print(f"{table.name}: {count} valores inválidos em {field} convertidos em nulos")
+
+
+# Migração 5: planets, starships e species ganham as colunas created/edited
+# (datas da SWAPI, usadas pela sincronização incremental). Bancos recriados
+# pela migração 4 já têm as colunas em planets.
+@migration
+def add_timestamp_columns(connection):
+    for model in (Planet, Starship, Species):
+        existing = table_columns(connection, model.__tablename__)
+        for column in ('created', 'edited'):
+            if column not in existing:
+                connection.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN {column} DATETIME"))
+
+
+# Migração 6: os recursos ganham a coluna swapi_id (id do registro na SWAPI,
+# com índice único), que identifica os registros na ingestão. Ela fica nula
+# nos registros existentes; a ingestão a preenche ao adotar cada registro pela
+# chave natural.
+@migration
+def add_swapi_id_column(connection):
+    for model in (Character, Movie, Planet, Starship, Species, Vehicle):
+        if 'swapi_id' not in table_columns(connection, model.__tablename__):
+            connection.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN swapi_id INTEGER"))
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# Aplica as migrações pendentes (precisa do contexto da aplicação)
+def migrate():
+    with db.engine.begin() as connection:
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+        for number, function in enumerate(MIGRATIONS[version:], start=version + 1):
+            function(connection)
+            connection.execute(text(f"PRAGMA user_version = {number}"))
+            print(f"Migração {number} aplicada: {function.__name__}")
@@ -1,26 +1,52 @@
+from flask import has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from sqlalchemy import CheckConstraint
+from flask_sqlalchemy.session import Session
+from datetime import date, datetime
+from functools import lru_cache
+from operator import attrgetter
+from sqlalchemy import CheckConstraint, select
+import json
 
-db = SQLAlchemy()
+# Bind da conexão somente leitura usada pelas rotas GET (configurado em storage.py)
+REPLICA_BIND = 'replica'
 
-class Character(db.Model):
+# Sessão que, nas requisições GET, lê pela conexão somente leitura quando ela
+# está configurada; gravações (flush) e demais contextos usam a conexão principal
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engines = self._db.engines
+        if (bind is None and not self._flushing and REPLICA_BIND in engines
+                and has_request_context() and request.method in ('GET', 'HEAD')):
+            return engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Endereço público da SWAPI, usado para montar as URLs das relações nas respostas
+SWAPI_URL = 'https://swapi.dev/api'
+
+
+# Mixin que expõe o serializador registrado do modelo
+class SerializerMixin:
+    def to_dict(self):
+        """Return a dictionary representation of the record for JSON serialization."""
+        return SERIALIZERS[type(self)](self)
+
+class Character(SerializerMixin, db.Model):
     __tablename__ = 'characters'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)  # Chave natural
     height = db.Column(db.Float, nullable=True)
     mass = db.Column(db.Float, nullable=True)
     hair_color = db.Column(db.String(20), nullable=True)
     skin_color = db.Column(db.String(20), nullable=True)
     eye_color = db.Column(db.String(20), nullable=True)
     birth_year = db.Column(db.String(20), nullable=True)
-    gender = db.Column(db.String(20), nullable=True)
+    gender = db.Column(db.String(20), nullable=True, index=True)
     homeworld = db.Column(db.String(100), nullable=True)
-    films = db.Column(db.Text, nullable=True)  # Store as JSON
-    species = db.Column(db.Text, nullable=True)  # Store as JSON
-    vehicles = db.Column(db.Text, nullable=True)  # Store as JSON
-    starships = db.Column(db.Text, nullable=True)  # Store as JSON
+    # films, species, vehicles e starships ficam nas tabelas de associação (RELATIONS)
     created = db.Column(db.DateTime, default=datetime.utcnow)  # Track creation time
     edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Track last edit time
 
@@ -30,55 +56,56 @@ class Character(db.Model):
     
 
 # Model for Movie
-class Movie(db.Model):
+class Movie(SerializerMixin, db.Model):
     __tablename__ = 'movies'
 
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String, nullable=False)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
+    title = db.Column(db.String, nullable=False, unique=True, index=True)  # Chave natural
     episode_id = db.Column(db.Integer, nullable=False)
     opening_crawl = db.Column(db.Text, nullable=False)
     director = db.Column(db.String, nullable=False)
     producer = db.Column(db.String, nullable=False)
     release_date = db.Column(db.Date, nullable=False)
-    characters = db.Column(db.Text, nullable=False)  # Armazena URLs como texto
-    planets = db.Column(db.Text, nullable=False)      # Armazena URLs como texto
-    starships = db.Column(db.Text, nullable=False)    # Armazena URLs como texto
-    vehicles = db.Column(db.Text, nullable=False)     # Armazena URLs como texto
-    species = db.Column(db.Text, nullable=False)      # Armazena URLs como texto
+    # characters, planets, starships, vehicles e species ficam nas tabelas de associação (RELATIONS)
     created = db.Column(db.DateTime, default=datetime.utcnow)
     edited = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     @property
     def url(self):
-        return f'https://swapi.dev/api/films/{self.id}/'
+        return resource_url('films', self.id)
 
     def __repr__(self):
         return f'<Movie {self.title}>'
 # Model for Planet
-class Planet(db.Model):
+class Planet(SerializerMixin, db.Model):
     __tablename__ = 'planets'
     
     id = db.Column(db.Integer, primary_key=True)  # ID da API
-    name = db.Column(db.String(100), nullable=False)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)  # Chave natural
     rotation_period = db.Column(db.Integer, nullable=True)
     orbital_period = db.Column(db.Integer, nullable=True)
     diameter = db.Column(db.Integer, nullable=True)
-    climate = db.Column(db.String(100), nullable=True)
+    climate = db.Column(db.String(100), nullable=True, index=True)
     gravity = db.Column(db.String(100), nullable=True)
     terrain = db.Column(db.String(100), nullable=True)
-    surface_water = db.Column(db.Integer, nullable=True)
-    population = db.Column(db.Integer, nullable=True)
+    surface_water = db.Column(db.Float, nullable=True)  # Percentual (pode ter casas decimais)
+    population = db.Column(db.Integer, nullable=True, index=True)
+    created = db.Column(db.DateTime, default=datetime.utcnow)  # Data de criação na SWAPI
+    edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Última alteração na SWAPI
 
     def __repr__(self):
         return f'<Planet(name={self.name}, population={self.population})>'
 
 
 # Model for Starship
-class Starship(db.Model):
+class Starship(SerializerMixin, db.Model):
     __tablename__ = 'starships'
     
     id = db.Column(db.Integer, primary_key=True)  # ID da API
-    name = db.Column(db.String(100), nullable=False)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)  # Chave natural
     model = db.Column(db.String(100), nullable=True)
     manufacturer = db.Column(db.String(100), nullable=True)
     cost_in_credits = db.Column(db.Integer, CheckConstraint('cost_in_credits >= 0'), nullable=True)
@@ -90,79 +117,67 @@ class Starship(db.Model):
     consumables = db.Column(db.String(100), nullable=True)
     hyperdrive_rating = db.Column(db.Float, nullable=True)  # Alterado para Float
     MGLT = db.Column(db.Integer, nullable=True)  # Alterado para Integer
-    starship_class = db.Column(db.String(100), nullable=True)
+    starship_class = db.Column(db.String(100), nullable=True, index=True)
+    created = db.Column(db.DateTime, default=datetime.utcnow)  # Data de criação na SWAPI
+    edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Última alteração na SWAPI
 
     def __repr__(self):
         return f'<Starship(name={self.name}, model={self.model})>'
-    
-    def to_dict(self):
-        """Return a dictionary representation of the Starship for JSON serialization."""
-        return {
-            "id": self.id,
-            "name": self.name,
-            "model": self.model,
-            "manufacturer": self.manufacturer,
-            "cost_in_credits": self.cost_in_credits,
-            "length": self.length,
-            "max_atmosphering_speed": self.max_atmosphering_speed,
-            "crew": self.crew,
-            "passengers": self.passengers,
-            "cargo_capacity": self.cargo_capacity,
-            "consumables": self.consumables,
-            "hyperdrive_rating": self.hyperdrive_rating,
-            "MGLT": self.MGLT,
-            "starship_class": self.starship_class
-        }
 
 # Model for Species
-class Species(db.Model):
+class Species(SerializerMixin, db.Model):
     __tablename__ = 'species'
     
     id = db.Column(db.Integer, primary_key=True)  # ID da API
-    name = db.Column(db.String(100), nullable=False)
-    classification = db.Column(db.String(100), nullable=True)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)  # Chave natural
+    classification = db.Column(db.String(100), nullable=True, index=True)
     designation = db.Column(db.String(100), nullable=True)
     average_height = db.Column(db.Float, nullable=True)
-    skin_colors = db.Column(db.String(100), nullable=True)
-    hair_colors = db.Column(db.String(100), nullable=True)
-    eye_colors = db.Column(db.String(100), nullable=True)
+    skin_colors = db.Column(db.String(100), nullable=True, info={'json': True})  # Armazenado como JSON
+    hair_colors = db.Column(db.String(100), nullable=True, info={'json': True})  # Armazenado como JSON
+    eye_colors = db.Column(db.String(100), nullable=True, info={'json': True})  # Armazenado como JSON
     average_lifespan = db.Column(db.Integer, nullable=True)
     homeworld = db.Column(db.String(100), nullable=True)
     language = db.Column(db.String(100), nullable=True)
+    created = db.Column(db.DateTime, default=datetime.utcnow)  # Data de criação na SWAPI
+    edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Última alteração na SWAPI
 
     def __repr__(self):
         return f'<Species(name={self.name}, average_height={self.average_height})>'
 
 
-class Vehicle(db.Model):
+class Vehicle(SerializerMixin, db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (db.Index('ix_vehicles_name_model', 'name', 'model', unique=True),)  # Chave natural
 
     id = db.Column(db.Integer, primary_key=True)
+    swapi_id = db.Column(db.Integer, nullable=True, unique=True, index=True)  # Id na SWAPI (nulo nos registros criados localmente)
     name = db.Column(db.String(100))
     model = db.Column(db.String(100))
     manufacturer = db.Column(db.String(100))
-    cost_in_credits = db.Column(db.String(20))
-    length = db.Column(db.String(20))
-    max_atmosphering_speed = db.Column(db.String(20))
-    crew = db.Column(db.String(20))
-    passengers = db.Column(db.String(20))
-    cargo_capacity = db.Column(db.String(20))
+    cost_in_credits = db.Column(db.Integer, CheckConstraint('cost_in_credits >= 0'), nullable=True, index=True)
+    length = db.Column(db.Float, CheckConstraint('length >= 0'), nullable=True)
+    max_atmosphering_speed = db.Column(db.Integer, nullable=True)
+    crew = db.Column(db.Integer, nullable=True)
+    passengers = db.Column(db.Integer, nullable=True)
+    cargo_capacity = db.Column(db.Integer, CheckConstraint('cargo_capacity >= 0'), nullable=True)
     consumables = db.Column(db.String(20))
-    vehicle_class = db.Column(db.String(50))
+    vehicle_class = db.Column(db.String(50), index=True)
     created = db.Column(db.DateTime, default=datetime.utcnow)
     edited = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
 # Model for Favorites
-class Favorite(db.Model):
+class Favorite(SerializerMixin, db.Model):
     __tablename__ = 'favorites'
     
     id = db.Column(db.Integer, primary_key=True)
-    character_id = db.Column(db.Integer, nullable=False)
-    movie_id = db.Column(db.Integer, nullable=True)
-    starship_id = db.Column(db.Integer, nullable=True)
-    vehicle_id = db.Column(db.Integer, nullable=True)
-    species_id = db.Column(db.Integer, nullable=True)
-    planet_id = db.Column(db.Integer, nullable=True)
+    character_id = db.Column(db.Integer, nullable=False, index=True)
+    movie_id = db.Column(db.Integer, nullable=True, index=True)
+    starship_id = db.Column(db.Integer, nullable=True, index=True)
+    vehicle_id = db.Column(db.Integer, nullable=True, index=True)
+    species_id = db.Column(db.Integer, nullable=True, index=True)
+    planet_id = db.Column(db.Integer, nullable=True, index=True)
     student_name1 = db.Column(db.String(100), nullable=False)
     registration1 = db.Column(db.String(50), nullable=False)
     student_name2 = db.Column(db.String(100), nullable=True)
@@ -172,4 +187,308 @@ class Favorite(db.Model):
     period = db.Column(db.String(50), nullable=False)
 
     def __repr__(self):
-        return f'<Favorite(character_id={self.character_id})>'
\ No newline at end of file
+        return f'<Favorite(character_id={self.character_id})>'
+
+
+# Chaves naturais: campos que identificam um registro da SWAPI (índices únicos),
+# usados na deduplicação da ingestão
+NATURAL_KEYS = {
+    Character: ('name',),
+    Movie: ('title',),
+    Planet: ('name',),
+    Starship: ('name',),
+    Species: ('name',),
+    Vehicle: ('name', 'model'),
+}
+
+# Colunas de Favorite que guardam o id de cada recurso
+FAVORITE_REFERENCES = {
+    Character: 'character_id',
+    Movie: 'movie_id',
+    Starship: 'starship_id',
+    Vehicle: 'vehicle_id',
+    Species: 'species_id',
+    Planet: 'planet_id',
+}
+
+
+# Model for TableVersion: versão monotônica de cada tabela, incrementada a cada gravação
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<TableVersion(table_name={self.table_name}, version={self.version})>'
+
+
+# Model for SyncState: marca d'água da sincronização de cada recurso da SWAPI
+# (maior valor de edited já gravado; itens conhecidos com edited até ela não mudaram)
+class SyncState(db.Model):
+    __tablename__ = 'sync_state'
+
+    resource = db.Column(db.String(50), primary_key=True)
+    edited = db.Column(db.DateTime, nullable=True)
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<SyncState(resource={self.resource}, edited={self.edited})>'
+
+
+# -----------------------------------------------------------------------------
+# Relações N:N
+# As listas de URLs da SWAPI (filmes de um personagem, personagens de um filme,
+# ...) são guardadas em tabelas de associação indexadas pelos ids locais dos
+# recursos; na ingestão, os ids das URLs da SWAPI são convertidos nos ids locais
+# pela coluna swapi_id. Nas respostas, as relações continuam sendo listas de
+# URLs, montadas a partir dos ids.
+# -----------------------------------------------------------------------------
+
+# Cria uma tabela de associação entre dois recursos (chave primária composta
+# e índice na segunda coluna, para consultas nos dois sentidos)
+def link_table(name, left, right):
+    return db.Table(
+        name,
+        db.Column(left, db.Integer, primary_key=True),
+        db.Column(right, db.Integer, primary_key=True, index=True),
+    )
+
+film_characters = link_table('film_characters', 'movie_id', 'character_id')
+film_planets = link_table('film_planets', 'movie_id', 'planet_id')
+film_starships = link_table('film_starships', 'movie_id', 'starship_id')
+film_vehicles = link_table('film_vehicles', 'movie_id', 'vehicle_id')
+film_species = link_table('film_species', 'movie_id', 'species_id')
+character_species = link_table('character_species', 'character_id', 'species_id')
+character_vehicles = link_table('character_vehicles', 'character_id', 'vehicle_id')
+character_starships = link_table('character_starships', 'character_id', 'starship_id')
+
+# Relações de cada modelo: campo -> (tabela, coluna do modelo, coluna do destino, modelo de destino, recurso da SWAPI)
+RELATIONS = {
+    Character: {
+        'films': (film_characters, 'character_id', 'movie_id', Movie, 'films'),
+        'species': (character_species, 'character_id', 'species_id', Species, 'species'),
+        'vehicles': (character_vehicles, 'character_id', 'vehicle_id', Vehicle, 'vehicles'),
+        'starships': (character_starships, 'character_id', 'starship_id', Starship, 'starships'),
+    },
+    Movie: {
+        'characters': (film_characters, 'movie_id', 'character_id', Character, 'people'),
+        'planets': (film_planets, 'movie_id', 'planet_id', Planet, 'planets'),
+        'starships': (film_starships, 'movie_id', 'starship_id', Starship, 'starships'),
+        'vehicles': (film_vehicles, 'movie_id', 'vehicle_id', Vehicle, 'vehicles'),
+        'species': (film_species, 'movie_id', 'species_id', Species, 'species'),
+    },
+}
+
+# Referências simples (coluna com a URL de outro recurso): campo -> modelo de destino
+REFERENCES = {
+    Character: {'homeworld': Planet},
+    Species: {'homeworld': Planet},
+}
+
+# Quantidade máxima de ids por cláusula IN
+IN_BATCH_SIZE = 500
+
+# Monta a URL da SWAPI de um recurso
+def resource_url(resource, id):
+    return f'{SWAPI_URL}/{resource}/{id}/'
+
+# Extrai o id de uma URL da SWAPI (aceita também o id puro)
+def resource_id(value):
+    if isinstance(value, int):
+        return value
+    return int(str(value).rstrip('/').rsplit('/', 1)[-1])
+
+# Retira de data os campos de relação, convertendo as URLs em ids
+def pop_links(model, data):
+    return {name: [resource_id(value) for value in data.pop(name) or []]
+            for name in RELATIONS.get(model, {}) if name in data}
+
+# Grava as associações {id do registro: {campo: [ids]}} na sessão atual
+# (INSERT OR IGNORE: associações já existentes são mantidas). Com replace, as
+# associações atuais dos registros nos campos informados são apagadas antes,
+# de modo que as que deixaram de existir na origem não ficam para trás.
+def save_links(model, links, replace=False):
+    for name, (table, own, other, _, _) in RELATIONS.get(model, {}).items():
+        if replace:
+            sources = [source_id for source_id, fields in links.items() if name in fields]
+            for start in range(0, len(sources), IN_BATCH_SIZE):
+                db.session.execute(table.delete().where(table.c[own].in_(sources[start:start + IN_BATCH_SIZE])))
+        rows = [{own: source_id, other: target_id}
+                for source_id, fields in links.items()
+                for target_id in set(fields.get(name, ()))]
+        if rows:
+            db.session.execute(table.insert().prefix_with('OR IGNORE'), rows)
+
+# Remove as associações de um ou mais registros, nos dois sentidos
+def delete_links(model, *ids):
+    for owner, relations in RELATIONS.items():
+        for table, own, other, target, _ in relations.values():
+            if owner is model:
+                db.session.execute(table.delete().where(table.c[own].in_(ids)))
+            if target is model:
+                db.session.execute(table.delete().where(table.c[other].in_(ids)))
+
+# Campos de um modelo que podem ser expandidos: campo -> modelo de destino
+def expandable_fields(model):
+    fields = {name: relation[3] for name, relation in RELATIONS.get(model, {}).items()}
+    fields.update(REFERENCES.get(model, {}))
+    return fields
+
+# Substitui, nos dicionários serializados, as URLs dos campos informados pelos
+# registros locais correspondentes. Cada campo custa uma única consulta IN para
+# todos os registros; URLs sem registro local são mantidas como estão.
+# As relações N:N são montadas com os ids locais; as referências simples
+# (REFERENCES) guardam a URL da SWAPI e são resolvidas pelo swapi_id (ou pelo
+# id, nos registros criados localmente).
+# Os registros embutidos não trazem as próprias relações.
+def expand(model, records, names):
+    targets = expandable_fields(model)
+    for name in names:
+        target = targets[name]
+        by_swapi_id = name in REFERENCES.get(model, {})
+        urls = set()
+        for record in records:
+            value = record.get(name)
+            urls.update(value if isinstance(value, list) else [value] if value else [])
+        ids = sorted({id for id in map(safe_resource_id, urls) if id is not None})
+        found, found_by_swapi_id = {}, {}
+        for start in range(0, len(ids), IN_BATCH_SIZE):
+            batch = ids[start:start + IN_BATCH_SIZE]
+            condition = target.id.in_(batch)
+            if by_swapi_id:
+                condition = condition | target.swapi_id.in_(batch)
+            statement = select(*target.__table__.columns).where(condition)
+            for item in SERIALIZERS[target].rows(db.session.execute(statement), relations=()):
+                found[item['id']] = item
+                if by_swapi_id and item.get('swapi_id') is not None:
+                    found_by_swapi_id[item['swapi_id']] = item
+        found.update(found_by_swapi_id)  # O id da SWAPI tem prioridade sobre o id local
+        for record in records:
+            value = record.get(name)
+            if isinstance(value, list):
+                record[name] = [found.get(safe_resource_id(url), url) for url in value]
+            elif value:
+                record[name] = found.get(safe_resource_id(value), value)
+    return records
+
+# Como resource_id, mas devolve None para valores que não são URLs da SWAPI
+def safe_resource_id(value):
+    try:
+        return resource_id(value)
+    except (TypeError, ValueError):
+        return None
+
+# Tabelas cujas respostas dependem dos dados de um modelo
+def related_tables(model):
+    tables = {model.__tablename__}
+    for owner, relations in RELATIONS.items():
+        for relation in relations.values():
+            if owner is model or relation[3] is model:
+                tables.update((owner.__tablename__, relation[3].__tablename__))
+    for owner, references in REFERENCES.items():
+        if model in references.values():
+            tables.add(owner.__tablename__)
+    return tables
+
+# Carrega os ids relacionados de vários registros com uma consulta por relação
+# Retorna {campo: {id do registro: [ids relacionados]}}
+def load_links(model, ids, names=None):
+    relations = RELATIONS.get(model, {})
+    loaded = {}
+    for name in relations if names is None else names:
+        table, own, other, _, _ = relations[name]
+        grouped = loaded[name] = {}
+        for start in range(0, len(ids), IN_BATCH_SIZE):
+            statement = select(table.c[own], table.c[other]).where(table.c[own].in_(ids[start:start + IN_BATCH_SIZE]))
+            for source_id, target_id in db.session.execute(statement):
+                grouped.setdefault(source_id, []).append(target_id)
+    return loaded
+
+
+# -----------------------------------------------------------------------------
+# Serialização
+# Cada modelo ganha, na importação, uma função que converte uma linha em
+# dicionário. A função é gerada a partir dos metadados das colunas: colunas
+# marcadas com info={'json': True} são deserializadas e datas viram ISO 8601.
+# O mesmo código atende instâncias do ORM e tuplas Row de SELECTs do core; as
+# relações N:N são anexadas em lote, com uma consulta por relação.
+# -----------------------------------------------------------------------------
+
+# Função auxiliar para deserializar JSON
+def load_json(value):
+    try:
+        return json.loads(value) if value else []
+    except json.JSONDecodeError:
+        return []
+
+# Função auxiliar para converter datas para ISO 8601
+def isoformat(value):
+    return value.isoformat() if value else None
+
+# Conversor aplicado a cada coluna (None quando o valor vai direto para o JSON)
+def column_converter(column):
+    if column.info.get('json'):
+        return load_json
+    if column.type.python_type in (date, datetime):
+        return isoformat
+    return None
+
+class Serializer:
+    def __init__(self, model):
+        self.model = model
+        self.columns = {column.key: column for column in model.__table__.columns}
+        self.keys = tuple(self.columns)
+        self.relations = RELATIONS.get(model, {})
+        self.getter = attrgetter(*self.keys)
+        self.to_dict = self.compile(self.keys)
+
+    # Gera (e memoriza) uma função values -> dict para uma sequência de colunas
+    @lru_cache(maxsize=None)
+    def compile(self, keys):
+        namespace = {}
+        items = []
+        for index, key in enumerate(keys):
+            converter = column_converter(self.columns[key])
+            if converter:
+                namespace[f"convert_{index}"] = converter
+                items.append(f"{key!r}: convert_{index}(values[{index}])")
+            else:
+                items.append(f"{key!r}: values[{index}]")
+        source = f"def to_dict(values):\n    return {{{', '.join(items)}}}\n"
+        exec(compile(source, f"<serializer {self.model.__name__}>", "exec"), namespace)
+        return namespace["to_dict"]
+
+    # Serializa uma instância do ORM
+    def __call__(self, obj):
+        return self.attach([self.to_dict(self.getter(obj))])[0]
+
+    # Serializa o resultado de um SELECT do core sem criar instâncias do ORM.
+    # relations limita as relações anexadas (None = todas).
+    def rows(self, result, relations=None):
+        to_dict = self.compile(tuple(result.keys()))
+        return self.attach([to_dict(row) for row in result], relations)
+
+    # Serializa um resultado lido em lotes (yield_per), gerando uma lista por lote
+    def partitions(self, result, relations=None):
+        to_dict = self.compile(tuple(result.keys()))
+        for partition in result.partitions():
+            yield self.attach([to_dict(row) for row in partition], relations)
+
+    # Anexa as relações N:N (como listas de URLs) aos dicionários serializados
+    def attach(self, records, relations=None):
+        names = list(self.relations) if relations is None else list(relations)
+        if not records or not names:
+            return records
+        links = load_links(self.model, [record['id'] for record in records], names)
+        for name in names:
+            url = self.relations[name][4]
+            grouped = links[name]
+            for record in records:
+                record[name] = [resource_url(url, id) for id in sorted(grouped.get(record['id'], ()))]
+        return records
+
+
+# Registro de serializadores, montado uma única vez na importação
+SERIALIZERS = {model: Serializer(model) for model in (Character, Movie, Planet, Starship, Species, Vehicle, Favorite)}
@@ -0,0 +1,113 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo concentra a conversão dos campos numéricos da SWAPI, que chegam
+# como texto ("1,358", "unknown", "n/a", "1000km", ...). A conversão é feita
+# por coluna: os valores de uma página (ou de um lote) são agrupados por
+# campo, cada valor distinto é convertido uma única vez para o tipo da coluna
+# do modelo (int ou float), e marcadores de ausência viram None. Valores que
+# não são números também viram None na ingestão, e são contados por campo,
+# em vez de irem para o banco como texto. A mesma conversão é usada pelas
+# rotas em lote, que reportam esses valores como erro.
+#
+# English Version:
+# This module centralizes the parsing of SWAPI numeric fields, which arrive as
+# text ("1,358", "unknown", "n/a", "1000km", ...). Parsing is column-wise: the
+# values of a page (or of a batch) are grouped by field, each distinct value
+# is parsed once into the model column type (int or float), and missing-value
+# markers become None. Values that are not numbers also become None during
+# ingestion, and are counted per field, instead of reaching the database as
+# text. The bulk routes use the same parsing and report those values as
+# errors.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Marcadores usados pela SWAPI para valores ausentes
+NULL_TOKENS = frozenset({'', 'unknown', 'n/a', 'na', 'none', 'null', 'indefinite'})
+
+# Unidades que a SWAPI escreve junto de alguns números (ex.: 1000km); qualquer
+# outro sufixo torna o valor inválido. As mais longas vêm antes (km/h antes de km).
+UNITS = ('km/h', 'km', 'kg', 'cm', 'm')
+
+# Número com separador de milhar opcional, seguido ou não de uma das UNITS
+NUMBER = re.compile(r'([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:e[+-]?\d+)?)(?:\s*(?:%s))?' % '|'.join(map(re.escape, UNITS)))
+
+
+# Converte um valor para número (int ou float); None para marcadores de
+# ausência e ValueError para valores que não são números
+def parse_number(value):
+    if isinstance(value, bool):
+        raise ValueError(f"número inválido: {value!r}")
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"número inválido: {value!r}")
+    text = value.strip().lower().replace(',', '')
+    if text in NULL_TOKENS:
+        return None
+    match = NUMBER.fullmatch(text)
+    if not match:
+        raise ValueError(f"número inválido: {value!r}")
+    number = match.group(1)
+    return int(number) if number.lstrip('+-').isdigit() else float(number)
+
+def parse_int(value):
+    number = parse_number(value)
+    if isinstance(number, float):
+        if not number.is_integer():
+            raise ValueError(f"inteiro inválido: {value!r}")
+        return int(number)
+    return number
+
+def parse_float(value):
+    number = parse_number(value)
+    return None if number is None else float(number)
+
+PARSERS = {int: parse_int, float: parse_float}
+
+
+# Colunas numéricas de um modelo (exceto a chave primária): campo -> conversor
+@lru_cache(maxsize=None)
+def numeric_columns(model):
+    return {column.key: PARSERS[column.type.python_type] for column in model.__table__.columns
+            if not column.primary_key and column.type.python_type in PARSERS}
+
+# Converte os valores de uma coluna; cada valor distinto é convertido uma única
+# vez. Retorna (valores convertidos, quantidade de valores inválidos)
+def parse_column(parser, values):
+    parsed, invalid = {}, 0
+    for value, count in Counter(values).items():
+        try:
+            parsed[value] = parser(value)
+        except (TypeError, ValueError):
+            parsed[value] = None
+            invalid += count
+    return [parsed[value] for value in values], invalid
+
+# Converte, coluna a coluna, os campos numéricos das linhas (dicionários) de um
+# modelo, alterando as linhas. Retorna {campo: quantidade de valores inválidos}
+def normalize(model, rows):
+    invalid = {}
+    for key, parser in numeric_columns(model).items():
+        present = [row for row in rows if key in row]
+        if not present:
+            continue
+        values, errors = parse_column(parser, [row[key] for row in present])
+        for row, value in zip(present, values):
+            row[key] = value
+        if errors:
+            invalid[key] = errors
+    return invalid
+
+# Converte os campos numéricos de um único registro (rotas de gravação);
+# valores que não são números geram ValueError em vez de virarem None
+def normalize_record(model, data):
+    invalid = normalize(model, [data])
+    if invalid:
+        raise ValueError(f"Valores numéricos inválidos: {', '.join(sorted(invalid))}")
+    return data
@@ -0,0 +1,58 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo verifica, com EXPLAIN QUERY PLAN, se as consultas mais frequentes
+# da aplicação usam índices: busca pela chave natural (deduplicação), pelo id,
+# pelas colunas filtráveis das listagens, pelas colunas de Favorite e pelas
+# tabelas de associação nos dois sentidos. Uma consulta que varre a tabela
+# inteira (SCAN) é reportada como regressão. Uso: flask --app app check-indexes
+#
+# English Version:
+# This module checks, with EXPLAIN QUERY PLAN, whether the application's hot
+# queries use indexes: lookups by natural key (deduplication), by id, by the
+# filterable listing columns, by the Favorite columns and on the association
+# tables in both directions. A query that walks the whole table (SCAN) is
+# reported as a regression. Usage: flask --app app check-indexes
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+from sqlalchemy import select, text
+
+from models import db, Favorite, FAVORITE_REFERENCES, NATURAL_KEYS, RELATIONS, SERIALIZERS, TableVersion
+
+
+# Consultas verificadas: descrição -> SELECT
+def hot_queries():
+    queries = {}
+    for model in SERIALIZERS:
+        table = model.__table__
+        queries[f"{table.name} por id"] = select(table).where(table.c.id == 1)
+        # Colunas indexadas usadas pelos filtros das listagens
+        for column in table.columns:
+            if column.index and not column.primary_key:
+                queries[f"{table.name} por {column.key}"] = select(table.c.id).where(column == 1)
+    for model, keys in NATURAL_KEYS.items():
+        table = model.__table__
+        queries[f"{table.name} pela chave natural"] = select(table.c.id).where(*[table.c[key] == 'x' for key in keys])
+    for column in FAVORITE_REFERENCES.values():
+        queries[f"favorites por {column}"] = select(Favorite.id).where(Favorite.__table__.c[column] == 1)
+    for relations in RELATIONS.values():
+        for link, own, other, _, _ in relations.values():
+            queries[f"{link.name} por {own}"] = select(link.c[other]).where(link.c[own].in_([1, 2]))
+            queries[f"{link.name} por {other}"] = select(link.c[own]).where(link.c[other] == 1)
+    queries["table_versions por tabela"] = select(TableVersion.version).where(TableVersion.table_name == 'x')
+    return queries
+
+# Plano de execução de uma consulta (coluna detail do EXPLAIN QUERY PLAN)
+def query_plan(statement):
+    sql = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+# Verifica todas as consultas; retorna {descrição: (usa índice, plano)}
+def check():
+    results = {}
+    for name, statement in hot_queries().items():
+        plan = query_plan(statement)
+        results[name] = (all(not step.startswith('SCAN') for step in plan), plan)
+    return results
@@ -0,0 +1,143 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa a busca textual em todos os recursos com o FTS5 do
+# SQLite. Um único índice (search_index) guarda, para cada registro, o nome (ou
+# título) e um texto com os demais campos pesquisáveis. O rowid do índice
+# codifica o recurso e o id do registro, e triggers criados pela migração
+# mantêm o índice sincronizado em qualquer gravação, inclusive da ingestão e
+# das rotas em lote. Os resultados são ordenados por bm25, com busca por
+# prefixo e trechos destacados: o texto dos registros é escapado como HTML e
+# só as marcas <mark> do destaque chegam sem escape.
+#
+# English Version:
+# This module implements full-text search across all resources with SQLite's
+# FTS5. A single index (search_index) holds, for each record, the name (or
+# title) and a text with the other searchable fields. The index rowid encodes
+# the resource and the record id, and triggers created by the migration keep
+# the index in sync on every write, including ingestion and the bulk routes.
+# Results are ranked by bm25, with prefix matching and highlighted snippets:
+# the record text is HTML escaped and only the <mark> highlight tags are left
+# unescaped.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import re
+
+from markupsafe import escape
+from sqlalchemy import text
+
+from models import db, Character, Movie, Planet, Species, Starship, Vehicle, resource_url
+
+SEARCH_TABLE = 'search_index'
+
+# Recursos indexados: modelo -> (código no rowid, recurso da SWAPI, campo do nome, demais campos)
+SEARCH_RESOURCES = {
+    Character: (1, 'people', 'name', ()),
+    Movie: (2, 'films', 'title', ('opening_crawl', 'director')),
+    Planet: (3, 'planets', 'name', ('climate', 'terrain')),
+    Species: (4, 'species', 'name', ('language',)),
+    Starship: (5, 'starships', 'name', ('model', 'manufacturer')),
+    Vehicle: (6, 'vehicles', 'name', ('model', 'manufacturer')),
+}
+
+# rowid = id * ROWID_FACTOR + código do recurso
+ROWID_FACTOR = 8
+
+# Pesos do bm25 por coluna do índice (nome, conteúdo)
+WEIGHTS = (10.0, 1.0)
+
+# Marcadores do destaque usados pelo FTS5 (caracteres de uso privado, que não
+# aparecem nos dados); viram <mark> e </mark> depois do escape do texto
+MARK_OPEN = '\ue000'
+MARK_CLOSE = '\ue001'
+
+# Limites de resultados por busca
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+RESOURCE_CODES = {resource: code for code, resource, _, _ in SEARCH_RESOURCES.values()}
+CODE_RESOURCES = {code: resource for resource, code in RESOURCE_CODES.items()}
+
+
+# Comandos que criam o índice FTS5, os triggers de sincronização e carregam os
+# registros existentes (usados pela migração)
+def index_statements():
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"name, content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for model in SEARCH_RESOURCES:
+        statements.extend(trigger_statements(model))
+        statements.append(populate_statement(model))
+    return statements
+
+# Expressões SQL (para a linha old/new de um trigger, ou sem prefixo) do rowid,
+# do nome e do conteúdo indexados de um registro
+def indexed_values(model, row=''):
+    code, _, name, fields = SEARCH_RESOURCES[model]
+    prefix = f"{row}." if row else ''
+    content = " || ' ' || ".join(f"coalesce({prefix}{field}, '')" for field in fields) or "''"
+    return f"{prefix}id * {ROWID_FACTOR} + {code}", f"{prefix}{name}", content
+
+def trigger_statements(model):
+    table = model.__tablename__
+    new_rowid, new_name, new_content = indexed_values(model, 'new')
+    old_rowid, _, _ = indexed_values(model, 'old')
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, name, content) VALUES ({new_rowid}, {new_name}, {new_content});"
+    delete = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {old_rowid};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+def populate_statement(model):
+    rowid, name, content = indexed_values(model)
+    return (f"INSERT OR REPLACE INTO {SEARCH_TABLE}(rowid, name, content) "
+            f"SELECT {rowid}, {name}, {content} FROM {model.__tablename__}")
+
+
+# Converte o texto digitado em uma consulta FTS5: cada palavra vira um termo
+# entre aspas (sem operadores do FTS5) com busca por prefixo; todas precisam casar
+def match_query(q):
+    terms = re.findall(r"\w+", q or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+# Escapa o texto destacado pelo FTS5 e troca os marcadores pelas tags <mark>
+def highlighted(value):
+    if value is None:
+        return None
+    return str(escape(value)).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+
+# Executa a busca; retorna a lista de resultados ordenada por relevância
+def search(q, resource=None, limit=DEFAULT_LIMIT):
+    query = match_query(q)
+    if not query:
+        return []
+    where = f"{SEARCH_TABLE} MATCH :query"
+    params = {"query": query, "limit": limit, "open": MARK_OPEN, "close": MARK_CLOSE}
+    if resource:
+        where += f" AND rowid % {ROWID_FACTOR} = :code"
+        params["code"] = RESOURCE_CODES[resource]
+    weights = ', '.join(map(str, WEIGHTS))
+    statement = text(
+        f"SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS rank, "
+        f"highlight({SEARCH_TABLE}, 0, :open, :close), "
+        f"snippet({SEARCH_TABLE}, 1, :open, :close, '…', 16) "
+        f"FROM {SEARCH_TABLE} WHERE {where} ORDER BY rank LIMIT :limit"
+    )
+    results = []
+    for rowid, rank, name, snippet in db.session.execute(statement, params):
+        resource_name = CODE_RESOURCES[rowid % ROWID_FACTOR]
+        id = rowid // ROWID_FACTOR
+        results.append({
+            "resource": resource_name,
+            "id": id,
+            "url": resource_url(resource_name, id),
+            "name": highlighted(name),
+            "snippet": highlighted(snippet),
+            "score": round(-rank, 6),
+        })
+    return results
@@ -0,0 +1,220 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Ponto de entrada de produção com vários processos (pre-fork). O processo
+# principal cria o banco, carrega o pacote offline (SWAPI_BUNDLE) se o banco
+# estiver vazio, carrega a SWAPI (apenas os recursos ainda vazios, ou todos
+# com --refresh), pré-gera os snapshots das listagens e só então abre o
+# socket e cria os workers com fork: eles herdam o estado já aquecido e
+# compartilham essas páginas de memória (copy-on-write), sem repetir a carga.
+# Cada worker atende no mesmo socket, com uma thread por requisição se
+# --threaded for usado. Sinais: SIGHUP recarrega (aquece de novo e troca os
+# workers sem fechar o socket; com SWAPI_WARMUP_INTERVAL, o mesmo é feito
+# periodicamente com a carga completa da SWAPI); SIGTERM/SIGINT encerram de
+# forma graciosa.
+#
+# Uso: python serve.py --workers 4 --threaded --port 8000
+#
+# English Version:
+# Multi-process (pre-fork) production entry point. The master process creates
+# the database, loads the offline bundle (SWAPI_BUNDLE) when the database is
+# empty, loads the SWAPI (only the resources that are still empty, or all of
+# them with --refresh), pre-renders the listing snapshots and only then
+# opens the socket and forks the workers: they inherit the already warm state
+# and share those memory pages (copy-on-write), without repeating the load.
+# Every worker serves on the same socket, with one thread per request when
+# --threaded is used. Signals: SIGHUP reloads (warms again and replaces the
+# workers without closing the socket; with SWAPI_WARMUP_INTERVAL the same is
+# done periodically with a full SWAPI load); SIGTERM/SIGINT shut down
+# gracefully.
+#
+# Usage: python serve.py --workers 4 --threaded --port 8000
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import bundle
+from columnar import columnar
+from ingestion import RESOURCES
+from models import db
+from Routes import create_app, init_db
+from snapshots import snapshots
+from warmup import warmup
+
+# Tempo máximo (segundos) para um worker terminar as requisições em andamento
+GRACEFUL_TIMEOUT = 30
+
+
+# Aquece o estado do processo principal: pacote offline (se o banco estiver
+# vazio), carga da SWAPI e snapshots das listagens
+def prime(app, refresh=False):
+    bundle.hydrate(app)
+    with app.app_context():
+        if refresh:
+            pending = tuple(RESOURCES)
+        else:
+            pending = tuple(resource for resource, (model, _, _) in RESOURCES.items() if not model.query.first())
+        if pending and app.config['SWAPI_WARMUP_ON_STARTUP']:
+            warmup.run(*pending)
+        snapshots.build_all()
+        columnar.build_all()  # Armazenamento colunar, se ativado (COLUMNAR_STORE)
+        # Conexões abertas não podem ser compartilhadas entre processos
+        for engine in db.engines.values():
+            engine.dispose()
+    # Objetos criados até aqui não são mais visitados pelo coletor de lixo,
+    # evitando que ele escreva nas páginas compartilhadas com os workers
+    gc.freeze()
+
+
+class Master:
+    def __init__(self, app, host, port, workers, threaded):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.count = workers
+        self.threaded = threaded
+        self.workers = set()  # workers da geração atual
+        self.retiring = {}  # workers antigos sendo encerrados: pid -> prazo
+        self.signals = []
+
+    # Socket de escuta criado antes do fork e herdado por todos os workers
+    def listen(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(1024)
+        self.socket.set_inheritable(True)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.serve_worker()
+            finally:
+                os._exit(0)
+        self.workers.add(pid)
+
+    # Laço de um worker: atende no socket compartilhado até receber SIGTERM
+    def serve_worker(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C é tratado pelo processo principal
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        server = make_server(self.host, self.port, self.app, threaded=self.threaded, fd=self.socket.fileno())
+        # Encerramento gracioso: para de aceitar conexões e espera as requisições em andamento
+        server.daemon_threads = False
+        server.block_on_close = True
+        signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+        print(f"Worker {os.getpid()} atendendo em http://{self.host}:{self.port}")
+        server.serve_forever()
+        server.server_close()
+
+    # Envia SIGTERM aos workers informados; os que passarem do prazo recebem SIGKILL
+    def retire(self, pids):
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        for pid in pids:
+            self.workers.discard(pid)
+            self.retiring[pid] = deadline
+            self.signal(pid, signal.SIGTERM)
+
+    def signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    # Recolhe os workers encerrados; um worker da geração atual que morreu é substituído
+    def reap(self, respawn=True):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                break
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if respawn:
+                    print(f"Worker {pid} terminou inesperadamente, criando outro")
+                    self.spawn()
+            self.retiring.pop(pid, None)
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                self.signal(pid, signal.SIGKILL)
+
+    # Aquece o estado novamente (refresh: recarrega toda a SWAPI) e troca todos
+    # os workers pela nova geração
+    def reload(self, refresh=False):
+        print("Recarregando: aquecendo o estado e substituindo os workers")
+        gc.unfreeze()
+        prime(self.app, refresh=refresh)
+        old = set(self.workers)
+        for _ in range(self.count):
+            self.spawn()
+        self.retire(old)
+
+    def stop(self):
+        print("Encerrando os workers")
+        self.retire(set(self.workers))
+        while self.retiring:
+            self.reap(respawn=False)
+            time.sleep(0.1)
+        self.socket.close()
+
+    # Laço do processo principal: sinais, substituição de workers e recarga periódica
+    def run(self, interval=0):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, lambda signum, frame: self.signals.append(signum))
+        self.listen()
+        for _ in range(self.count):
+            self.spawn()
+        next_refresh = time.monotonic() + interval if interval else None
+        while True:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reload()
+                else:
+                    self.stop()
+                    return
+            if next_refresh and time.monotonic() >= next_refresh:
+                self.reload(refresh=True)
+                next_refresh = time.monotonic() + interval
+            self.reap()
+            time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor pre-fork da aplicação")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="número de processos")
+    parser.add_argument('--threaded', action='store_true', help="uma thread por requisição em cada worker")
+    parser.add_argument('--profile', default=os.environ.get('APP_PROFILE', 'prod'), help="perfil de config.py")
+    parser.add_argument('--refresh', action='store_true', help="recarrega todos os recursos da SWAPI na inicialização")
+    args = parser.parse_args()
+
+    app = create_app(args.profile)
+    init_db(app)
+    prime(app, refresh=args.refresh)
+    # A carga da SWAPI é feita pelo processo principal, nunca pelos workers
+    app.config['SWAPI_WARMUP_ON_DEMAND'] = False
+
+    if not hasattr(os, 'fork'):
+        # Sistemas sem fork (Windows): um único processo
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+        return
+    Master(app, args.host, args.port, args.workers, args.threaded).run(app.config['SWAPI_WARMUP_INTERVAL'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo mantém snapshots pré-renderizados das listagens completas. O JSON
+# de cada recurso é gerado uma única vez por versão da tabela, em bytes
+# imutáveis, junto com as versões comprimidas em gzip (e brotli, se o pacote
+# estiver instalado). As rotas de listagem sem parâmetros respondem direto do
+# snapshot, respeitando Accept-Encoding, sem serializar nada por requisição.
+# Os snapshots são reconstruídos ao fim da ingestão e, após uma gravação, na
+# primeira requisição que encontrar a versão da tabela alterada.
+#
+# English Version:
+# This module keeps pre-rendered snapshots of the full-catalog listings. The
+# JSON of each resource is generated once per table version, as immutable
+# bytes, along with gzip-compressed copies (and brotli, if the package is
+# installed). Listing routes without parameters answer straight from the
+# snapshot, honoring Accept-Encoding, with no per-request serialization.
+# Snapshots are rebuilt when ingestion finishes and, after a write, on the
+# first request that finds the table version changed.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import gzip
+import threading
+from functools import wraps
+
+from flask import Response, current_app, request
+from sqlalchemy import select
+
+from listing import wants_stream
+from models import db, SERIALIZERS
+from versioning import current_version
+
+try:
+    import brotli  # Opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Parâmetros que não mudam o conteúdo da listagem completa
+IGNORED_ARGS = {'format'}
+
+
+class Snapshot:
+    def __init__(self, version, body):
+        self.version = version
+        self.count = 0
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6)}
+        if brotli:
+            self.bodies['br'] = brotli.compress(body)
+
+    # Melhor codificação aceita pelo cliente
+    def encoding_for(self, accept_encodings):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+
+class Snapshots:
+    def __init__(self):
+        self.snapshots = {}  # tabela -> Snapshot
+        self.locks = {model.__tablename__: threading.Lock() for model in SERIALIZERS}
+
+    # Gera o snapshot de um modelo para a versão atual da tabela
+    def build(self, model):
+        table = model.__tablename__
+        with self.locks[table]:
+            version = current_version(table)
+            snapshot = self.snapshots.get(table)
+            if snapshot and snapshot.version == version:
+                return snapshot
+            statement = select(*model.__table__.columns).order_by(model.id)
+            result = SERIALIZERS[model].rows(db.session.execute(statement))
+            snapshot = Snapshot(version, current_app.json.response(result).get_data())
+            snapshot.count = len(result)
+            self.snapshots[table] = snapshot
+            return snapshot
+
+    # Reconstrói os snapshots de todos os modelos (ex.: ao fim da ingestão)
+    def build_all(self):
+        for model in SERIALIZERS:
+            self.build(model)
+
+    def clear(self):
+        self.snapshots.clear()
+
+    # Decorador para rotas de listagem: sem parâmetros de consulta, responde com
+    # o snapshot. when é uma condição extra (ex.: o cliente pediu JSON).
+    def serve(self, model, when=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if set(request.args) - IGNORED_ARGS or wants_stream() or (when and not when()):
+                    return view(*args, **kwargs)
+                snapshot = self.build(model)
+                if not snapshot.count:
+                    # Tabela vazia: a rota trata o aquecimento (503) ou o 404
+                    return view(*args, **kwargs)
+                encoding = snapshot.encoding_for(request.accept_encodings)
+                response = Response(snapshot.bodies[encoding], mimetype='application/json')
+                if encoding != 'identity':
+                    response.content_encoding = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {table: {"version": snapshot.version[0], "rows": snapshot.count,
+                        "bytes": {encoding: len(body) for encoding, body in snapshot.bodies.items()}}
+                for table, snapshot in self.snapshots.items()}
+
+
+# Instância compartilhada pelas rotas
+snapshots = Snapshots()
@@ -0,0 +1,183 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo calcula estatísticas agregadas dos recursos (contagem, soma,
+# média, mínimo, máximo e percentis, com agrupamento opcional) diretamente no
+# SQL, sem transferir as linhas para a aplicação. Os percentis usam funções de
+# janela (row_number/count por grupo) e só as duas linhas vizinhas de cada
+# percentil saem do banco; a interpolação linear é feita aqui. Os resultados
+# são memorizados pela versão da tabela (table_versions): qualquer gravação
+# no recurso gera uma nova versão e os resultados antigos deixam de ser usados.
+#
+# English Version:
+# This module computes aggregate statistics of the resources (count, sum,
+# average, minimum, maximum and percentiles, optionally grouped) directly in
+# SQL, without transferring the rows to the application. Percentiles use
+# window functions (row_number/count per group) and only the two neighbouring
+# rows of each percentile leave the database; linear interpolation is done
+# here. Results are memoized by table version (table_versions): any write to
+# the resource creates a new version and older results are no longer used.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import math
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import Float, Integer, case, cast, func, select
+
+from columnar import columnar
+from listing import spec_condition
+from models import db, Character, Movie, Planet, Species, Starship, Vehicle
+from versioning import current_version
+
+# Recursos com estatísticas: nome na SWAPI -> modelo (as rotas também aceitam os nomes em português)
+STATS_RESOURCES = {
+    'people': Character,
+    'films': Movie,
+    'planets': Planet,
+    'starships': Starship,
+    'species': Species,
+    'vehicles': Vehicle,
+}
+ALIASES = {
+    'personagens': 'people',
+    'filmes': 'films',
+    'planetas': 'planets',
+    'naves': 'starships',
+    'especies': 'species',
+    'veiculos': 'vehicles',
+}
+
+# Funções de agregação aceitas sobre as colunas numéricas
+AGGREGATES = {
+    'sum': func.sum,
+    'avg': func.avg,
+    'min': func.min,
+    'max': func.max,
+}
+
+# Percentis calculados quando nenhum é informado
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+# Quantidade máxima de grupos em uma resposta
+MAX_GROUPS = 1000
+
+# Quantidade máxima de resultados memorizados
+MEMO_SIZE = 256
+
+
+# Colunas que podem ser usadas no agrupamento (as que guardam JSON ficam de fora)
+def group_columns(model):
+    return [column.key for column in model.__table__.columns if not column.info.get('json') and not column.primary_key]
+
+# Calcula as estatísticas de um modelo.
+# group_by: colunas do agrupamento; aggregates: {função: [colunas]};
+# percentiles: colunas dos percentis; points: percentis (0 a 100);
+# filters: filtros (campo, operador, valor) de listing.filter_specs.
+# Retorna a lista de grupos, ordenada pelas colunas do agrupamento, com count,
+# <função>_<coluna> e p<ponto>_<coluna>. Com o armazenamento colunar ativado
+# (COLUMNAR_STORE), o cálculo é feito sobre ele, com o mesmo resultado.
+def compute(model, group_by=(), aggregates=None, percentiles=(), points=DEFAULT_PERCENTILES,
+            filters=(), limit=MAX_GROUPS):
+    result = columnar.aggregate(model, group_by, aggregates, percentiles, points, filters, limit)
+    if result is not None:
+        return result
+    table = model.__table__
+    conditions = [spec_condition(model, spec) for spec in filters]
+    keys = [table.c[name] for name in group_by]
+    columns = [func.count().label('count')]
+    for name, fields in (aggregates or {}).items():
+        columns.extend(AGGREGATES[name](table.c[field]).label(f'{name}_{field}') for field in fields)
+    statement = select(*keys, *columns).select_from(table).where(*conditions).group_by(*keys).order_by(*keys).limit(limit)
+    groups = {tuple(row[:len(keys)]): dict(row._mapping) for row in db.session.execute(statement)}
+    for field in percentiles:
+        # Grupos sem valores na coluna não aparecem na consulta dos percentis
+        empty = {f'p{point}_{field}': None for point in points}
+        for key, values in percentile_values(model, group_by, field, points, conditions).items():
+            if key in groups:
+                groups[key].update(values)
+        for group in groups.values():
+            for name, value in empty.items():
+                group.setdefault(name, value)
+    return list(groups.values())
+
+# Percentis de uma coluna por grupo, com interpolação linear entre as duas
+# linhas vizinhas (mesma definição de numpy.percentile). No SQL, cada grupo
+# numera as suas linhas em ordem (row_number) e só as linhas nas posições
+# necessárias são devolvidas. Retorna {chave do grupo: {p<ponto>_<coluna>: valor}}
+def percentile_values(model, group_by, field, points, conditions=()):
+    table = model.__table__
+    column = table.c[field]
+    partition = [table.c[name] for name in group_by] or None
+    ranked = (select(*[table.c[name] for name in group_by], column.label('value'),
+                     func.row_number().over(partition_by=partition, order_by=column).label('rank'),
+                     func.count().over(partition_by=partition).label('total'))
+              .where(column.isnot(None), *conditions)
+              .subquery())
+    keys = [ranked.c[name] for name in group_by]
+    columns = [func.max(ranked.c.total).label('total')]
+    for point in points:
+        # Posição (a partir de 1) da linha anterior ao percentil: 1 + piso(p * (n - 1))
+        lower = cast(ranked.c.total - 1, Float) * (point / 100)
+        lower = cast(lower, Integer) + 1
+        columns.append(func.max(case((ranked.c.rank == lower, ranked.c.value))).label(f'lower_{point}'))
+        columns.append(func.max(case((ranked.c.rank == lower + 1, ranked.c.value))).label(f'upper_{point}'))
+    statement = select(*keys, *columns).group_by(*keys)
+    values = {}
+    for row in db.session.execute(statement):
+        total = row.total
+        if total is None:
+            # Sem agrupamento, uma tabela vazia (ou só com nulos) ainda devolve uma linha
+            continue
+        result = values[tuple(row[:len(keys)])] = {}
+        for point in points:
+            lower, upper = row._mapping[f'lower_{point}'], row._mapping[f'upper_{point}']
+            fraction = math.modf((total - 1) * (point / 100))[0]
+            if upper is None or not fraction:
+                result[f'p{point}_{field}'] = lower
+            else:
+                result[f'p{point}_{field}'] = lower + (upper - lower) * fraction
+    return values
+
+
+# Resultados memorizados por (tabela, versão, consulta). A versão é lida a
+# cada chamada; uma gravação no recurso faz a próxima chamada recalcular.
+class StatsMemo:
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'misses'), 0)
+
+    # Devolve o resultado memorizado de key para a versão atual da tabela do
+    # modelo, ou calcula-o com function() e guarda
+    def get(self, model, key, function):
+        table = model.__tablename__
+        full_key = (table, current_version(table), key)
+        with self.lock:
+            if full_key in self.entries:
+                self.entries.move_to_end(full_key)
+                self.counters['hits'] += 1
+                return self.entries[full_key]
+            self.counters['misses'] += 1
+        result = function()
+        with self.lock:
+            self.entries[full_key] = result
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries), max_entries=self.size)
+
+
+# Instância compartilhada pelas rotas
+stats_memo = StatsMemo()
+
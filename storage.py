@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo configura o armazenamento SQLite da aplicação. Cada conexão
+# aberta pelo pool recebe os PRAGMAs do perfil de desempenho: journal WAL
+# (leitores não esperam pelos escritores), synchronous=NORMAL (sem fsync a cada
+# commit no WAL), mmap_size, cache_size e busy_timeout. O tamanho do pool é
+# configurável e, opcionalmente, as rotas GET leem por uma conexão somente
+# leitura separada (bind 'replica'), enquanto a ingestão e as gravações usam a
+# conexão principal.
+#
+# English Version:
+# This module configures the application's SQLite storage. Every connection
+# opened by the pool gets the performance profile PRAGMAs: WAL journal
+# (readers do not wait for writers), synchronous=NORMAL (no fsync on every
+# commit in WAL), mmap_size, cache_size and busy_timeout. The pool size is
+# configurable and, optionally, GET routes read through a separate read-only
+# connection (the 'replica' bind), while ingestion and writes use the primary
+# connection.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db, REPLICA_BIND
+
+# Perfil padrão (sobrescrito pelas chaves de mesmo nome em app.config)
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,  # bytes
+    'SQLITE_CACHE_SIZE': -64000,  # negativo: em KiB (64 MB por conexão)
+    'SQLITE_BUSY_TIMEOUT': 5000,  # ms
+    'SQLITE_POOL_SIZE': 10,
+    'SQLITE_MAX_OVERFLOW': 20,
+    'SQLITE_READ_REPLICA': True,
+}
+
+
+# URL somente leitura para o mesmo arquivo do banco principal
+def replica_url(url):
+    url = make_url(url)
+    return url.set(database=f"file:{url.database}", query=dict(url.query, mode='ro', uri='true'))
+
+# PRAGMAs executados em cada conexão nova (read_only: sem alterar o journal)
+def pragmas(config, read_only=False):
+    statements = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}",
+    ]
+    if not read_only:
+        statements.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    return statements
+
+def set_pragmas(statements):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+    return on_connect
+
+
+# Inicializa o banco de dados da aplicação com o perfil de armazenamento
+# (substitui db.init_app(app))
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    sqlite = make_url(uri).get_backend_name() == 'sqlite' and make_url(uri).database not in (None, '', ':memory:')
+
+    if sqlite:
+        options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', config['SQLITE_POOL_SIZE'])
+        options.setdefault('max_overflow', config['SQLITE_MAX_OVERFLOW'])
+        options.setdefault('connect_args', {}).setdefault('timeout', config['SQLITE_BUSY_TIMEOUT'] / 1000)
+        if config['SQLITE_READ_REPLICA']:
+            binds = config.setdefault('SQLALCHEMY_BINDS', {})
+            binds.setdefault(REPLICA_BIND, dict(options, url=replica_url(uri)))
+
+    db.init_app(app)
+
+    if sqlite:
+        with app.app_context():
+            for key, engine in db.engines.items():
+                read_only = key == REPLICA_BIND
+                event.listen(engine, 'connect', set_pragmas(pragmas(config, read_only)))
@@ -0,0 +1,198 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa o cliente HTTP da SWAPI usado pela ingestão. Uma
+# única sessão (requests.Session) mantém um pool de conexões keep-alive, cada
+# requisição tem tempo limite de conexão e de leitura, e falhas temporárias
+# (erros de rede, 429 e 5xx) são repetidas com espera exponencial e aleatória
+# (jitter), respeitando o cabeçalho Retry-After. As respostas ficam em um
+# cache em disco, uma entrada por URL, com o ETag e o Last-Modified: as
+# próximas requisições da mesma URL são revalidadas (If-None-Match /
+# If-Modified-Since) e um 304 reaproveita o corpo guardado. Dentro de
+# SWAPI_CACHE_TTL segundos, a entrada é usada sem nenhuma requisição, e ela
+# também é usada quando a SWAPI não responde depois de todas as tentativas.
+#
+# English Version:
+# This module implements the SWAPI HTTP client used by ingestion. A single
+# session (requests.Session) keeps a pool of keep-alive connections, every
+# request has connect and read timeouts, and transient failures (network
+# errors, 429 and 5xx) are retried with exponential, randomized (jittered)
+# backoff, honouring the Retry-After header. Responses are kept in an on-disk
+# cache, one entry per URL, with the ETag and Last-Modified: later requests
+# for the same URL are revalidated (If-None-Match / If-Modified-Since) and a
+# 304 reuses the stored body. Within SWAPI_CACHE_TTL seconds, the entry is
+# used without any request, and it is also used when the SWAPI does not
+# answer after every retry.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import basedir
+from metrics import metrics
+
+# Endereço base da SWAPI (pode apontar para uma réplica local, por exemplo em testes)
+SWAPI_BASE_URL = os.environ.get('SWAPI_BASE_URL', 'https://swapi.dev/api').rstrip('/')
+
+# Número máximo de requisições simultâneas à SWAPI (tamanho do pool de conexões)
+MAX_WORKERS = int(os.environ.get('SWAPI_MAX_WORKERS', 8))
+
+# Tempos limite (em segundos) para conectar e para ler cada resposta
+CONNECT_TIMEOUT = float(os.environ.get('SWAPI_CONNECT_TIMEOUT', 5))
+REQUEST_TIMEOUT = float(os.environ.get('SWAPI_TIMEOUT', 10))
+
+# Tentativas adicionais após uma falha temporária e a espera base/máxima entre elas
+RETRIES = int(os.environ.get('SWAPI_RETRIES', 3))
+BACKOFF = float(os.environ.get('SWAPI_BACKOFF', 0.5))
+MAX_BACKOFF = float(os.environ.get('SWAPI_MAX_BACKOFF', 8))
+
+# Respostas que justificam uma nova tentativa
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Pasta do cache em disco (vazio desativa) e tempo, em segundos, em que uma
+# entrada é usada sem revalidação (0 = sempre revalida)
+CACHE_DIR = os.environ.get('SWAPI_CACHE_DIR', os.path.join(basedir, 'instance', 'swapi-cache'))
+CACHE_TTL = float(os.environ.get('SWAPI_CACHE_TTL', 0))
+
+
+class SwapiClient:
+    def __init__(self, base_url=SWAPI_BASE_URL, cache_dir=CACHE_DIR, cache_ttl=CACHE_TTL):
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        # Sessão compartilhada: reaproveita as conexões TCP/TLS entre as páginas
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('requests', 'fresh', 'revalidated', 'downloaded', 'stale', 'retries', 'errors'), 0)
+
+    # Busca uma página de um recurso; retorna o JSON ou None se a SWAPI não respondeu
+    def get(self, resource, params=None):
+        url = f"{self.base_url}/{resource}/"
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        try:
+            return self.get_json(url)
+        except (requests.RequestException, ValueError) as e:
+            self.count('errors')
+            print(f"Error fetching from SWAPI: {e}")
+            return None
+
+    # GET de uma URL com cache em disco e revalidação condicional
+    def get_json(self, url):
+        entry = self.load(url)
+        if entry and self.cache_ttl and time.time() - entry['stored'] < self.cache_ttl:
+            self.count('fresh')
+            return entry['body']
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.request(url, headers)
+            if response.status_code != 304:
+                response.raise_for_status()  # Verifica erros na resposta
+        except requests.RequestException as e:
+            if not entry:
+                raise
+            # SWAPI indisponível: usa a cópia guardada, mesmo sem revalidação
+            self.count('stale')
+            print(f"SWAPI indisponível ({e}), usando a cópia em cache de {url}")
+            return entry['body']
+        if response.status_code == 304 and entry:
+            self.count('revalidated')
+            entry['stored'] = time.time()
+            self.save(url, entry)
+            return entry['body']
+        body = response.json()
+        self.count('downloaded')
+        self.save(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored': time.time(),
+            'body': body,
+        })
+        return body
+
+    # Executa o GET com novas tentativas nas falhas temporárias
+    def request(self, url, headers):
+        for attempt in range(RETRIES + 1):
+            self.count('requests')
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT))
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.observe_swapi(time.perf_counter() - started, 'error')
+                if attempt == RETRIES:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                metrics.observe_swapi(time.perf_counter() - started, response.status_code)
+                if response.status_code not in RETRY_STATUS or attempt == RETRIES:
+                    return response
+                delay = self.retry_after(response) or self.backoff(attempt)
+            self.count('retries')
+            time.sleep(delay)
+
+    # Espera exponencial com jitter completo: aleatória entre 0 e BACKOFF * 2^tentativa
+    def backoff(self, attempt):
+        return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+
+    # Espera pedida pela SWAPI no cabeçalho Retry-After (em segundos), limitada a MAX_BACKOFF
+    def retry_after(self, response):
+        value = response.headers.get('Retry-After', '')
+        return min(float(value), MAX_BACKOFF) if value.isdigit() else None
+
+    # Arquivo do cache de uma URL
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def load(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.path(url), encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    # Grava a entrada em um arquivo temporário e o renomeia (a troca é atômica)
+    def save(self, url, entry):
+        if not self.cache_dir:
+            return
+        path = self.path(url)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump(entry, file)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Falha ao gravar o cache da SWAPI: {str(e)}")
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, cache_dir=self.cache_dir or None, cache_ttl=self.cache_ttl)
+
+
+# Instância compartilhada pela ingestão
+client = SwapiClient()
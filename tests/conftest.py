@@ -0,0 +1,164 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Fixtures dos testes. A SWAPI é substituída por uma réplica local (FakeSwapi),
+# servida por um servidor WSGI em uma thread: o cliente de swapi_client passa
+# a apontar para ela (como SWAPI_BASE_URL), sem cache em disco e sem novas
+# tentativas. Cada teste usa um banco SQLite próprio, em um arquivo temporário,
+# com o perfil test de config.py.
+#
+# English Version:
+# Test fixtures. The SWAPI is replaced by a local stand-in (FakeSwapi), served
+# by a WSGI server in a thread: the swapi_client client points at it (like
+# SWAPI_BASE_URL), without the on-disk cache and without retries. Every test
+# uses its own SQLite database, in a temporary file, with the test profile
+# from config.py.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import json
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+
+import swapi_client
+from models import db
+from Routes import create_app, init_db
+from snapshots import snapshots
+from stats import stats_memo
+
+# Itens por página, como na SWAPI
+PAGE_SIZE = 10
+
+# Quantidade de itens de cada recurso da réplica (people ocupa duas páginas).
+# As relações são simétricas, como na SWAPI: os personagens de um filme são os
+# que têm o filme na sua lista
+COUNTS = {'people': 12, 'films': 3, 'planets': 4, 'starships': 3, 'species': 3, 'vehicles': 3}
+
+CREATED = "2014-12-09T13:50:51.644000Z"
+EDITED = "2014-12-20T21:17:56.891000Z"
+
+
+# Réplica da SWAPI: os itens ficam em self.items ({recurso: {id: item}}) e
+# podem ser alterados pelos testes; failing guarda as páginas que respondem 500
+# e delay atrasa cada resposta (segundos). As páginas levam um ETag e
+# If-None-Match com o mesmo ETag recebe 304, como na SWAPI
+class FakeSwapi:
+    def __init__(self):
+        self.url = None
+        self.items = {resource: {id: self.item(resource, id) for id in range(1, count + 1)}
+                      for resource, count in COUNTS.items()}
+        self.failing = set()  # (recurso, página)
+        self.delay = 0
+        self.requests = []
+
+    def link(self, resource, id):
+        return f"{self.url or 'https://swapi.dev/api'}/{resource}/{id}/"
+
+    def item(self, resource, id):
+        if resource == 'people':
+            fields = {"name": f"Person {id}", "height": str(150 + id), "mass": "1,358" if id == 3 else "unknown" if id == 4 else str(60 + id),
+                      "hair_color": "blond", "skin_color": "fair", "eye_color": "blue", "birth_year": "19BBY",
+                      "gender": ("male", "female", "n/a")[id % 3], "homeworld": f"/planets/{id % 4 + 1}/",
+                      "films": [f"/films/{id % 3 + 1}/"], "species": [f"/species/{id % 3 + 1}/"],
+                      "vehicles": [f"/vehicles/{id % 3 + 1}/"], "starships": [f"/starships/{id % 3 + 1}/"]}
+        elif resource == 'films':
+            fields = {"title": f"Film {id}", "episode_id": id, "opening_crawl": "It is a period of civil war.",
+                      "director": "George Lucas", "producer": "Gary Kurtz", "release_date": f"197{id}-05-25",
+                      "characters": [f"/people/{person}/" for person in range(1, COUNTS['people'] + 1) if person % 3 + 1 == id],
+                      "planets": ["/planets/1/"],
+                      "starships": ["/starships/1/"], "vehicles": ["/vehicles/1/"], "species": ["/species/1/"]}
+        elif resource == 'planets':
+            fields = {"name": f"Planet {id}", "rotation_period": "24", "orbital_period": "unknown" if id == 2 else "364",
+                      "diameter": "12,500", "climate": ("arid", "temperate")[id % 2], "gravity": "1 standard",
+                      "terrain": "desert", "surface_water": "1", "population": "unknown" if id == 3 else str(1000 * id)}
+        elif resource == 'starships':
+            fields = {"name": f"Ship {id}", "model": "T-65", "manufacturer": "Incom", "cost_in_credits": str(1000 * id),
+                      "length": "12.5", "max_atmosphering_speed": "1050", "crew": "1", "passengers": "0",
+                      "cargo_capacity": "110", "consumables": "1 week", "hyperdrive_rating": "1.0", "MGLT": "100",
+                      "starship_class": ("Starfighter", "Corvette")[id % 2]}
+        elif resource == 'species':
+            fields = {"name": f"Species {id}", "classification": "mammal", "designation": "sentient",
+                      "average_height": "180", "skin_colors": "fair", "hair_colors": "blond", "eye_colors": "blue",
+                      "average_lifespan": "indefinite" if id == 2 else "120", "homeworld": "/planets/1/",
+                      "language": "Galactic Basic"}
+        else:
+            fields = {"name": f"Vehicle {id}", "model": "Digger Crawler", "manufacturer": "Corellia",
+                      "cost_in_credits": str(150000 * id), "length": "36.8", "max_atmosphering_speed": "30",
+                      "crew": "46", "passengers": "30", "cargo_capacity": "50000", "consumables": "2 months",
+                      "vehicle_class": "wheeled"}
+        return dict(fields, url=f"/{resource}/{id}/", created=CREATED, edited=EDITED)
+
+    # Item com as URLs relativas convertidas em URLs da réplica
+    def render(self, item):
+        absolute = lambda value: self.url + value if isinstance(value, str) and value.startswith('/') else value
+        return {key: [absolute(value) for value in values] if isinstance(values, list) else absolute(values)
+                for key, values in item.items()}
+
+    def edit(self, resource, id, **fields):
+        self.items[resource][id].update(fields, edited="2015-01-01T00:00:00.000000Z")
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        self.requests.append(request.full_path)
+        time.sleep(self.delay)
+        resource = request.path.strip('/').split('/')[-1]
+        page = request.args.get('page', 1, type=int)
+        if resource not in self.items or (resource, page) in self.failing:
+            return Response(status=500 if resource in self.items else 404)(environ, start_response)
+        items = [self.items[resource][id] for id in sorted(self.items[resource])]
+        results = items[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        more = page * PAGE_SIZE < len(items)
+        body = {"count": len(items), "previous": None,
+                "next": f"{self.url}/{resource}/?page={page + 1}" if more else None,
+                "results": [self.render(item) for item in results]}
+        body = json.dumps(body)
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()[:16]}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={'ETag': etag})(environ, start_response)
+        return Response(body, content_type='application/json', headers={'ETag': etag})(environ, start_response)
+
+
+@pytest.fixture
+def swapi(monkeypatch):
+    fake = FakeSwapi()
+    server = make_server('127.0.0.1', 0, fake, threaded=True)
+    fake.url = f"http://127.0.0.1:{server.server_port}/api"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(swapi_client.client, 'base_url', fake.url)
+    monkeypatch.setattr(swapi_client.client, 'cache_dir', '')
+    monkeypatch.setattr(swapi_client, 'RETRIES', 0)
+    yield fake
+    server.shutdown()
+
+
+# Chaves de configuração extras da aplicação; os testes as trocam com
+# @pytest.mark.parametrize('app_config', [{...}])
+@pytest.fixture
+def app_config():
+    return {}
+
+
+# Aplicação do perfil test com um banco próprio; o teste roda dentro do contexto da aplicação
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app('test', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}", **app_config)
+    init_db(app)
+    stats_memo.clear()
+    snapshots.clear()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
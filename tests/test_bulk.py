@@ -0,0 +1,100 @@
+import json
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from models import db, Character, Planet, character_starships
+
+
+def test_bulk_post_saves_every_item(app, client):
+    items = [{"name": f"Planet {id}", "population": "1,000", "climate": "arid"} for id in range(1, 6)]
+    response = client.post('/planetas/bulk', json=items)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["created"] == 5 and body["failed"] == 0
+    ids = [result["id"] for result in body["results"]]
+    assert [db.session.get(Planet, id).name for id in ids] == [item["name"] for item in items]
+    assert db.session.get(Planet, ids[0]).population == 1000
+
+
+def test_bulk_post_accepts_ndjson_and_links(app, client):
+    lines = [json.dumps({"name": "Luke", "starships": [1, "https://swapi.dev/api/starships/2/"]}), "{quebrado"]
+    response = client.post('/personagens/bulk', data="\n".join(lines), content_type='application/x-ndjson')
+    assert response.status_code == 207
+    results = response.get_json()["results"]
+    assert results[1]["status"] == "invalid"
+    rows = db.session.execute(select(character_starships.c.starship_id)
+                              .where(character_starships.c.character_id == results[0]["id"])).scalars()
+    assert set(rows) == {1, 2}
+
+
+def test_bulk_post_reports_invalid_and_conflicting_items(app, client):
+    client.post('/personagens/bulk', json=[{"id": 7, "name": "Leia"}])
+    response = client.post('/personagens/bulk', json=[
+        {"name": "Han"},
+        {"height": "180"},  # sem o nome, obrigatório
+        {"name": "Chewbacca", "unknown_field": 1},
+        {"id": 7, "name": "Lando"},  # id já usado: isolado na gravação item a item
+    ])
+    assert response.status_code == 207
+    body = response.get_json()
+    assert [result["status"] for result in body["results"]] == ["created", "invalid", "invalid", "error"]
+    assert body["results"][1]["errors"] == {"name": "campo obrigatório"}
+    assert body["results"][2]["errors"] == {"unknown_field": "campo desconhecido"}
+    assert db.session.get(Character, 7).name == "Leia"
+
+
+def test_bulk_delete_removes_records_and_links(app, client):
+    ids = [result["id"] for result in client.post('/personagens/bulk', json=[
+        {"name": f"Person {id}", "starships": [1]} for id in range(3)]).get_json()["results"]]
+    response = client.delete('/personagens/bulk', json={"ids": ids[:2] + [999]})
+    assert response.status_code == 207
+    assert [result["status"] for result in response.get_json()["results"]] == ["deleted", "deleted", "not_found"]
+    assert db.session.get(Character, ids[0]) is None and db.session.get(Character, ids[2]) is not None
+    assert set(db.session.execute(select(character_starships.c.character_id)).scalars()) == {ids[2]}
+
+
+def test_bulk_delete_rejects_non_integer_ids(app, client):
+    id = client.post('/personagens/bulk', json=[{"name": "Luke"}]).get_json()["results"][0]["id"]
+    response = client.delete('/personagens/bulk', json=[id + 0.5, True, "x", id])
+    assert [result["status"] for result in response.get_json()["results"]] == ["invalid", "invalid", "invalid", "deleted"]
+    response = client.delete(f'/personagens/bulk?ids={id}')
+    assert response.status_code == 400  # já excluído: nenhum item deu certo
+
+
+@pytest.mark.parametrize('app_config', [{'BULK_CHUNK_SIZE': 2}])
+def test_bulk_post_reserves_ids_across_chunks(app, client):
+    client.post('/planetas/bulk', json=[{"id": 10, "name": "Tatooine"}])
+    response = client.post('/planetas/bulk', json=[{"name": "Hoth"}, {"name": "Endor", "id": 20}, {"name": "Naboo"},
+                                                  {"name": "Kamino"}, {"name": "Tatooine"}])
+    results = response.get_json()["results"]
+    assert [result.get("id") for result in results[:4]] == [11, 20, 21, 22]
+    assert results[4]["status"] == "error"  # nome repetido: só o item é rejeitado
+    assert db.session.get(Planet, 21).name == "Naboo"
+
+
+def test_bulk_post_reports_repeated_invalid_values(app, client):
+    response = client.post('/planetas/bulk', json=[{"name": f"Planet {id}", "population": "lots"} for id in range(3)])
+    assert response.status_code == 400
+    assert [result["errors"] for result in response.get_json()["results"]] == [
+        {"population": "número inválido: 'lots'"}] * 3
+
+
+def test_concurrent_bulk_posts_do_not_collide(app, capsys):
+    results = []
+
+    def post(worker):
+        items = [{"name": f"Planet {worker}-{index}"} for index in range(200)]
+        for start in range(0, len(items), 50):
+            response = app.test_client().post('/planetas/bulk', json=items[start:start + 50])
+            results.extend(response.get_json()["results"])
+
+    threads = [threading.Thread(target=post, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {result["status"] for result in results} == {"created"}
+    assert len({result["id"] for result in results}) == 800 == Planet.query.count()
+    assert "Falha ao gravar bloco" not in capsys.readouterr().out
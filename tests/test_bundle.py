@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import bundle
+from ingestion import ingest
+from models import db, Planet
+from Routes import create_app, init_db
+
+
+# Pacote gerado a partir da réplica da SWAPI
+@pytest.fixture
+def bundle_path(app, swapi, tmp_path):
+    ingest()
+    path = tmp_path / 'swapi.jsonl.gz'
+    bundle.dump(path)
+    return path
+
+
+# Danos aplicados ao pacote e o erro que cada um provoca na carga
+def truncate(data):
+    return gzip.compress(data)[:-40]
+
+def duplicate_row(data):
+    lines = data.splitlines(keepends=True)
+    row = next(index for index, line in enumerate(lines) if line.startswith(b'['))
+    return gzip.compress(b''.join(lines[:row + 1] + [lines[row]] + lines[row + 1:]))
+
+def unknown_table(data):
+    return gzip.compress(data.replace(b'"table": "planets"', b'"table": "moons"', 1))
+
+DAMAGES = [
+    (truncate, EOFError),
+    (lambda data: b'not a gzip file', OSError),
+    (unknown_table, KeyError),
+    (duplicate_row, IntegrityError),
+]
+
+
+def test_bundle_round_trip(app, bundle_path):
+    counts = bundle.load(bundle_path, replace=True)
+    assert counts['characters'] == 12 and counts['film_characters'] > 0
+    assert db.session.get(Planet, 1).diameter == 12500
+
+
+@pytest.mark.parametrize('damage, error', DAMAGES, ids=['truncated', 'not_gzip', 'unknown_table', 'duplicate_row'])
+def test_hydrate_falls_back_on_a_broken_bundle(app, bundle_path, tmp_path, damage, error):
+    bundle_path.write_bytes(damage(gzip.decompress(bundle_path.read_bytes())))
+    with pytest.raises(error):
+        bundle.load(bundle_path, replace=True)
+
+    # Banco vazio com o pacote danificado: a inicialização segue, sem dados parciais
+    empty = create_app('test', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'empty.db'}",
+                       SWAPI_BUNDLE=str(bundle_path))
+    init_db(empty)
+    assert bundle.hydrate(empty) is False
+    with empty.app_context():
+        assert bundle.loaded_tables() == []
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
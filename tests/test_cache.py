@@ -0,0 +1,74 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import event
+
+from ingestion import ingest
+from models import db
+
+LRU = pytest.mark.parametrize('app_config', [{'CACHE_TYPE': 'lru'}])
+
+
+# SQL executado em todas as conexões (principal e somente leitura) durante o bloco
+class Statements(list):
+    def __enter__(self):
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in db.engines.values():
+            event.remove(engine, 'before_cursor_execute', self.record)
+
+    def record(self, connection, cursor, statement, *args):
+        self.append(statement)
+
+
+@LRU
+def test_cache_hit_does_not_read_table_versions(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    assert len(client.get('/planetas').get_json()) == 1
+    with Statements() as statements:
+        assert len(client.get('/planetas').get_json()) == 1
+    assert statements == []
+    # Gravação deste processo: a versão em memória é descartada no commit
+    client.post('/planetas', json={"name": "Hoth"})
+    with Statements() as statements:
+        assert len(client.get('/planetas').get_json()) == 2
+    assert any('table_versions' in statement for statement in statements)
+
+
+@pytest.mark.parametrize('app_config', [{'CACHE_TYPE': 'lru', 'VERSION_CACHE_TTL': 0.5}])
+def test_writes_from_other_processes_are_seen_after_the_ttl(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    assert len(client.get('/planetas').get_json()) == 1
+    connection = sqlite3.connect(app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///'))
+    with connection:
+        connection.execute("INSERT INTO planets (name) VALUES ('Hoth')")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'planets'")
+    connection.close()
+    assert len(client.get('/planetas').get_json()) == 1
+    time.sleep(0.6)
+    assert len(client.get('/planetas').get_json()) == 2
+
+
+@LRU
+def test_repeated_get_is_served_from_the_cache(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    first = client.get('/planetas/1')
+    hits = client.get('/cache').get_json()['hits']
+    second = client.get('/planetas/1')
+    assert second.get_data() == first.get_data()
+    assert client.get('/cache').get_json()['hits'] == hits + 1
+
+
+@LRU
+def test_writes_invalidate_the_resource_and_the_ones_that_list_it(app, client, swapi):
+    ingest()
+    people = lambda: [url.rstrip('/').rsplit('/', 1)[1] for url in client.get('/filmes/1').get_json()['characters']]
+    assert people() == ['3', '6', '9', '12']
+    assert client.delete('/personagens/3').status_code == 200
+    # A exclusão de um personagem descarta as respostas de filmes que o listam
+    assert people() == ['6', '9', '12']
+    assert client.get('/personagens/3', headers={'Accept': 'application/json'}).status_code == 404
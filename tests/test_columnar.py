@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+import columnar as columnar_module
+from columnar import ColumnarTable, columnar
+from ingestion import ingest
+from models import db, Planet
+from versioning import touch, version_cache
+
+COLUMNAR = pytest.mark.parametrize('app_config', [{'COLUMNAR_STORE': True}])
+
+SUM = '/stats/planetas?sum=population'
+
+
+def total(client):
+    return client.get(SUM).get_json()["groups"][0]["sum_population"]
+
+
+@COLUMNAR
+def test_local_writes_refresh_incrementally(app, client, swapi):
+    ingest('planets')
+    assert total(client) == 7000
+    table = columnar.tables[Planet]
+    client.post('/planetas', json={"name": "Hoth", "population": 5})
+    assert total(client) == 7005
+    assert columnar.tables[Planet] is table  # só a linha nova saiu do banco
+
+
+@COLUMNAR
+def test_local_and_external_writes_rebuild_the_table(app, client, swapi):
+    ingest('planets')
+    assert total(client) == 7000
+    client.post('/planetas', json={"name": "Hoth", "population": 5})
+    # Outro processo altera linhas existentes e a versão, além da gravação deste processo
+    connection = sqlite3.connect(app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///'))
+    with connection:
+        connection.execute("UPDATE planets SET population = population + 1 WHERE population IS NOT NULL")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'planets'")
+    connection.close()
+    version_cache.clear()  # Passado VERSION_CACHE_TTL, a versão é relida do banco
+    assert total(client) == 7009
+
+
+@COLUMNAR
+def test_deletes_and_orm_updates_are_applied(app, client, swapi):
+    ingest('planets')
+    assert total(client) == 7000
+    table = columnar.tables[Planet]
+    assert client.delete('/planetas/4').status_code == 200
+    assert total(client) == 3000
+    planet = db.session.get(Planet, 1)
+    planet.population = 50
+    touch(Planet)
+    db.session.commit()
+    assert total(client) == 2050
+    assert columnar.tables[Planet] is table
+
+
+@COLUMNAR
+def test_listing_matches_sql(app, client, swapi):
+    ingest('planets')
+    query = '/planetas?fields=name,population&population_gte=1000&climate=arid&limit=1'
+    response = client.get(query)
+    assert response.get_json() == [{"id": 2, "name": "Planet 2", "population": 2000}]
+    assert response.headers['X-Next-Cursor'] == '2'
+    assert client.get(query + '&after=2').get_json() == [{"id": 4, "name": "Planet 4", "population": 4000}]
+
+
+def test_table_compacts_and_keeps_id_order():
+    table = ColumnarTable(Planet)
+    keys = table.keys
+    row = lambda id, name, population: tuple({'id': id, 'name': name, 'population': population}.get(key) for key in keys)
+    table.upsert([row(3, "C", 30), row(1, "A", None), row(2, "B", 20)])
+    assert not table.ordered
+    assert table.select(('id', 'population'), [('population', 'gt', 10)]) == [(2, 20), (3, 30)]
+    table.delete([1, 3])  # Mais de COMPACT_RATIO das linhas removidas: os arrays são reescritos
+    assert len(table.alive) == 1 and table.ordered
+    table.upsert([row(2, "B", 25), row(4, "B", None)])
+    assert table.select(('id', 'name', 'population')) == [(2, "B", 25), (4, "B", None)]
+    assert table.dictionaries['name'] == [None, "B"]  # Cada valor distinto guardado uma vez
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_aggregate_without_and_with_numpy(vectorized, monkeypatch):
+    if vectorized:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(columnar_module, 'numpy', None)
+    table = ColumnarTable(Planet)
+    keys = table.keys
+    table.upsert([tuple({'id': id, 'climate': climate, 'population': population}.get(key) for key in keys)
+                  for id, climate, population in [(1, 'arid', 10), (2, 'arid', 30), (3, 'wet', None)]])
+    assert table.aggregate(('climate',), {'sum': ['population']}, ['population'], [50],
+                           filters=[('climate', 'eq', 'arid')]) == [
+        {"climate": "arid", "count": 2, "sum_population": 40, "p50_population": 20.0}]
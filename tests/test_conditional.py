@@ -0,0 +1,38 @@
+from ingestion import ingest
+
+
+def test_matching_etag_answers_304(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    response = client.get('/planetas/1')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.last_modified is not None
+    cached = client.get('/planetas/1', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.get_data() == b''
+    # Outra consulta na mesma versão tem outro ETag
+    assert client.get('/planetas/1?format=json').headers['ETag'] != etag
+
+
+def test_write_changes_the_etag(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    etag = client.get('/planetas').headers['ETag']
+    client.post('/planetas', json={"name": "Hoth"})
+    response = client.get('/planetas', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()) == 2
+
+
+def test_if_modified_since(app, client, swapi):
+    ingest('planets')
+    response = client.get('/planetas/1')
+    assert client.get('/planetas/1', headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+    assert client.get('/planetas/1', headers={'If-Modified-Since': 'Sat, 01 Jan 2000 00:00:00 GMT'}).status_code == 200
+
+
+def test_errors_carry_no_etag(app, client):
+    response = client.get('/planetas/99')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,34 @@
+import pytest
+
+from Routes import create_app
+
+
+def test_profile_comes_from_app_profile(monkeypatch):
+    monkeypatch.setenv('APP_PROFILE', 'test')
+    app = create_app()
+    assert app.config['PROFILE'] == 'test'
+    assert app.config['TESTING'] is True
+    assert app.config['CACHE_TYPE'] == 'null'
+
+
+def test_flask_variables_override_the_profile(monkeypatch):
+    monkeypatch.setenv('FLASK_CACHE_TTL', '60')
+    monkeypatch.setenv('FLASK_SWAPI_WARMUP_ON_DEMAND', 'true')
+    app = create_app('test')
+    assert app.config['CACHE_TTL'] == 60
+    assert app.config['SWAPI_WARMUP_ON_DEMAND'] is True
+
+
+def test_explicit_overrides_win(monkeypatch):
+    monkeypatch.setenv('FLASK_CACHE_TTL', '60')
+    app = create_app('test', CACHE_TTL=5, DEBUG=True)
+    assert app.config['CACHE_TTL'] == 5
+    assert app.config['DEBUG'] is True
+
+
+@pytest.mark.parametrize('profile, debug', [('dev', True), ('prod', False), ('bench', False)])
+def test_profiles(profile, debug, tmp_path):
+    app = create_app(profile, SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}")
+    assert app.config['PROFILE'] == profile
+    assert app.config['DEBUG'] is debug
+    assert 'characters' in app.blueprints
@@ -0,0 +1,38 @@
+from sqlalchemy import event
+
+from ingestion import ingest
+from models import db
+
+JSON = {'Accept': 'application/json'}
+
+
+def test_list_expands_references_and_relations(app, client, swapi):
+    ingest()
+    people = client.get('/personagens?expand=homeworld,films&limit=3', headers=JSON).get_json()
+    assert [person['homeworld']['name'] for person in people] == ["Planet 2", "Planet 3", "Planet 4"]
+    assert [[film['title'] for film in person['films']] for person in people] == [["Film 2"], ["Film 3"], ["Film 1"]]
+
+
+def test_expansion_is_batched(app, client, swapi):
+    ingest()
+    client.get('/personagens?limit=1', headers=JSON)  # Versão da tabela já em memória nas duas medições
+    counts = {}
+    for limit in (2, 12):
+        statements = []
+        record = lambda connection, cursor, statement, *args: statements.append(statement)
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', record)
+        assert len(client.get(f'/personagens?expand=homeworld,species&limit={limit}', headers=JSON).get_json()) == limit
+        for engine in db.engines.values():
+            event.remove(engine, 'before_cursor_execute', record)
+        counts[limit] = len(statements)
+    # Uma consulta por campo expandido, qualquer que seja o tamanho da página
+    assert counts[2] == counts[12]
+
+
+def test_single_record_and_unknown_fields(app, client, swapi):
+    ingest()
+    film = client.get('/filmes/1?expand=characters').get_json()
+    assert [person['name'] for person in film['characters']] == ["Person 3", "Person 6", "Person 9", "Person 12"]
+    assert client.get('/personagens?expand=name', headers=JSON).status_code == 400
+    assert client.get('/filmes/1?expand=nope').status_code == 400
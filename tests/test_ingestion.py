@@ -0,0 +1,91 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from ingestion import ingest
+from models import db, Character, Favorite, Movie, Planet, film_characters
+from versioning import current_version, touch
+
+
+def test_ingest_saves_every_resource(app, swapi):
+    saved = ingest()
+    assert saved == {'people': 12, 'films': 3, 'planets': 4, 'starships': 3, 'species': 3, 'vehicles': 3}
+    person = db.session.get(Character, 3)
+    assert person.name == "Person 3"
+    assert person.mass == 1358  # "1,358"
+    assert db.session.get(Character, 4).mass is None  # "unknown"
+    assert db.session.get(Planet, 2).orbital_period is None
+    assert db.session.get(Planet, 1).diameter == 12500
+
+
+def test_ingest_writes_links_by_swapi_id(app, swapi, client):
+    ingest()
+    rows = set(db.session.execute(select(film_characters)).all())
+    assert (1, 3) in rows and (2, 1) in rows and (1, 1) not in rows
+    film = client.get('/filmes/1').get_json()
+    assert film['characters'] == [f"https://swapi.dev/api/people/{id}/" for id in (3, 6, 9, 12)]
+
+
+def test_ingest_is_idempotent(app, swapi):
+    ingest()
+    links = set(db.session.execute(select(film_characters)).all())
+    ingest()
+    assert Character.query.count() == 12
+    assert set(db.session.execute(select(film_characters)).all()) == links
+
+
+def test_repeated_ingest_keeps_table_versions(app, swapi):
+    ingest()
+    versions = {table: current_version(table) for table in ('characters', 'movies', 'film_characters')}
+    assert ingest() == {'people': 0, 'films': 0, 'planets': 0, 'starships': 0, 'species': 0, 'vehicles': 0}
+    assert {table: current_version(table) for table in versions} == versions
+    swapi.edit('people', 2, name="Person Two")
+    assert ingest('people') == {'people': 1}
+    assert current_version('characters') != versions['characters']
+
+
+def test_local_records_keep_their_ids(app, swapi, client):
+    response = client.post('/personagem/salvar', json={"name": "Local hero", "height": 170, "mass": 70})
+    assert response.get_json()['id'] == 1  # banco vazio: o registro local ocupa o id 1 da SWAPI
+    assert client.post('/planetas', json={"name": "Local planet"}).get_json()['id'] == 1
+    response = client.post('/favorito/save', json={
+        "character_id": 1, "student_name1": "Ana", "registration1": "1", "course": "CC",
+        "university": "UF", "period": "1"})
+    assert response.status_code == 201
+
+    ingest()
+    assert db.session.get(Character, 1).name == "Local hero"
+    assert db.session.get(Planet, 1).name == "Local planet"
+    assert Favorite.query.one().character_id == 1
+    person = Character.query.filter_by(swapi_id=1).one()
+    assert person.name == "Person 1" and person.id != 1
+    # As associações e as referências da SWAPI apontam para o registro da SWAPI
+    rows = set(db.session.execute(select(film_characters).where(film_characters.c.movie_id == 2)).all())
+    assert (2, person.id) in rows and (2, 1) not in rows
+    film = client.get('/filmes/2').get_json()
+    assert f"https://swapi.dev/api/people/{person.id}/" in film['characters']
+    expanded = client.get('/personagens/4?expand=homeworld').get_json()
+    assert expanded['homeworld']['name'] == "Planet 1"
+
+
+def test_ingest_adopts_legacy_records_by_natural_key(app, swapi):
+    # Banco antigo: os registros foram gravados com ids que não seguem a SWAPI
+    db.session.add_all([Movie(id=7, title="Film 1", episode_id=1, opening_crawl="", director="", producer="",
+                              release_date=date(1971, 5, 25)),
+                        Movie(id=1, title="Film 3", episode_id=3, opening_crawl="", director="", producer="",
+                              release_date=date(1973, 5, 25))])
+    touch(Movie)
+    db.session.commit()
+    ingest()
+    assert {movie.id: (movie.title, movie.swapi_id) for movie in Movie.query} == {
+        7: ("Film 1", 1), 1: ("Film 3", 3), 2: ("Film 2", 2)}
+    films = db.session.execute(select(film_characters.c.movie_id).where(film_characters.c.character_id == 3)).scalars()
+    assert set(films) == {7}  # Person 3 está no filme 1 da SWAPI, o registro 7
+
+
+def test_renamed_item_is_updated_in_place(app, swapi):
+    ingest('planets')
+    swapi.edit('planets', 2, name="Planet Two")
+    ingest('planets')
+    assert Planet.query.count() == 4
+    assert db.session.get(Planet, 2).name == "Planet Two"
@@ -0,0 +1,51 @@
+import pytest
+
+from ingestion import ingest
+
+
+@pytest.mark.parametrize('query', ['films_gt=1', 'films_lte=2', 'starships_gte=1', 'gender_gt=a'])
+def test_range_filter_on_relations_and_text_is_rejected(app, client, query):
+    response = client.get(f'/personagens?{query}')
+    assert response.status_code == 400
+    assert "Filtro de faixa não suportado" in response.get_data(as_text=True)
+
+
+def test_relation_filter_selects_linked_records(app, client, swapi):
+    ingest()
+    response = client.get('/personagens?films=1', headers={'Accept': 'application/json'})
+    assert sorted(person['name'] for person in response.get_json()) == ["Person 12", "Person 3", "Person 6", "Person 9"]
+    assert client.get('/personagens?films=x').status_code == 400
+
+
+JSON = {'Accept': 'application/json'}
+
+# A mesma listagem sai do SQL e do armazenamento colunar
+BACKENDS = pytest.mark.parametrize('app_config', [{}, {'COLUMNAR_STORE': True}], ids=['sql', 'columnar'])
+
+
+@BACKENDS
+def test_keyset_pagination_follows_the_cursor(app, client, swapi):
+    ingest('people')
+    names, after = [], None
+    for _ in range(3):
+        query = '/personagens?limit=5' + (f'&after={after}' if after else '')
+        response = client.get(query, headers=JSON)
+        names += [person['name'] for person in response.get_json()]
+        after = response.headers.get('X-Next-Cursor')
+        if after is None:
+            break
+        assert response.headers['Link'] == f'<http://localhost/personagens?limit=5&after={after}>; rel="next"'
+    assert names == [f"Person {id}" for id in range(1, 13)]
+    assert after is None
+
+
+@BACKENDS
+def test_fields_and_filters(app, client, swapi):
+    ingest('people')
+    response = client.get('/personagens?fields=name,height&gender=female&height_gte=155', headers=JSON)
+    assert response.get_json() == [{"id": id, "name": f"Person {id}", "height": 150.0 + id} for id in (7, 10)]
+
+
+@pytest.mark.parametrize('query', ['limit=x', 'after=-1', 'fields=nope', 'height_gte=alto', 'nope=1'])
+def test_invalid_listing_arguments_are_rejected(app, client, query):
+    assert client.get(f'/personagens?{query}', headers=JSON).status_code == 400
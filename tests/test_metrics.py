@@ -0,0 +1,46 @@
+import pytest
+
+from metrics import Histogram
+
+
+# Amostras do texto de /metrics: {nome com rótulos: valor}
+def samples(client):
+    response = client.get('/metrics')
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.get_data(as_text=True).splitlines()
+    return {name: float(value) for name, value in (line.rsplit(' ', 1) for line in lines if not line.startswith('#'))}
+
+
+def test_requests_are_counted_per_endpoint_and_status(app, client):
+    before = samples(client)
+    client.post('/planetas', json={"name": "Tatooine"})
+    client.get('/planetas/1')
+    client.get('/planetas/99')
+    after = samples(client)
+    delta = lambda name: after.get(name, 0) - before.get(name, 0)
+    assert delta('http_requests_total{method="POST",endpoint="/planetas",status="201"}') == 1
+    assert delta('http_requests_total{method="GET",endpoint="/planetas/<int:id>",status="200"}') == 1
+    assert delta('http_requests_total{method="GET",endpoint="/planetas/<int:id>",status="404"}') == 1
+    labels = '{method="GET",endpoint="/planetas/<int:id>"}'
+    assert delta(f'http_request_duration_seconds_count{labels}') == 2
+    assert delta(f'http_request_sql_queries_sum{labels}') >= 2  # A leitura do planeta em cada requisição
+    inf = '{method="GET",endpoint="/planetas/<int:id>",le="+Inf"}'
+    assert after[f'http_request_duration_seconds_bucket{inf}'] == after[f'http_request_duration_seconds_count{labels}']
+
+
+@pytest.mark.parametrize('app_config', [{'METRICS_SERVER_TIMING': True}])
+def test_server_timing_header(app, client):
+    client.post('/planetas', json={"name": "Tatooine"})
+    timing = client.get('/planetas/1').headers['Server-Timing']
+    assert timing.startswith('db;dur=') and 'queries"' in timing and 'serialize;dur=' in timing and 'app;dur=' in timing
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency', 'Latência', ('route',), (0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, '/x')
+    assert histogram.render() == [
+        '# HELP latency Latência', '# TYPE latency histogram',
+        'latency_bucket{route="/x",le="0.1"} 1', 'latency_bucket{route="/x",le="1"} 3',
+        'latency_bucket{route="/x",le="+Inf"} 4', 'latency_sum{route="/x"} 4.05', 'latency_count{route="/x"} 4',
+    ]
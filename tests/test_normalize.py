@@ -0,0 +1,37 @@
+import pytest
+
+from models import Starship
+from normalize import normalize, parse_column, parse_float, parse_int, parse_number
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("1,358", 1358), ("1000km", 1000), ("12 kg", 12), ("3.5 m", 3.5), ("1e3", 1000.0),
+    ("unknown", None), ("n/a", None), (None, None), (7, 7),
+])
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+@pytest.mark.parametrize('value', ["12abc", "5 standard", "1000 kmh", "abc", "12e", "30-165", True, [1]])
+def test_parse_number_rejects_junk(value):
+    with pytest.raises(ValueError):
+        parse_number(value)
+
+
+def test_parse_int_rejects_fractions():
+    assert parse_int("2.0") == 2
+    assert parse_float("2") == 2.0
+    with pytest.raises(ValueError):
+        parse_int("2.5")
+
+
+def test_parse_column_counts_every_invalid_value():
+    values, invalid = parse_column(parse_int, ["1", "12abc", "1", "12abc", "unknown", "x"])
+    assert values == [1, None, 1, None, None, None]
+    assert invalid == 3
+
+
+def test_normalize_counts_invalid_values_per_field():
+    rows = [{"crew": "1,000", "length": "12abc"}, {"crew": "bad", "length": "3.5"}]
+    assert normalize(Starship, rows) == {"crew": 1, "length": 1}
+    assert rows == [{"crew": 1000, "length": None}, {"crew": None, "length": 3.5}]
@@ -0,0 +1,20 @@
+import pytest
+
+from queryplan import check, hot_queries, query_plan
+
+
+def test_hot_queries_cover_lookups_and_links(app):
+    names = set(hot_queries())
+    assert {"characters por id", "characters por swapi_id", "characters pela chave natural",
+            "favorites por character_id", "film_characters por movie_id", "film_characters por character_id",
+            "table_versions por tabela"} <= names
+
+
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_hot_query_uses_an_index(app, name):
+    plan = query_plan(hot_queries()[name])
+    assert all(not step.startswith('SCAN') for step in plan), f"{name}: {plan}"
+
+
+def test_check_reports_every_query_as_indexed(app):
+    assert [name for name, (indexed, _) in check().items() if not indexed] == []
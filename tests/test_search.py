@@ -0,0 +1,16 @@
+from ingestion import ingest
+
+
+def test_search_ranks_names_and_highlights_matches(app, client, swapi):
+    ingest()
+    results = client.get('/busca?q=pers 1').get_json()
+    assert [result["name"] for result in results[:1]] == ["<mark>Person</mark> <mark>1</mark>"]
+    results = client.get('/busca?q=civil&resource=films').get_json()
+    assert {result["id"] for result in results} == {1, 2, 3}
+    assert "<mark>civil</mark>" in results[0]["snippet"]
+
+
+def test_search_escapes_record_text(app, client):
+    client.post('/personagens/bulk', json=[{"name": "<script>alert(1)</script> Vader & Son"}])
+    result = client.get('/busca?q=vader').get_json()[0]
+    assert result["name"] == "&lt;script&gt;alert(1)&lt;/script&gt; <mark>Vader</mark> &amp; Son"
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import select
+
+from ingestion import ingest
+from models import db, Character, Movie, SERIALIZERS
+
+
+@pytest.mark.parametrize('model', list(SERIALIZERS), ids=lambda model: model.__name__)
+def test_rows_and_instances_serialize_alike(app, swapi, model):
+    ingest()
+    serializer = SERIALIZERS[model]
+    rows = serializer.rows(db.session.execute(select(*model.__table__.columns).order_by(model.id)))
+    assert rows == [obj.to_dict() for obj in model.query.order_by(model.id)]
+
+
+def test_dates_and_relations(app, swapi):
+    ingest()
+    film = db.session.get(Movie, 1).to_dict()
+    assert film['release_date'] == "1971-05-25"
+    assert film['characters'] == [f"https://swapi.dev/api/people/{id}/" for id in (3, 6, 9, 12)]
+    assert set(film) == set(Movie.__table__.columns.keys()) | {'characters', 'planets', 'starships', 'vehicles', 'species'}
+
+
+def test_projection_compiles_once_per_column_set(app, swapi):
+    ingest('people')
+    serializer = SERIALIZERS[Character]
+    keys = ('id', 'name', 'created')
+    assert serializer.compile(keys) is serializer.compile(keys)
+    records = serializer.rows(db.session.execute(select(Character.id, Character.name, Character.created)
+                                                 .where(Character.id == 1)), relations=[])
+    assert records == [{"id": 1, "name": "Person 1", "created": "2014-12-09T13:50:51.644000"}]
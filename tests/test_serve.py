@@ -0,0 +1,72 @@
+import gc
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from config import basedir
+from serve import prime
+from snapshots import snapshots
+
+# Prazo para o encerramento gracioso nos testes (segundos)
+GRACEFUL = 15
+
+
+@pytest.mark.parametrize('app_config', [{'SWAPI_WARMUP_ON_STARTUP': True}])
+def test_prime_loads_only_empty_resources_and_renders_snapshots(app, swapi):
+    try:
+        prime(app)
+        assert snapshots.snapshots['planets'].count == 4
+        requests = len(swapi.requests)
+        prime(app)
+        assert len(swapi.requests) == requests  # Nada vazio: a SWAPI não é consultada de novo
+    finally:
+        gc.unfreeze()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork') or not os.path.isdir('/proc/self/task'),
+                    reason="pre-fork precisa de os.fork (e de /proc para contar os workers)")
+def test_workers_share_the_socket_and_stop_gracefully(tmp_path):
+    port = free_port()
+    env = dict(os.environ, FLASK_SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'serve.db'}")
+    process = subprocess.Popen([sys.executable, os.path.join(basedir, 'serve.py'), '--profile', 'test',
+                                '--workers', '2', '--port', str(port)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                request(f"{url}/cache")
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "o servidor não respondeu"
+                time.sleep(0.1)
+        with open(f"/proc/{process.pid}/task/{process.pid}/children") as children:
+            assert len(children.read().split()) == 2
+        assert request(f"{url}/planetas", {"name": "Hoth"}) == (201, {"message": "Planeta salvo com sucesso!", "id": 1})
+        # Todos os workers leem o mesmo banco
+        for _ in range(4):
+            assert request(f"{url}/planetas/1")[1]['name'] == "Hoth"
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=GRACEFUL) == 0
@@ -0,0 +1,36 @@
+import gzip
+
+import pytest
+
+from ingestion import ingest
+
+
+def test_full_list_is_served_compressed(app, client, swapi):
+    ingest('planets')
+    plain = client.get('/planetas')
+    assert plain.content_encoding is None
+    response = client.get('/planetas', headers={'Accept-Encoding': 'gzip'})
+    assert response.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"') and etag != plain.headers['ETag']
+    assert client.get('/planetas', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+
+def test_brotli_variant(app, client, swapi):
+    brotli = pytest.importorskip('brotli')
+    ingest('planets')
+    response = client.get('/planetas', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.content_encoding == 'br'
+    assert brotli.decompress(response.get_data()) == client.get('/planetas').get_data()
+
+
+def test_snapshot_follows_writes_and_skips_queries(app, client, swapi):
+    ingest('planets')
+    assert len(client.get('/planetas').get_json()) == 4
+    client.post('/planetas', json={"name": "Hoth"})
+    assert len(client.get('/planetas').get_json()) == 5
+    # Com parâmetros de consulta, a listagem não sai do snapshot
+    assert client.get('/planetas?limit=2', headers={'Accept-Encoding': 'gzip'}).content_encoding is None
+    assert client.get('/cache').get_json()['snapshots']['planets']['rows'] == 5
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from columnar import columnar
+from ingestion import ingest
+from versioning import version_cache
+
+# As mesmas consultas rodam no SQL e no armazenamento colunar
+BACKENDS = pytest.mark.parametrize('app_config', [{}, {'COLUMNAR_STORE': True}], ids=['sql', 'columnar'])
+
+QUERY = '/stats/planetas?group_by=climate&sum=population&avg=diameter&max=population&percentiles=population&p=0,50,90,100'
+
+
+@BACKENDS
+def test_stats_of_empty_table(app, client):
+    response = client.get('/stats/planetas?percentiles=population&avg=population')
+    assert response.status_code == 200
+    assert response.get_json()["groups"] == [
+        {"count": 0, "avg_population": None, "p50_population": None, "p90_population": None, "p99_population": None}]
+
+
+@BACKENDS
+def test_stats_group_and_interpolate_percentiles(app, client, swapi):
+    ingest('planets')
+    groups = client.get(QUERY).get_json()["groups"]
+    # arid: planetas 2 e 4; temperate: 1 e 3 (população desconhecida no 3)
+    assert groups[0] == {"climate": "arid", "count": 2, "sum_population": 6000, "avg_diameter": 12500.0,
+                         "max_population": 4000, "p0_population": 2000, "p50_population": 3000.0,
+                         "p90_population": 3800.0, "p100_population": 4000}
+    assert groups[1] == {"climate": "temperate", "count": 2, "sum_population": 1000, "avg_diameter": 12500.0,
+                         "max_population": 1000, "p0_population": 1000, "p50_population": 1000,
+                         "p90_population": 1000, "p100_population": 1000}
+    assert bool(columnar.tables) == app.config['COLUMNAR_STORE']
+
+
+def test_stats_reject_unknown_columns(app, client):
+    assert client.get('/stats/planetas?group_by=nope').status_code == 400
+    assert client.get('/stats/planetas?p=101').status_code == 400
+    assert client.get('/stats/nada').status_code == 404
+
+
+@BACKENDS
+def test_stats_see_writes_from_other_processes(app, client, swapi):
+    ingest('planets')
+    assert client.get('/stats/planetas?sum=population').get_json()["groups"][0]["sum_population"] == 7000
+    # Outro processo altera a tabela e a versão dela, sem passar por esta sessão
+    connection = sqlite3.connect(app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///'))
+    with connection:
+        connection.execute("UPDATE planets SET population = population + 1 WHERE population IS NOT NULL")
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'planets'")
+    connection.close()
+    version_cache.clear()  # Passado VERSION_CACHE_TTL, a versão é relida do banco
+    assert client.get('/stats/planetas?sum=population').get_json()["groups"][0]["sum_population"] == 7003
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db, REPLICA_BIND
+from storage import replica_url
+
+
+def pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_connections_get_the_performance_profile(app):
+    engine = db.engines[None]
+    assert pragma(engine, 'journal_mode') == 'wal'
+    assert pragma(engine, 'synchronous') == 1  # NORMAL
+    assert pragma(engine, 'busy_timeout') == 5000
+    assert pragma(engine, 'cache_size') == -64000
+    assert engine.pool.size() == 10
+
+
+def test_replica_is_read_only(app):
+    replica = db.engines[REPLICA_BIND]
+    assert replica.url.query == {'mode': 'ro', 'uri': 'true'}
+    assert pragma(replica, 'busy_timeout') == 5000
+    with replica.connect() as connection, pytest.raises(OperationalError, match='readonly'):
+        connection.execute(text("INSERT INTO planets (name) VALUES ('Hoth')"))
+
+
+def test_get_requests_read_from_the_replica(app):
+    with app.test_request_context('/planetas', method='GET'):
+        assert db.session.get_bind() is db.engines[REPLICA_BIND]
+    with app.test_request_context('/planetas', method='POST'):
+        assert db.session.get_bind() is db.engines[None]
+    assert db.session.get_bind() is db.engines[None]
+
+
+@pytest.mark.parametrize('app_config', [{'SQLITE_READ_REPLICA': False, 'SQLITE_POOL_SIZE': 3}])
+def test_replica_and_pool_are_configurable(app):
+    assert REPLICA_BIND not in db.engines
+    assert db.engines[None].pool.size() == 3
+
+
+def test_replica_url():
+    url = replica_url('sqlite:////tmp/app.db')
+    assert url.database == 'file:/tmp/app.db'
+    assert url.query == {'mode': 'ro', 'uri': 'true'}
@@ -0,0 +1,33 @@
+import json
+
+import listing
+from ingestion import ingest
+
+JSON = {'Accept': 'application/json'}
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_matches_the_paginated_list(app, client, swapi, monkeypatch):
+    monkeypatch.setattr(listing, 'STREAM_BATCH_SIZE', 5)  # Vários lotes do cursor
+    ingest()
+    response = client.get('/personagens?stream=1')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert lines(response) == client.get('/personagens', headers=JSON).get_json()
+
+
+def test_stream_by_accept_with_filters_fields_and_expand(app, client, swapi):
+    ingest()
+    response = client.get('/personagens?gender=male&fields=name&expand=homeworld',
+                          headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert [(person['name'], person['homeworld']['name']) for person in lines(response)] == [
+        ("Person 3", "Planet 4"), ("Person 6", "Planet 3"), ("Person 9", "Planet 2"), ("Person 12", "Planet 1")]
+
+
+def test_stream_of_empty_result(app, client, swapi):
+    ingest('planets')
+    assert client.get('/planetas?stream=1&population_gt=999999').get_data() == b''
@@ -0,0 +1,47 @@
+import pytest
+
+import swapi_client
+from swapi_client import SwapiClient
+
+
+@pytest.fixture
+def client(swapi, tmp_path):
+    return SwapiClient(base_url=swapi.url, cache_dir=str(tmp_path / 'swapi-cache'))
+
+
+def test_cached_pages_are_revalidated(client, swapi):
+    first = client.get('planets')
+    assert [planet['name'] for planet in first['results']] == [f"Planet {id}" for id in range(1, 5)]
+    assert client.get('planets') == first
+    assert client.stats()['downloaded'] == 1 and client.stats()['revalidated'] == 1
+    swapi.edit('planets', 1, name="Planet One")
+    assert client.get('planets')['results'][0]['name'] == "Planet One"
+    assert client.stats()['downloaded'] == 2
+
+
+def test_fresh_entries_skip_the_request(client, swapi):
+    client.cache_ttl = 60
+    client.get('planets', {'page': 1})
+    requests = len(swapi.requests)
+    assert client.get('planets', {'page': 1})['count'] == 4
+    assert len(swapi.requests) == requests
+    assert client.stats()['fresh'] == 1
+
+
+def test_stale_copy_is_used_when_swapi_fails(client, swapi):
+    body = client.get('planets')
+    swapi.failing.add(('planets', 1))
+    assert client.get('planets') == body
+    assert client.stats()['stale'] == 1
+    # Sem cópia guardada, a falha é reportada como None
+    swapi.failing.add(('species', 1))
+    assert client.get('species') is None
+
+
+def test_temporary_failures_are_retried(client, swapi, monkeypatch):
+    monkeypatch.setattr(swapi_client, 'RETRIES', 2)
+    monkeypatch.setattr(swapi_client, 'BACKOFF', 0)
+    swapi.failing.add(('planets', 1))
+    assert client.get('planets') is None
+    assert client.stats()['retries'] == 2
+    assert swapi.requests.count('/api/planets/?') == 3
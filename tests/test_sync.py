@@ -0,0 +1,65 @@
+from sqlalchemy import select
+
+from ingestion import sync
+from models import db, Character, Planet, SyncState, character_starships
+from versioning import current_version
+
+
+def test_sync_without_changes_keeps_table_versions(app, swapi):
+    sync()
+    version = current_version('characters')
+    totals = sync()
+    assert totals['people'] == {"inserted": 0, "updated": 0, "unchanged": 12, "failed": 0}
+    assert current_version('characters') == version
+
+
+def test_sync_writes_only_new_and_edited_items(app, swapi):
+    sync()
+    swapi.edit('planets', 2, population="5000")
+    swapi.items['people'][13] = dict(swapi.item('people', 13), edited="2015-01-01T00:00:00.000000Z")
+    totals = sync()
+    assert totals['planets'] == {"inserted": 0, "updated": 1, "unchanged": 3, "failed": 0}
+    assert totals['people'] == {"inserted": 1, "updated": 0, "unchanged": 12, "failed": 0}
+    assert db.session.get(Planet, 2).population == 5000
+    assert db.session.get(Character, 13).name == "Person 13"
+
+
+def test_sync_removes_links_dropped_by_swapi(app, swapi):
+    sync()
+    assert set(db.session.execute(select(character_starships.c.starship_id)
+                                  .where(character_starships.c.character_id == 1)).scalars()) == {2}
+    swapi.edit('people', 1, starships=["/starships/3/"])
+    sync('people')
+    assert set(db.session.execute(select(character_starships.c.starship_id)
+                                  .where(character_starships.c.character_id == 1)).scalars()) == {3}
+
+
+def test_sync_keeps_watermark_when_a_save_fails(app, swapi):
+    sync('people')
+    mark = db.session.get(SyncState, 'people').edited
+    # Nome repetido: o item alterado viola a chave natural e não é gravado
+    swapi.edit('people', 5, name="Person 6")
+    swapi.edit('people', 7, height="999")
+    totals = sync('people')
+    assert totals['people']['failed'] == 1
+    assert totals['people']['updated'] == 1
+    db.session.expire_all()
+    assert db.session.get(SyncState, 'people').edited == mark
+    # Corrigido na SWAPI, o item é gravado na sincronização seguinte
+    swapi.edit('people', 5, name="Person 5 (edited)")
+    totals = sync('people')
+    assert db.session.get(Character, 5).name == "Person 5 (edited)"
+    assert db.session.get(SyncState, 'people').edited > mark
+
+
+def test_sync_keeps_watermark_when_a_page_fails(app, swapi):
+    sync('people')
+    mark = db.session.get(SyncState, 'people').edited
+    swapi.edit('people', 12, height="999")
+    swapi.failing.add(('people', 2))
+    sync('people')
+    db.session.expire_all()
+    assert db.session.get(SyncState, 'people').edited == mark
+    swapi.failing.clear()
+    sync('people')
+    assert db.session.get(Character, 12).height == 999
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from warmup import warmup
+
+ON_DEMAND = pytest.mark.parametrize('app_config', [{'SWAPI_WARMUP_ON_DEMAND': True, 'SWAPI_WARMUP_RETRY_AFTER': 7}])
+
+
+def wait_for(resource, timeout=10):
+    deadline = time.monotonic() + timeout
+    while warmup.is_running(resource) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not warmup.is_running(resource)
+
+
+@ON_DEMAND
+def test_empty_table_answers_503_while_warming_up(app, client, swapi):
+    swapi.delay = 0.3
+    response = client.get('/planetas')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    assert response.get_json()['warmup']['state'] == 'running'
+    # Uma segunda requisição não inicia outra carga (single-flight)
+    assert client.get('/planetas').status_code == 503
+    wait_for('planets')
+    assert [path for path in swapi.requests if 'planets' in path] == ['/api/planets/?']
+    assert warmup.status['planets']['state'] == 'done'
+    response = client.get('/planetas')
+    assert response.status_code == 200
+    assert [planet['name'] for planet in response.get_json()] == [f"Planet {id}" for id in range(1, 5)]
+
+
+@ON_DEMAND
+def test_failed_warmup_is_reported(app, client, swapi):
+    swapi.delay = 0.3
+    swapi.failing.add(('species', 1))
+    assert client.get('/especies').status_code == 503
+    wait_for('species')
+    assert warmup.status['species']['state'] == 'error'
+
+
+def test_warmup_on_demand_can_be_disabled(app, client, swapi):
+    assert app.config['SWAPI_WARMUP_ON_DEMAND'] is False
+    assert client.get('/planetas').status_code == 404
+    assert swapi.requests == []
@@ -0,0 +1,201 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa o GET condicional das rotas. Cada tabela tem uma
+# versão monotônica (tabela table_versions), incrementada na mesma transação de
+# cada gravação ou exclusão. A partir dela são gerados ETags fortes e o
+# cabeçalho Last-Modified; requisições com If-None-Match (ou If-Modified-Since)
+# que coincidem recebem 304 antes de qualquer leitura das linhas.
+#
+# As versões lidas ficam em memória no processo (version_cache): as gravações
+# feitas pelo próprio processo as descartam no commit, e as de outros
+# processos (workers do serve.py, flask sync) são vistas depois de
+# VERSION_CACHE_TTL segundos. O cache conta também quantas vezes o processo
+# incrementou a versão de cada tabela (usado pelo armazenamento colunar para
+# saber se outro processo também gravou).
+#
+# English Version:
+# This module implements conditional GET for the routes. Each table has a
+# monotonic version (table_versions table), bumped in the same transaction as
+# every save or delete. Strong ETags and the Last-Modified header are derived
+# from it; requests with a matching If-None-Match (or If-Modified-Since) get a
+# 304 before any row is read.
+#
+# Versions that were read are kept in memory in the process (version_cache):
+# writes made by the process itself discard them on commit, and those of
+# other processes (serve.py workers, flask sync) are seen after
+# VERSION_CACHE_TTL seconds. The cache also counts how many times the process
+# bumped the version of each table (used by the columnar store to tell
+# whether another process wrote too).
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, make_response, request
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, RoutingSession, TableVersion, related_tables
+
+# Política de cache enviada aos clientes: podem guardar, mas devem revalidar
+CACHE_CONTROL = 'no-cache'
+
+
+# Incrementa, na sessão atual, a versão das tabelas afetadas por uma gravação
+# em model (a própria tabela e as que listam ou embutem os seus dados).
+# Deve ser chamada antes do commit, para entrar na mesma transação.
+def touch(model):
+    now = datetime.utcnow()
+    tables = sorted(related_tables(model))
+    rows = [{"table_name": table, "version": 1, "updated_at": now} for table in tables]
+    statement = insert(TableVersion).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[TableVersion.table_name],
+        set_={"version": TableVersion.version + 1, "updated_at": statement.excluded.updated_at},
+    )
+    db.session.execute(statement)
+    # Registrado na sessão: no commit, as versões em memória dessas tabelas são descartadas
+    db.session.info.setdefault(TOUCHED, Counter()).update(tables)
+
+# Versão atual e data da última alteração de uma tabela (do cache em memória,
+# sem consultar o banco a cada requisição)
+def current_version(table):
+    return version_cache.get(table)
+
+# Versão atual lida de table_versions
+def read_version(table):
+    statement = select(TableVersion.version, TableVersion.updated_at).where(TableVersion.table_name == table)
+    row = db.session.execute(statement).first()
+    return tuple(row) if row else (0, None)
+
+
+# Chave de session.info com as tabelas incrementadas pela transação em andamento
+TOUCHED = 'touched_tables'
+
+
+class VersionCache:
+    def __init__(self):
+        self.ttl = 1.0
+        self.entries = {}  # tabela -> (expira em, (versão, data))
+        self.bumps = Counter()  # tabela -> incrementos confirmados por este processo
+        self.generation = 0  # muda a cada descarte (leituras anteriores não são guardadas)
+        self.lock = threading.Lock()
+        self.listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('VERSION_CACHE_TTL', 1.0)
+        self.ttl = app.config['VERSION_CACHE_TTL']
+        self.clear()
+        if not self.listening:
+            event.listen(RoutingSession, 'after_commit', self._on_commit)
+            event.listen(RoutingSession, 'after_transaction_end', self._on_transaction_end)
+            self.listening = True
+        app.extensions['versions'] = self
+
+    # Versão de uma tabela: a guardada, se não expirou, ou a lida do banco.
+    # Tabelas incrementadas pela transação em andamento são sempre lidas do
+    # banco e não são guardadas (a transação ainda pode ser desfeita).
+    def get(self, table):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(table)
+            generation = self.generation
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        version = read_version(table)
+        if self.ttl > 0 and table not in db.session.info.get(TOUCHED, ()):
+            with self.lock:
+                if generation == self.generation:
+                    self.entries[table] = (now + self.ttl, version)
+        return version
+
+    # Quantas vezes este processo incrementou (com commit) a versão da tabela
+    def local_bumps(self, table):
+        with self.lock:
+            return self.bumps[table]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def discard(self, tables, committed):
+        with self.lock:
+            for table in tables:
+                self.entries.pop(table, None)
+            if committed:
+                self.bumps.update(tables)
+            self.generation += 1
+
+    def _on_commit(self, session):
+        touched = session.info.pop(TOUCHED, None)
+        if touched:
+            self.discard(touched, committed=True)
+
+    # Transação desfeita (rollback ou sessão fechada sem commit)
+    def _on_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            touched = session.info.pop(TOUCHED, None)
+            if touched:
+                self.discard(touched, committed=False)
+
+
+# Instância compartilhada pelas rotas
+version_cache = VersionCache()
+
+# ETag forte: tabela, versão, data da versão (evita colisões se o banco for recriado)
+# e um resumo da consulta (caminho, query string e Accept)
+def make_etag(table, version, updated_at):
+    stamp = int(updated_at.timestamp() * 1000) if updated_at else 0
+    digest = hashlib.sha1(f"{request.full_path}|{request.headers.get('Accept', '')}".encode()).hexdigest()[:16]
+    return f'"{table}-{version}-{stamp}-{digest}"'
+
+# Variantes do ETag por codificação (o corpo comprimido é outra representação)
+def etag_variants(etag):
+    return [etag] + [f'{etag[:-1]}-{encoding}"' for encoding in ('gzip', 'br')]
+
+# Verifica se a cópia do cliente ainda é válida; retorna o ETag que coincidiu
+# (True para If-Modified-Since) ou None
+def not_modified(etag, updated_at):
+    if request.if_none_match:
+        for variant in etag_variants(etag):
+            if request.if_none_match.contains(variant.strip('"')):
+                return variant
+        return None
+    if request.if_modified_since and updated_at:
+        return updated_at.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None) or None
+    return None
+
+# Decorador para rotas GET: responde 304 quando a versão da tabela não mudou e,
+# caso contrário, adiciona ETag, Last-Modified e Cache-Control à resposta.
+def conditional(table):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, updated_at = current_version(table)
+            etag = make_etag(table, version, updated_at)
+            matched = not_modified(etag, updated_at)
+            if matched:
+                response = Response(status=304)
+                if isinstance(matched, str):
+                    etag = matched
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if response.content_encoding:
+                    etag = f'{etag[:-1]}-{response.content_encoding}"'
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            if updated_at:
+                response.last_modified = updated_at
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,139 @@
+# -----------------------------------------------------------------------------
+# Versão em Português:
+# Este módulo implementa o aquecimento (warm-up) do banco de dados em segundo
+# plano. A ingestão da SWAPI roda em uma thread separada, na inicialização ou
+# periodicamente, com uma trava por recurso para que nunca existam duas cargas
+# simultâneas do mesmo recurso. As rotas consultam o progresso e respondem com
+# o que já foi carregado, ou com 503/Retry-After, sem bloquear.
+#
+# English Version:
+# This module implements the background warm-up of the database. SWAPI
+# ingestion runs in a separate thread, at startup or on a schedule, with a
+# per-resource lock so that the same resource is never loaded twice at the
+# same time. Routes check the progress and answer with whatever is already
+# loaded, or with 503/Retry-After, without blocking.
+#
+# Copyright © 2024 Jeremias Nunes. All rights reserved.
+# Copyright © 2024 Rafael Mesquita. All rights reserved.
+# -----------------------------------------------------------------------------
+
+import threading
+import time
+from datetime import datetime
+
+from flask import jsonify
+
+from ingestion import RESOURCES, sync
+from snapshots import snapshots
+
+
+class Warmup:
+    def __init__(self):
+        self.app = None
+        self.locks = {resource: threading.Lock() for resource in RESOURCES}
+        self.status = {resource: {
+            "state": "pending",  # pending | running | done | error
+            "pages": 0,
+            "saved": 0,
+            "started": None,
+            "finished": None,
+            "error": None,
+        } for resource in RESOURCES}
+
+    # Associa a aplicação e, se configurado, agenda recargas periódicas
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('SWAPI_WARMUP_INTERVAL', 0)  # Segundos entre recargas (0 = desativado)
+        app.config.setdefault('SWAPI_WARMUP_RETRY_AFTER', 5)  # Valor do cabeçalho Retry-After
+        app.config.setdefault('SWAPI_WARMUP_RETRY_INTERVAL', 30)  # Espera após uma falha
+        app.config.setdefault('SWAPI_WARMUP_ON_DEMAND', True)  # Carrega ao encontrar o banco vazio
+        app.extensions['warmup'] = self
+
+    # Inicia a carga dos recursos informados (todos, por padrão) em segundo plano.
+    # Recursos que já estão sendo carregados são ignorados (single-flight).
+    def start(self, *resources):
+        resources = self._acquire(resources)
+        if not resources:
+            return False
+        threading.Thread(target=self._run, args=(resources,), name='swapi-warmup', daemon=True).start()
+        return True
+
+    # Executa a carga na thread atual e só retorna ao terminar
+    # (usado pelo processo principal de serve.py, antes de criar os workers)
+    def run(self, *resources):
+        resources = self._acquire(resources)
+        if resources:
+            self._run(resources)
+        return bool(resources)
+
+    # Inicia a carga agora e depois a cada SWAPI_WARMUP_INTERVAL segundos
+    def schedule(self):
+        interval = self.app.config['SWAPI_WARMUP_INTERVAL']
+        self.start()
+        if interval:
+            def loop():
+                while True:
+                    time.sleep(interval)
+                    self.start()
+            threading.Thread(target=loop, name='swapi-warmup-scheduler', daemon=True).start()
+
+    def is_running(self, resource):
+        return self.locks[resource].locked()
+
+    # Resposta 503 enquanto o recurso ainda está sendo carregado; None caso contrário
+    def unavailable(self, resource):
+        if not self.app.config['SWAPI_WARMUP_ON_DEMAND']:
+            return None
+        self.start(resource)
+        if not self.is_running(resource):
+            return None
+        response = jsonify({"error": "Dados sendo carregados da SWAPI, tente novamente em instantes",
+                            "warmup": self.status[resource]})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.app.config['SWAPI_WARMUP_RETRY_AFTER'])
+        return response
+
+    # Reserva os recursos que não estão sendo carregados e marca o início da carga
+    def _acquire(self, resources):
+        resources = [r for r in resources or RESOURCES if self._should_start(r) and self.locks[r].acquire(blocking=False)]
+        for resource in resources:
+            self.status[resource].update(state="running", pages=0, saved=0, error=None,
+                                         started=datetime.utcnow().isoformat(), finished=None)
+        return resources
+
+    # Evita recomeçar imediatamente uma carga que acabou de falhar
+    def _should_start(self, resource):
+        status = self.status[resource]
+        if status["state"] != "error" or not status["finished"]:
+            return True
+        elapsed = datetime.utcnow() - datetime.fromisoformat(status["finished"])
+        return elapsed.total_seconds() >= self.app.config['SWAPI_WARMUP_RETRY_INTERVAL']
+
+    def _progress(self, resource, saved):
+        self.status[resource]["pages"] += 1
+        self.status[resource]["saved"] += saved
+
+    def _run(self, resources):
+        try:
+            with self.app.app_context():
+                # Incremental: só grava o que mudou na SWAPI desde a última carga
+                sync(*resources, progress=self._progress)
+                # Pré-gera as listagens completas com os dados recém-carregados
+                for resource in resources:
+                    snapshots.build(RESOURCES[resource][0])
+            state, error = "done", None
+        except Exception as e:
+            print(f"Falha no aquecimento da SWAPI: {str(e)}")
+            state, error = "error", str(e)
+        for resource in resources:
+            # Nenhuma página recebida indica que a SWAPI não respondeu
+            if state == "done" and not self.status[resource]["pages"]:
+                self.status[resource].update(state="error", error="Nenhuma página recebida da SWAPI")
+            else:
+                self.status[resource].update(state=state, error=error)
+            self.status[resource]["finished"] = datetime.utcnow().isoformat()
+            self.locks[resource].release()
+
+
+# Instância compartilhada pelas rotas
+warmup = Warmup()